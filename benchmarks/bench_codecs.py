@@ -0,0 +1,57 @@
+"""
+Compares the JSON codecs on typical send and contacts payloads.
+
+    $ python benchmarks/bench_codecs.py [iterations]
+"""
+import sys
+import timeit
+
+from wabclient.codec import PREFERRED_CODECS, get_codec
+from wabclient.commands import ContactsCommand, HSMCommand
+
+SEND_PAYLOAD = HSMCommand(
+    to='27123456789',
+    namespace='the-namespace',
+    element_name='the-element-name',
+    language_code='en',
+    localizable_params=[{'default': 'param %s' % (i,)} for i in range(3)],
+).render()
+SEND_RESPONSE = {'messages': [{'id': 'gBEGkYiEB1VXAglK1ZEqA1YKPrU'}]}
+
+CONTACTS_PAYLOAD = ContactsCommand(
+    contacts=['+27%09d' % (i,) for i in range(1000)]).render()
+CONTACTS_RESPONSE = {'contacts': [
+    {'input': '+27%09d' % (i,), 'status': 'valid', 'wa_id': '27%09d' % (i,)}
+    for i in range(1000)]}
+
+CASES = [
+    ('send', SEND_PAYLOAD, SEND_RESPONSE, 100),
+    ('contacts x1000', CONTACTS_PAYLOAD, CONTACTS_RESPONSE, 1),
+]
+
+
+def main(iterations):
+    codecs = []
+    for name in PREFERRED_CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print('%s not installed' % (name,))
+
+    print('%-16s %-8s %12s %12s' % (
+        'payload', 'codec', 'encode us', 'decode us'))
+    for case, payload, response, scale in CASES:
+        for json_codec in codecs:
+            encoded = json_codec.dumps(response)
+            number = iterations * scale
+            encode = timeit.timeit(
+                lambda: json_codec.dumps(payload), number=number)
+            decode = timeit.timeit(
+                lambda: json_codec.loads(encoded), number=number)
+            print('%-16s %-8s %12.2f %12.2f' % (
+                case, json_codec.name,
+                encode / number * 1e6, decode / number * 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,58 @@
+"""
+Bytes saved by request body compression against the CPU it costs, for
+the large bodies the client sends. The last column is the transfer
+time saved on a link of the given speed minus the time spent
+compressing, negative when compression doesn't pay.
+
+    $ python benchmarks/bench_compression.py [megabits per second]
+"""
+import base64
+import os
+import sys
+import timeit
+
+from wabclient.codec import get_codec
+from wabclient.commands import (
+    AddGroupAdminCommand, ContactsCommand, RestoreBackupCommand, TextCommand)
+from wabclient.compression import compress
+
+CODEC = get_codec()
+NUMBERS = ['+2712345%04d' % (index,) for index in range(10000)]
+
+
+def payloads():
+    # backup exports are base64 of encrypted, so random, bytes
+    export = base64.b64encode(os.urandom(3 * 1024 * 1024)).decode('ascii')
+    return [
+        ('contacts (10k)', ContactsCommand(contacts=NUMBERS)),
+        ('group admins (50)', AddGroupAdminCommand(
+            group_id='the-group-id', wa_ids=NUMBERS[:50])),
+        ('text message', TextCommand(to=NUMBERS[0], text='hello ' * 100)),
+        ('restore backup (4MB)', RestoreBackupCommand(
+            password='the-password', data=export)),
+    ]
+
+
+def main(megabits):
+    bytes_per_second = megabits * 1e6 / 8
+    print('%-22s %-9s %10s %10s %6s %10s %10s' % (
+        'payload', 'encoding', 'bytes', 'encoded', 'ratio', 'cpu ms',
+        'net ms'))
+    for (name, command) in payloads():
+        data = CODEC.dumps(command.render())
+        for (encoding, level) in [
+                ('gzip', 1), ('gzip', 6), ('gzip', 9), ('deflate', 6)]:
+            encoded = compress(data, encoding, level)
+            number = max(1, 2000000 // len(data))
+            seconds = min(timeit.repeat(
+                lambda: compress(data, encoding, level),
+                number=number, repeat=3)) / number
+            saved = (len(data) - len(encoded)) / bytes_per_second
+            print('%-22s %-9s %10d %10d %5.0f%% %10.3f %10.3f' % (
+                name, '%s-%s' % (encoding, level), len(data), len(encoded),
+                100.0 * len(encoded) / len(data), seconds * 1e3,
+                (saved - seconds) * 1e3))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10.0)
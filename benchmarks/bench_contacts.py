@@ -0,0 +1,48 @@
+"""
+Bulk import throughput and lookup latency of the SQLite contact store.
+
+    $ python benchmarks/bench_contacts.py [count]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from wabclient.contacts import ContactStore
+
+LOOKUPS = 100000
+
+
+def records(count):
+    for index in range(count):
+        yield ('+27%09d' % (index,), 'valid', '27%09d' % (index,))
+
+
+def main(count):
+    tempdir = tempfile.mkdtemp()
+    try:
+        store = ContactStore(os.path.join(tempdir, 'contacts.db'))
+        started = time.time()
+        store.put_many(records(count))
+        elapsed = time.time() - started
+        print('import  %10d records %8.0f records/s' % (
+            count, count / elapsed))
+
+        numbers = [
+            '+27%09d' % (random.randrange(count * 2),)
+            for _ in range(LOOKUPS)]
+        started = time.time()
+        for number in numbers:
+            store.get(number)
+        elapsed = time.time() - started
+        print('lookup  %10d lookups %8.2f us/lookup (half misses)' % (
+            LOOKUPS, elapsed / LOOKUPS * 1e6))
+        store.close()
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
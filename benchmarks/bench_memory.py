@@ -0,0 +1,60 @@
+"""
+Bytes per queued HSM, comparing a list of HSMCommand objects
+against an HSMBatch.
+
+    $ python benchmarks/bench_memory.py [count]
+"""
+import sys
+import tracemalloc
+
+from wabclient.commands import HSMBatch, HSMCommand
+
+NAMESPACE = 'the-namespace'
+ELEMENT_NAME = 'the-element-name'
+PARAMS = [{'default': 'the first param'}]
+
+
+def recipients(count):
+    for index in range(count):
+        yield '27%09d' % (index,)
+
+
+def queue_commands(count):
+    return [
+        HSMCommand(
+            to=to,
+            namespace=NAMESPACE,
+            element_name=ELEMENT_NAME,
+            language_code='en',
+            localizable_params=PARAMS)
+        for to in recipients(count)]
+
+
+def queue_batch(count):
+    batch = HSMBatch(
+        namespace=NAMESPACE,
+        element_name=ELEMENT_NAME,
+        language_code='en',
+        localizable_params=PARAMS)
+    batch.extend(recipients(count))
+    return batch
+
+
+def measure(func, count):
+    tracemalloc.start()
+    queued = func(count)
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queued
+    return current / float(count)
+
+
+def main(count):
+    print('%d queued messages' % (count,))
+    for name, func in [('HSMCommand list', queue_commands),
+                       ('HSMBatch', queue_batch)]:
+        print('%-16s %8.1f bytes/message' % (name, measure(func, count)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
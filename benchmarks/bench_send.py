@@ -0,0 +1,81 @@
+"""
+Client CPU per send for Connection.send against the FastSender paths.
+Requests are answered by an in-process adapter so only client side
+work is measured.
+
+    $ python benchmarks/bench_send.py [iterations]
+"""
+import sys
+import timeit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from wabclient.client import Connection
+from wabclient.commands import HSMCommand
+
+RESPONSE = b'{"messages": [{"id": "gBEGkYiEB1VXAglK1ZEqA1YKPrU"}]}'
+PARAMS = [{'default': 'param %s' % (i,)} for i in range(3)]
+
+
+class CannedAdapter(requests.adapters.BaseAdapter):
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 201
+        response.headers = CaseInsensitiveDict(
+            {'Content-Type': 'application/json'})
+        response._content = RESPONSE
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def command(to):
+    return HSMCommand(
+        to=to, namespace='the-namespace', element_name='the-element-name',
+        language_code='en', localizable_params=PARAMS)
+
+
+def connect(trust_env=True):
+    session = requests.Session()
+    session.trust_env = trust_env
+    session.mount('http://', CannedAdapter())
+    connection = Connection('http://gateway.example.org', session=session)
+    connection.set_token('the-token')
+    return connection
+
+
+def main(iterations):
+    connection = connect()
+    # without the per-request proxy and .netrc lookups from the environment
+    isolated = connect(trust_env=False)
+    sender = connection.fast_sender()
+    template = command('')
+
+    cases = [
+        ('Connection.send',
+         lambda: connection.send(command('27123456789'))),
+        ('  trust_env=False',
+         lambda: isolated.send(command('27123456789'))),
+        ('FastSender.send',
+         lambda: sender.send(command('27123456789'))),
+        ('FastSender.send_to',
+         lambda: sender.send_to(template, '27123456789')),
+    ]
+    print('%-20s %12s %10s' % ('path', 'us per send', 'speedup'))
+    baseline = None
+    for (name, send) in cases:
+        send()
+        seconds = min(timeit.repeat(send, number=iterations, repeat=3))
+        per_send = seconds / iterations * 1e6
+        baseline = baseline or per_send
+        print('%-20s %12.2f %9.1fx' % (name, per_send, baseline / per_send))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
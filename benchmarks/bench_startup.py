@@ -0,0 +1,51 @@
+"""
+Import time of the library and the CLI, measured in fresh interpreters
+and checked against a budget. Exits non-zero when over budget.
+
+    $ python benchmarks/bench_startup.py [--budget-ms 150] [--runs 10]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+TARGETS = [
+    ('interpreter', 'pass'),
+    ('wabclient', 'import wabclient'),
+    ('wabclient.scripts.cli', 'import wabclient.scripts.cli'),
+]
+
+
+def best_of(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        timings.append(time.time() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=150.0)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = None
+    over_budget = False
+    for name, code in TARGETS:
+        elapsed = best_of(code, args.runs)
+        if baseline is None:
+            baseline = elapsed
+            print('%-24s %7.1f ms' % (name, elapsed))
+            continue
+        import_time = elapsed - baseline
+        status = 'ok' if import_time <= args.budget_ms else 'OVER BUDGET'
+        over_budget = over_budget or import_time > args.budget_ms
+        print('%-24s %7.1f ms (+%.1f ms import, %s)' % (
+            name, elapsed, import_time, status))
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,9 @@ with open("requirements-dev.txt") as req_file:
 with open("requirements-cli.txt") as req_file:
     requirements_cli = req_file.read().split("\n")
 
+with open("requirements-http2.txt") as req_file:
+    requirements_http2 = req_file.read().split("\n")
+
 with open("VERSION") as fp:
     version = fp.read().strip()
 
@@ -30,7 +33,11 @@ setup(
     url="https://github.com/praekeltfoundation/python-whatsapp-business-client",  # noqa
     packages=["wabclient"],
     package_dir={"wabclient": "wabclient"},
-    extras_require={"dev": requirements_dev, "cli": requirements_cli},
+    extras_require={
+        "dev": requirements_dev,
+        "cli": requirements_cli,
+        "http2": requirements_http2,
+    },
     include_package_data=True,
     install_requires=requirements,
     entry_points={"console_scripts": ["wabclient = wabclient.scripts.cli:main"]},
@@ -0,0 +1,139 @@
+import base64
+import binascii
+import json
+import os
+import re
+
+from wabclient.exceptions import WhatsAppAPIException
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# A multiple of 3 so every chunk encodes to base64 without padding.
+ENCODE_CHUNK_SIZE = 3 * 16 * 1024
+
+JSON_ESCAPES = {
+    '/': '/',
+    '\\': '\\',
+    '"': '"',
+    'n': '',
+    'r': '',
+    't': '',
+}
+
+
+def iter_json_string(chunks, key, max_prefix=DEFAULT_CHUNK_SIZE):
+    """
+    Finds the string value for ``key`` in a stream of JSON text and yields
+    it in pieces, without holding the whole document in memory.
+    Only the escapes that can appear in base64 text are supported,
+    whitespace escapes are dropped.
+
+    :param iterable chunks:
+        The JSON document as str chunks
+    :param str key:
+        The object key whose string value to stream
+    :return: generator of str
+    """
+    pattern = re.compile(r'"%s"\s*:\s*"' % (re.escape(key),))
+    chunks = iter(chunks)
+    prefix = ''
+    for chunk in chunks:
+        prefix += chunk
+        match = pattern.search(prefix)
+        if match:
+            remainder = prefix[match.end():]
+            break
+        # keep enough of the tail to match a key split across chunks
+        prefix = prefix[-max_prefix:]
+    else:
+        raise WhatsAppAPIException('No %r string found in response' % (key,))
+
+    escaped = False
+    while True:
+        start = 0
+        for index, char in enumerate(remainder):
+            if escaped:
+                if char not in JSON_ESCAPES:
+                    raise WhatsAppAPIException(
+                        'Unsupported escape \\%s in %r' % (char, key))
+                yield JSON_ESCAPES[char]
+                escaped = False
+                start = index + 1
+            elif char == '\\':
+                yield remainder[start:index]
+                escaped = True
+            elif char == '"':
+                yield remainder[start:index]
+                return
+        if not escaped:
+            yield remainder[start:]
+        try:
+            remainder = next(chunks)
+        except StopIteration:
+            raise WhatsAppAPIException('Unterminated %r string' % (key,))
+
+
+def iter_base64_decode(pieces):
+    """
+    Decodes base64 text arriving in arbitrarily sized pieces.
+
+    :param iterable pieces:
+        The base64 text
+    :return: generator of bytes
+    """
+    pending = ''
+    for piece in pieces:
+        pending += piece
+        usable = len(pending) - len(pending) % 4
+        if usable:
+            try:
+                yield base64.b64decode(pending[:usable])
+            except binascii.Error as exception:
+                raise WhatsAppAPIException(
+                    'Invalid base64 in backup: %s' % (exception,))
+            pending = pending[usable:]
+    if pending.strip():
+        raise WhatsAppAPIException('Truncated base64 in backup')
+
+
+class RestoreBody(object):
+    """
+    A file-like JSON body of the form ``{"password": ..., "data": ...}``
+    that base64 encodes the export from ``fp`` as it is read, with a
+    known length so it is sent with a Content-Length header.
+    """
+
+    def __init__(self, password, fp, chunk_size=ENCODE_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size - chunk_size % 3 or 3
+        self.prefix = ('{"password": %s, "data": "' % (
+            json.dumps(password),)).encode('utf-8')
+        self.suffix = b'"}'
+        size = os.fstat(fp.fileno()).st_size - fp.tell()
+        self.length = (
+            len(self.prefix) + 4 * ((size + 2) // 3) + len(self.suffix))
+        self.pieces = self.iter_pieces()
+        self.buffer = b''
+
+    def iter_pieces(self):
+        yield self.prefix
+        for chunk in iter(lambda: self.fp.read(self.chunk_size), b''):
+            yield base64.b64encode(chunk)
+        yield self.suffix
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return self.pieces
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            piece = next(self.pieces, None)
+            if piece is None:
+                break
+            self.buffer += piece
+        if size < 0:
+            (data, self.buffer) = (self.buffer, b'')
+        else:
+            (data, self.buffer) = (self.buffer[:size], self.buffer[size:])
+        return data
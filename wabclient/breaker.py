@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import deque
+
+from wabclient.exceptions import CircuitOpenException
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_ENDPOINT_CLASS = 'default'
+
+
+def endpoint_class(path):
+    """
+    Groups API paths by their first segment after the version,
+    ``/v1/media/some-id`` is in the ``media`` class.
+
+    :param str path:
+        The API path
+    :return: str
+    """
+    segments = [segment for segment in path.split('?')[0].split('/')
+                if segment]
+    if len(segments) >= 2 and segments[0].startswith('v'):
+        return segments[1]
+    return DEFAULT_ENDPOINT_CLASS
+
+
+def is_failure(response):
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class CircuitBreaker(object):
+    """
+    A circuit breaker for a single endpoint class.
+
+    Outcomes are counted in one second buckets over a rolling ``window``.
+    The breaker opens when at least ``min_calls`` were made in the window
+    and the share of failures (errors, 5xx and 429 responses, and calls
+    slower than ``slow_call_duration``) reaches ``failure_rate``.
+    After ``reset_timeout`` seconds it goes half-open, optionally runs
+    ``probe`` and lets one trial call through, which closes the breaker
+    when it succeeds and opens it again when it fails.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=20, window=30,
+                 slow_call_duration=None, reset_timeout=30, probe=None,
+                 clock=time.time):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call_duration = slow_call_duration
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.buckets = deque()
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _prune(self, now):
+        while self.buckets and self.buckets[0][0] <= now - self.window:
+            self.buckets.popleft()
+
+    def _counts(self):
+        calls = sum(bucket[1] for bucket in self.buckets)
+        failures = sum(bucket[2] for bucket in self.buckets)
+        return (calls, failures)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trial_in_flight = False
+        self.times_opened += 1
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.buckets.clear()
+
+    def allow(self):
+        """
+        Raises ``CircuitOpenException`` unless a call may be made now.
+
+        :return: bool, whether the call is the half-open trial
+        """
+        with self.lock:
+            now = self.clock()
+            if self.state == CLOSED:
+                return False
+            if (self.state == OPEN and
+                    now - self.opened_at >= self.reset_timeout):
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                probing = True
+            else:
+                probing = False
+                self.rejected += 1
+
+        if not probing:
+            raise CircuitOpenException(
+                'Circuit for %r is %s' % (self.name, self.state))
+
+        if self.probe is not None:
+            try:
+                healthy = self.probe()
+            except Exception:
+                healthy = False
+            except BaseException:
+                self.release_trial()
+                raise
+            if not healthy:
+                with self.lock:
+                    self._open(self.clock())
+                    self.rejected += 1
+                raise CircuitOpenException(
+                    'Circuit for %r is open, health probe failed' % (
+                        self.name,))
+        return True
+
+    def release_trial(self):
+        """
+        Lets another call be the trial after the trial ended without an
+        outcome, such as when it was interrupted.
+        """
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trial_in_flight = False
+
+    def record(self, failed, duration=None, trial=False):
+        """
+        Counts the outcome of a call. While half-open only the trial
+        call, the one ``allow`` returned true for, closes or opens the
+        breaker, calls that started before it opened are ignored.
+        """
+        if (not failed and duration is not None and
+                self.slow_call_duration is not None and
+                duration > self.slow_call_duration):
+            failed = True
+        with self.lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                if not trial:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    self._close()
+                return
+            second = int(now)
+            if not self.buckets or self.buckets[-1][0] != second:
+                self.buckets.append([second, 0, 0])
+            self.buckets[-1][1] += 1
+            self.buckets[-1][2] += int(failed)
+            self._prune(now)
+            if self.state != CLOSED:
+                return
+            (calls, failures) = self._counts()
+            if (calls >= self.min_calls and
+                    failures >= self.failure_rate * calls):
+                self._open(now)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls ``func`` through the breaker, ``func`` returns a
+        ``requests`` response.
+        """
+        trial = self.allow()
+        started = self.clock()
+        failed = None
+        try:
+            response = func(*args, **kwargs)
+            failed = is_failure(response)
+            return response
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if failed is not None:
+                self.record(failed, self.clock() - started, trial)
+            elif trial:
+                self.release_trial()
+
+    def snapshot(self):
+        with self.lock:
+            self._prune(self.clock())
+            (calls, failures) = self._counts()
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failures': failures,
+                'failure_rate': (
+                    float(failures) / calls if calls else 0.0),
+                'opened_at': self.opened_at,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+            }
+
+
+class CircuitBreakers(object):
+    """
+    A circuit breaker per endpoint class, created on first use with
+    the keyword arguments given here. Breakers aren't keyed by host, so
+    share them only between connections to the same gateway, such as
+    those of one ``Client``; ``ClientPool`` gives each of its clients
+    a ``copy``.
+    """
+
+    def __init__(self, probe=None, **options):
+        """
+        :param callable probe:
+            Called when a breaker goes half-open, the trial call is only
+            made if it returns true. ``Connection`` sets this to its
+            health check if not given.
+        :param options:
+            Keyword arguments for ``CircuitBreaker``
+        """
+        self.probe = probe
+        self.options = options
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def copy(self):
+        """
+        Returns new breakers with the same settings and none of the
+        state, for another gateway.
+
+        :return: CircuitBreakers
+        """
+        return CircuitBreakers(probe=self.probe, **self.options)
+
+    def get(self, path):
+        name = endpoint_class(path)
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.get(name)
+                if breaker is None:
+                    breaker = self.breakers[name] = CircuitBreaker(
+                        name, probe=self.probe, **self.options)
+        return breaker
+
+    def snapshot(self):
+        """
+        Returns the state of every breaker, for dashboards.
+
+        :return: dict
+        """
+        return dict(
+            (name, breaker.snapshot())
+            for name, breaker in list(self.breakers.items()))
@@ -0,0 +1,306 @@
+import collections
+import copy
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+DEFAULT_MEDIA_CACHE_SIZE = 1024 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+# Temporary files younger than this may still be written to by another
+# process sharing the directory.
+DEFAULT_TMP_GRACE = 60 * 60
+
+
+class TTLCache(object):
+    """
+    A read-through cache whose entries expire after ``ttl`` seconds.
+
+    Concurrent misses for the same key are single-flighted: one caller
+    loads the value while the others wait for its result. Invalidating a
+    key while it is being loaded prevents the stale result from being
+    stored. Every caller gets its own deep copy of the value, so
+    mutating a result doesn't change what later callers see.
+    """
+
+    def __init__(self, ttl, clock=time.time):
+        """
+        :param float ttl:
+            The number of seconds entries stay valid
+        :param callable clock:
+            Returns the current time, defaults to ``time.time``
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.loading = {}
+        self.generations = {}
+
+    def get(self, key, loader):
+        """
+        Returns the cached value for ``key``, calling ``loader`` on a miss.
+
+        :param str key:
+            The cache key
+        :param callable loader:
+            Called without arguments to load the value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                return copy.deepcopy(entry[1])
+            flight = self.loading.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.loading[key] = Flight()
+            generation = self.generations.get(key, 0)
+
+        if not leader:
+            return copy.deepcopy(flight.wait())
+
+        try:
+            value = loader()
+        except BaseException as exception:
+            with self.lock:
+                self.loading.pop(key, None)
+            flight.fail(exception)
+            raise
+
+        with self.lock:
+            self.loading.pop(key, None)
+            if self.generations.get(key, 0) == generation:
+                self.entries[key] = (self.clock() + self.ttl, value)
+        flight.resolve(value)
+        return copy.deepcopy(value)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries) + list(self.loading):
+                self.generations[key] = self.generations.get(key, 0) + 1
+            self.entries.clear()
+
+
+class MediaCache(object):
+    """
+    A size bounded on-disk cache of downloaded media, keyed by media id.
+
+    Files are written to a temporary file and renamed into place so a
+    partially downloaded file is never served. Hits are returned as a
+    read only mmap of the file, which can be read like a file or
+    wrapped in a ``memoryview`` without copying. Once the cached files
+    exceed ``max_bytes`` the least recently used ones are removed.
+    Concurrent misses for the same media id share one download.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MEDIA_CACHE_SIZE,
+                 tmp_grace=DEFAULT_TMP_GRACE):
+        """
+        :param str directory:
+            The directory to keep cached files in, created if missing
+        :param int max_bytes:
+            The maximum size of the cached files combined
+        :param float tmp_grace:
+            The age in seconds after which temporary files left by
+            interrupted downloads are removed
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.tmp_grace = tmp_grace
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.loading = {}
+        self.size = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.scan()
+
+    def scan(self):
+        """
+        Indexes files left by an earlier process, least recently
+        modified first, and evicts down to ``max_bytes``. Temporary
+        files are removed once they are older than ``tmp_grace``, as
+        younger ones may belong to a download in another process.
+        """
+        found = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                if not name.endswith('.tmp'):
+                    found.append((stat.st_mtime, name, stat.st_size))
+                elif now - stat.st_mtime > self.tmp_grace:
+                    os.unlink(path)
+            except OSError:
+                # removed by another process meanwhile
+                continue
+        with self.lock:
+            for (_, name, size) in sorted(found):
+                self.entries[name] = size
+                self.size += size
+            self.evict_over_budget()
+
+    def file_name(self, media_id):
+        return hashlib.blake2b(
+            media_id.encode('utf-8'), digest_size=16).hexdigest()
+
+    def path(self, media_id):
+        return os.path.join(self.directory, self.file_name(media_id))
+
+    def open(self, media_id):
+        """
+        Returns the cached media or ``None`` if it is not cached.
+
+        :return: tuple(size, mmap)
+        """
+        name = self.file_name(media_id)
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+            try:
+                return map_file(os.path.join(self.directory, name))
+            except (IOError, OSError):
+                self.size -= self.entries.pop(name)
+                return None
+
+    def get(self, media_id, loader):
+        """
+        Returns the cached media, downloading it with ``loader`` on a
+        miss.
+
+        :param str media_id:
+            The media id
+        :param callable loader:
+            Called without arguments, returns tuple(size, file-object)
+            like ``Connection.download_media``
+        :return: tuple(size, mmap)
+        """
+        cached = self.open(media_id)
+        if cached is not None:
+            return cached
+
+        name = self.file_name(media_id)
+        with self.lock:
+            flight = self.loading.get(name)
+            leader = flight is None
+            if leader:
+                flight = self.loading[name] = Flight()
+        if not leader:
+            flight.wait()
+            return self.open(media_id) or self.get(media_id, loader)
+
+        try:
+            mapped = self.store(name, loader)
+        except BaseException as exception:
+            with self.lock:
+                self.loading.pop(name, None)
+            flight.fail(exception)
+            raise
+        with self.lock:
+            self.loading.pop(name, None)
+        flight.resolve(None)
+        return mapped
+
+    def store(self, name, loader):
+        (_, fp) = loader()
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with io.open(fd, 'wb') as out:
+                shutil.copyfileobj(fp, out, COPY_BUFFER_SIZE)
+                out.flush()
+                os.fsync(out.fileno())
+            path = os.path.join(self.directory, name)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        # map before evicting so a file larger than the whole budget
+        # can still be handed out once
+        mapped = map_file(path)
+        with self.lock:
+            self.size -= self.entries.pop(name, 0)
+            self.entries[name] = mapped[0]
+            self.size += mapped[0]
+            self.evict_over_budget()
+        return mapped
+
+    def remove(self, name):
+        try:
+            os.unlink(os.path.join(self.directory, name))
+        except OSError:
+            # already evicted by another process sharing the directory
+            pass
+
+    def evict_over_budget(self):
+        while self.size > self.max_bytes and self.entries:
+            (name, size) = self.entries.popitem(last=False)
+            self.size -= size
+            self.remove(name)
+
+    def evict(self, media_id):
+        name = self.file_name(media_id)
+        with self.lock:
+            if name in self.entries:
+                self.size -= self.entries.pop(name)
+                self.remove(name)
+
+    def clear(self):
+        with self.lock:
+            for name in self.entries:
+                self.remove(name)
+            self.entries.clear()
+            self.size = 0
+
+    def __contains__(self, media_id):
+        return self.file_name(media_id) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def map_file(path):
+    """
+    Returns the size of a file and a read only mmap of it, or an empty
+    buffer for an empty file, which can't be mapped.
+
+    :return: tuple(size, mmap)
+    """
+    with open(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if not size:
+            return (0, io.BytesIO(b''))
+        return (size, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class Flight(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exception = None
+
+    def resolve(self, value):
+        self.value = value
+        self.event.set()
+
+    def fail(self, exception):
+        self.exception = exception
+        self.event.set()
+
+    def wait(self):
+        self.event.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.value
@@ -0,0 +1,90 @@
+import csv
+import json
+import os
+import time
+
+import attr
+
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+
+
+@attr.s(slots=True)
+class Checkpoint(object):
+    """
+    The position in an input file up to which all rows have been
+    processed, and the size of the results file at that point.
+    """
+    input_path = attr.ib(type=str, default=None)
+    offset = attr.ib(type=int, default=0)
+    rows = attr.ib(type=int, default=0)
+    results_offset = attr.ib(type=int, default=None)
+    statuses = attr.ib(default=attr.Factory(dict))
+    updated_at = attr.ib(type=float, default=None)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            return cls(**json.load(fp))
+
+    def save(self, path):
+        """
+        Writes the checkpoint atomically so a crash while saving
+        never leaves a truncated checkpoint behind.
+        """
+        self.updated_at = time.time()
+        temp_path = '%s.tmp' % (path,)
+        with open(temp_path, 'w') as fp:
+            json.dump(attr.asdict(self), fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_path, path)
+
+
+class Checkpointer(object):
+    """
+    Saves a ``Checkpoint`` at most every ``interval`` seconds.
+    """
+
+    def __init__(self, path, checkpoint, interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 clock=time.time):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.clock = clock
+        self.last_saved = clock()
+
+    def advance(self, offset, status=None):
+        self.checkpoint.offset = offset
+        self.checkpoint.rows += 1
+        if status is not None:
+            statuses = self.checkpoint.statuses
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def due(self):
+        return self.clock() - self.last_saved >= self.interval
+
+    def save(self, results_offset=None):
+        self.checkpoint.results_offset = results_offset
+        self.checkpoint.save(self.path)
+        self.last_saved = self.clock()
+
+
+def iter_csv_rows(fp, offset=0, encoding='utf-8'):
+    """
+    Reads CSV rows from a binary file, starting at byte ``offset``,
+    and yields the byte offset following every row with the row itself.
+    Empty rows are skipped.
+
+    :param file fp:
+        The file, opened in binary mode
+    :param int offset:
+        The byte offset to seek to before reading
+    :return: generator of tuple(offset, row)
+    """
+    if offset:
+        fp.seek(offset)
+    for line in iter(fp.readline, b''):
+        offset += len(line)
+        row = next(csv.reader([line.decode(encoding)]), None)
+        if row:
+            yield (offset, row)
@@ -1,8 +1,6 @@
-import requests
+import io
 import mimetypes
-import phonenumbers
 import attr
-import iso8601
 from functools import wraps
 from datetime import datetime
 from six.moves import urllib_parse
@@ -10,6 +8,8 @@ from wabclient.exceptions import (
     RequestRateLimitingException, ConcurrencyRateLimitingException,
     WhatsAppAPIException, AddressException, GroupException)
 from wabclient import constants as c
+from wabclient.cache import TTLCache
+from wabclient.codec import get_codec
 from wabclient.commands import (
     MediaCommand, TextCommand, BackupCommand, RestoreBackupCommand,
     ContactsCommand, RegistrationCommand, VerifyCommand, AboutCommand,
@@ -20,14 +20,15 @@ from wabclient.commands import (
     SetShardingCommand, InitialPasswordCommand)
 
 DEFAULT_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 10
 
 
 def json_or_death(func):
     @wraps(func)
-    def decorator(*args, **kwargs):
-        resp = func(*args, **kwargs)
+    def decorator(self, *args, **kwargs):
+        resp = func(self, *args, **kwargs)
         resp.raise_for_status()
-        return resp.json()
+        return self.codec.loads(resp.content)
     return decorator
 
 
@@ -42,6 +43,39 @@ def has_url(content):
         'https://' in content)
 
 
+# requests, phonenumbers, iso8601 and concurrent.futures are imported
+# where they are used so that ``import wabclient`` stays cheap for
+# short lived processes.
+
+
+def new_session(transport=None, session=None):
+    """
+    :param transport:
+        A ``requests`` transport adapter, such as ``HTTP2Adapter``, to
+        mount for http and https URLs
+    :param requests.Session session:
+        A session given by the caller, returned as is without a
+        ``transport``. A caller's session isn't changed, mount the
+        adapter on it instead of passing both.
+    """
+    import requests
+    if session is not None:
+        if transport is not None:
+            raise ValueError('Pass either a session or a transport')
+        return session
+    session = requests.Session()
+    if transport is not None:
+        session.mount('http://', transport)
+        session.mount('https://', transport)
+    return session
+
+
+def chunked(items, size):
+    items = list(items)
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
 error_map = {
     429: RequestRateLimitingException,
     503: ConcurrencyRateLimitingException,
@@ -58,65 +92,159 @@ def fail(data):
 
 
 class Connection(object):
-    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None):
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None,
+                 codec=None, circuit_breakers=None, compression=None,
+                 transport=None):
         self.url = url
-        self.session = session or requests.Session()
+        self.session = new_session(transport, session)
         self.timeout = timeout
+        self.codec = get_codec(codec)
+        self.circuit_breakers = circuit_breakers
+        self.compression = compression
+        self.fast = None
+        if circuit_breakers is not None and circuit_breakers.probe is None:
+            circuit_breakers.probe = self.health_probe
+
+    def call(self, path, func, *args, **kwargs):
+        """
+        Calls ``func``, one of the session's request methods, through
+        the circuit breaker for ``path`` if circuit breakers are enabled.
+        Raises ``CircuitOpenException`` while the breaker is open.
+        """
+        if self.circuit_breakers is None:
+            return func(*args, **kwargs)
+        return self.circuit_breakers.get(path).call(func, *args, **kwargs)
+
+    def health_probe(self):
+        response = self.session.get(
+            urllib_parse.urljoin(self.url, '/v1/health'),
+            timeout=self.timeout)
+        return response.ok
 
-    @json_or_death
     def upload(self, path, fp, content_type):
-        return self.session.post(
-            urllib_parse.urljoin(self.url, path),
-            data=fp.read(),
-            headers={'Content-Type': content_type})
+        return self.upload_data(path, fp.read(), content_type)
+
+    def request_body(self, method, path, data, content_type):
+        """
+        Sends ``data`` to ``path``, compressed if ``compression`` says
+        it is worth it. An endpoint that answers a compressed body with
+        ``415 Unsupported Media Type`` gets it again uncompressed and
+        uncompressed bodies from then on.
+        """
+        url = urllib_parse.urljoin(self.url, path)
+        headers = {'Content-Type': content_type}
+        if self.compression is not None and self.compression.accept_encoding:
+            headers['Accept-Encoding'] = self.compression.accept_encoding
+        if self.compression is None:
+            return self.call(
+                path, self.session.request, method, url,
+                data=data, headers=headers, timeout=self.timeout)
+        (body, extra_headers) = self.compression.compress(
+            path, data, content_type)
+        response = self.call(
+            path, self.session.request, method, url,
+            data=body, headers=dict(headers, **extra_headers),
+            timeout=self.timeout)
+        if extra_headers and response.status_code == 415:
+            self.compression.reject(path)
+            response = self.call(
+                path, self.session.request, method, url,
+                data=data, headers=headers, timeout=self.timeout)
+        return response
+
+    @json_or_death
+    def upload_data(self, path, data, content_type):
+        return self.request_body('POST', path, data, content_type)
 
     def upload_media(self, fp, content_type):
         data = self.upload('/v1/media', fp, content_type)
         [media] = data["media"]
         return media["id"]
 
-    def download(self, filename):
-        response = self.session.get(
-            urllib_parse.urljoin(self.url, filename),
-            stream=True)
+    def stream(self, path, headers=None):
+        """
+        Returns the streaming GET response for ``path``, for callers
+        that need its headers as well as its content.
+        """
+        response = self.call(
+            path, self.session.get,
+            urllib_parse.urljoin(self.url, path),
+            headers=headers, stream=True, timeout=self.timeout)
         response.raise_for_status()
         response.raw.decode_content = True
+        return response
+
+    def head(self, path):
+        return self.call(
+            path, self.session.head,
+            urllib_parse.urljoin(self.url, path),
+            headers={'Accept-Encoding': 'identity'}, timeout=self.timeout)
+
+    def download(self, filename):
+        response = self.stream(filename)
         return (
             int(response.headers['content-length']), response.raw)
 
+    def stream_media(self, media_id):
+        return self.stream('/v1/media/%s' % (media_id,))
+
     def download_media(self, media_id):
-        response = self.session.get(
-            urllib_parse.urljoin(self.url, '/v1/media/%s' % (media_id,)),
-            stream=True)
-        response.raise_for_status()
-        response.raw.decode_content = True
+        response = self.stream_media(media_id)
         return (
             int(response.headers['content-length']), response.raw)
 
+    def download_to_file(self, path, dest_path, parts=1):
+        """
+        Downloads ``path`` to ``dest_path``, resuming from an earlier
+        partial download and fetching ``parts`` byte ranges in parallel
+        if the server supports range requests.
+
+        :return: int, the size of the file
+        """
+        from wabclient.media import download_file
+        return download_file(self, path, dest_path, parts=parts)
+
     @json_or_death
     def get(self, path, params={}):
-        return self.session.get(
-            urllib_parse.urljoin(self.url, path), params=params)
+        return self.call(
+            path, self.session.get,
+            urllib_parse.urljoin(self.url, path), params=params,
+            timeout=self.timeout)
 
     def post(self, path, *args, **kwargs):
-        return self.session.post(
+        kwargs.setdefault('timeout', self.timeout)
+        return self.call(
+            path, self.session.post,
             urllib_parse.urljoin(
                 self.url, path), *args, **kwargs)
 
     @json_or_death
     def send(self, command):
-        return self.session.request(
-            command.get_method(),
-            urllib_parse.urljoin(self.url, command.get_endpoint()),
-            json=command.render())
+        return self.request_body(
+            command.get_method(), command.get_endpoint(),
+            self.codec.dumps(command.render()), 'application/json')
+
+    def fast_sender(self):
+        """
+        Returns a ``FastSender`` for this connection, created once and
+        refreshed when the token changes.
+
+        :return: FastSender
+        """
+        if self.fast is None:
+            from wabclient.fastpath import FastSender
+            self.fast = FastSender(self)
+        return self.fast
 
     def set_token(self, token):
         self.session.headers.update({
             'Authorization': 'Bearer %s' % (token,)
         })
+        if self.fast is not None:
+            self.fast.refresh()
 
 
-@attr.s
+@attr.s(slots=True)
 class Group(object):
     id = attr.ib(type=str)
     creation_time = attr.ib(
@@ -125,14 +253,108 @@ class Group(object):
     creator = attr.ib(type=str, default=None)
     admins = attr.ib(default=attr.Factory(list))
     participants = attr.ib(default=attr.Factory(list))
+    invite_link = attr.ib(type=str, default=None)
+
+
+@attr.s(slots=True, frozen=True)
+class ProfilePhoto(object):
+    data = attr.ib(type=bytes)
+    content_type = attr.ib(type=str)
+
+    @classmethod
+    def from_file(cls, fp, file_name):
+        """
+        Reads a profile photo once so it can be reused for many uploads
+
+        :param file fp:
+            A thing that implements read() to return a bytestream
+        :param str file_name:
+            The file name, used to guess the mimetype
+        :return: ProfilePhoto
+        """
+        return cls(
+            data=fp.read(),
+            content_type=guess_content_type(file_name, 'image/jpeg'))
+
+
+@attr.s(slots=True)
+class BulkResult(object):
+    results = attr.ib(default=attr.Factory(dict))
+    errors = attr.ib(default=attr.Factory(dict))
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def run_bulk(func, items, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Calls ``func(*args)`` for every ``(key, args)`` pair in ``items``
+    with at most ``concurrency`` calls in flight.
+
+    :param callable func:
+        The function to call
+    :param iterable items:
+        ``(key, args)`` pairs, keys are used to index the results
+    :param int concurrency:
+        The maximum number of concurrent calls.
+    :return: BulkResult
+    """
+    bulk_result = BulkResult()
+    for (key, result, exception) in iter_bulk(func, items, concurrency):
+        if exception is None:
+            bulk_result.results[key] = result
+        else:
+            bulk_result.errors[key] = exception
+    return bulk_result
+
+
+def iter_bulk(func, items, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Like ``run_bulk`` but yields ``(key, result, exception)`` as calls
+    complete. Items are only taken from ``items`` as calls complete so
+    long inputs are never queued up in full.
+
+    :return: generator of tuple(key, result, exception)
+    """
+    from concurrent.futures import (
+        ThreadPoolExecutor, wait, FIRST_COMPLETED)
+    from itertools import islice
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+
+        def submit(count):
+            for (key, args) in islice(items, count):
+                pending[executor.submit(func, *args)] = key
+
+        submit(concurrency * 2)
+        while pending:
+            (done, _) = wait(pending, return_when=FIRST_COMPLETED)
+            submit(len(done))
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exception:
+                    yield (key, None, exception)
+                else:
+                    yield (key, result, None)
 
 
 class GroupManager(object):
 
-    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None):
+    MAX_PARTICIPANTS_PER_REQUEST = 50
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None,
+                 codec=None, circuit_breakers=None, compression=None,
+                 transport=None):
         self.url = url
         self.connection = Connection(
-            self.url, timeout=timeout, session=session)
+            self.url, timeout=timeout, session=session, codec=codec,
+            circuit_breakers=circuit_breakers, compression=compression,
+            transport=transport)
 
     def create(self, subject, profile_photo=None, profile_photo_name=None):
         """
@@ -147,24 +369,76 @@ class GroupManager(object):
             is supplied.
         :return: Group
         """
+        self.validate_subject(subject)
+        if profile_photo and not profile_photo_name:
+            raise GroupException('Profile photo name is mandatory.')
+
+        group = self._create_group(subject)
+        if profile_photo:
+            self.set_profile_photo(
+                group.id, profile_photo, profile_photo_name)
+        return group
+
+    def validate_subject(self, subject):
         if not subject:
             raise GroupException('Subjects are required')
         elif len(subject) > 25:
             raise GroupException('Subject length must be <= 25 characters')
 
+    def _create_group(self, subject):
         data = self.connection.send(CreateGroupCommand(subject=subject))
         [group_data] = data["groups"]
         group_data.update({
             'subject': subject,
         })
-        group = Group(**group_data)
+        return Group(**group_data)
+
+    def _create_group_with_extras(self, subject, photo, invite_link):
+        group = self._create_group(subject)
+        if photo is not None:
+            self.connection.upload_data(
+                '/v1/groups/%s/icon' % (group.id,),
+                photo.data, photo.content_type)
+        if invite_link:
+            group.invite_link = self.get_invite_link(group.id)
+        return group
 
+    def create_many(self, subjects, profile_photo=None,
+                    profile_photo_name=None, invite_links=False,
+                    concurrency=DEFAULT_CONCURRENCY):
+        """
+        Create many groups concurrently. The profile photo is read
+        once and the same bytes are uploaded for every group.
+
+        :param list subjects:
+            The subjects for the groups, each must be <= 25 chars.
+        :param file profile_photo:
+            The optional image to use as a profile photo for every group.
+        :param str profile_photo_name:
+            The name for the profile photo, mandatory if a profile photo
+            is supplied.
+        :param bool invite_links:
+            Whether or not to also fetch the invite link for every group.
+            Defaults to ``False``.
+        :param int concurrency:
+            The maximum number of groups created at the same time.
+        :return: BulkResult with a Group per index in ``subjects``
+        """
+        subjects = list(subjects)
+        for subject in subjects:
+            self.validate_subject(subject)
+
+        photo = None
         if profile_photo:
             if not profile_photo_name:
                 raise GroupException('Profile photo name is mandatory.')
-            self.set_profile_photo(
-                group.id, profile_photo, profile_photo_name)
-        return group
+            photo = ProfilePhoto.from_file(profile_photo, profile_photo_name)
+
+        return run_bulk(
+            self._create_group_with_extras,
+            ((index, (subject, photo, invite_links))
+             for index, subject in enumerate(subjects)),
+            concurrency=concurrency)
 
     def update_group(self, group_id, subject):
         """
@@ -254,6 +528,93 @@ class GroupManager(object):
         """
         return self.connection.send(LeaveGroupCommand(group_id))
 
+    def _send_participants(self, command_class, group_id, participants):
+        return [
+            self.connection.send(
+                command_class(group_id=group_id, wa_ids=chunk))
+            for chunk in chunked(
+                participants, self.MAX_PARTICIPANTS_PER_REQUEST)]
+
+    def _bulk_participants(self, command_class, groups, concurrency):
+        return run_bulk(
+            self._send_participants,
+            ((group_id, (command_class, group_id, participants))
+             for (group_id, participants) in groups),
+            concurrency=concurrency)
+
+    def bulk_add_admins(self, groups, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Promotes participants to admins for many groups concurrently.
+        Participant lists longer than ``MAX_PARTICIPANTS_PER_REQUEST``
+        are split over multiple requests.
+
+        :param list groups:
+            A list of ``(group_id, participants)`` pairs.
+        :param int concurrency:
+            The maximum number of groups processed at the same time.
+        :return: BulkResult with a list of responses per group id
+        """
+        return self._bulk_participants(
+            AddGroupAdminCommand, groups, concurrency)
+
+    def bulk_remove_admins(self, groups, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Revokes admins for many groups concurrently.
+
+        :param list groups:
+            A list of ``(group_id, participants)`` pairs.
+        :param int concurrency:
+            The maximum number of groups processed at the same time.
+        :return: BulkResult with a list of responses per group id
+        """
+        return self._bulk_participants(
+            RemoveGroupAdminCommand, groups, concurrency)
+
+    def bulk_remove_participants(
+            self, groups, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Removes participants from many groups concurrently.
+
+        :param list groups:
+            A list of ``(group_id, participants)`` pairs.
+        :param int concurrency:
+            The maximum number of groups processed at the same time.
+        :return: BulkResult with a list of responses per group id
+        """
+        return self._bulk_participants(
+            RemoveGroupParticipantCommand, groups, concurrency)
+
+    def bulk_update_groups(self, groups, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Updates the subject of many groups concurrently.
+
+        :param list groups:
+            A list of ``(group_id, subject)`` pairs.
+        :param int concurrency:
+            The maximum number of groups processed at the same time.
+        :return: BulkResult with the response per group id
+        """
+        return run_bulk(
+            self.update_group,
+            ((group_id, (group_id, subject))
+             for (group_id, subject) in groups),
+            concurrency=concurrency)
+
+    def bulk_leave(self, group_ids, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Leaves many groups concurrently.
+
+        :param list group_ids:
+            The group ids
+        :param int concurrency:
+            The maximum number of groups processed at the same time.
+        :return: BulkResult with the response per group id
+        """
+        return run_bulk(
+            self.leave,
+            ((group_id, (group_id,)) for group_id in group_ids),
+            concurrency=concurrency)
+
     def list(self):
         """
         Return the list of groups
@@ -269,12 +630,40 @@ class ConfigurationManager(object):
     CODE_REQUEST_SMS = 'sms'
     CODE_REQUEST_VOICE = 'voice'
 
-    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None):
+    SETTINGS = 'settings'
+    BUSINESS_PROFILE = 'business_profile'
+    ABOUT = 'about'
+    PROFILE_PHOTO = 'profile_photo'
+    HEALTH = 'health'
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None,
+                 codec=None, cache_ttl=None, circuit_breakers=None,
+                 compression=None, transport=None):
+        """
+        :param float cache_ttl:
+            Cache settings and profile reads for this many seconds,
+            defaults to ``None`` which disables caching. Cached entries
+            are invalidated when the matching setter is called.
+        """
         self.url = url
         self.connection = Connection(self.url, timeout=timeout,
-                                     session=session)
+                                     session=session, codec=codec,
+                                     circuit_breakers=circuit_breakers,
+                                     compression=compression,
+                                     transport=transport)
+        self.cache = TTLCache(cache_ttl) if cache_ttl else None
+
+    def cached(self, key, loader):
+        if self.cache is None:
+            return loader()
+        return self.cache.get(key, loader)
+
+    def invalidate(self, key):
+        if self.cache is not None:
+            self.cache.invalidate(key)
 
     def setup_shards(self, phonenumber, shard_count, pin=None):
+        import phonenumbers
         pn = phonenumbers.parse(phonenumber)
         return self.connection.send(
             SetShardingCommand(
@@ -297,6 +686,7 @@ class ConfigurationManager(object):
             The method of requesting a code request,
             can be either "sms" or "voice"
         """
+        import phonenumbers
         pn = phonenumbers.parse(phonenumber)
         data = self.connection.send(
             RegistrationCommand(
@@ -321,8 +711,16 @@ class ConfigurationManager(object):
 
         :return: bytes
         """
-        (size, data) = self.connection.download('/v1/settings/profile/photo')
-        return data
+        if self.cache is None:
+            (size, data) = self.connection.download(
+                '/v1/settings/profile/photo')
+            return data
+
+        def load():
+            (size, data) = self.connection.download(
+                '/v1/settings/profile/photo')
+            return data.read()
+        return io.BytesIO(self.cached(self.PROFILE_PHOTO, load))
 
     def set_profile_photo(self, fp, file_name):
         """
@@ -333,9 +731,12 @@ class ConfigurationManager(object):
         :parm str file_name:
             The file name, used to guess the mimetype
         """
-        return self.connection.upload(
-            '/v1/settings/profile/photo', fp,
-            guess_content_type(file_name, 'image/jpeg'))
+        try:
+            return self.connection.upload(
+                '/v1/settings/profile/photo', fp,
+                guess_content_type(file_name, 'image/jpeg'))
+        finally:
+            self.invalidate(self.PROFILE_PHOTO)
 
     def get_about(self):
         """
@@ -343,7 +744,9 @@ class ConfigurationManager(object):
 
         :return: str
         """
-        data = self.connection.get('/v1/settings/profile/about')
+        data = self.cached(
+            self.ABOUT,
+            lambda: self.connection.get('/v1/settings/profile/about'))
         return data['settings']['profile']['about']['text']
 
     def set_about(self, about):
@@ -352,7 +755,10 @@ class ConfigurationManager(object):
         :param str about:
             The about message. Must be < 139 characters.
         """
-        return self.connection.send(AboutCommand(about))
+        try:
+            return self.connection.send(AboutCommand(about))
+        finally:
+            self.invalidate(self.ABOUT)
 
     def get_business_profile(self):
         """
@@ -360,7 +766,9 @@ class ConfigurationManager(object):
 
         :return: dict
         """
-        data = self.connection.get('/v1/settings/business/profile')
+        data = self.cached(
+            self.BUSINESS_PROFILE,
+            lambda: self.connection.get('/v1/settings/business/profile'))
         return data['settings']['business']
 
     def set_business_profile(self, address=None, description=None,
@@ -381,13 +789,16 @@ class ConfigurationManager(object):
             List of URLs associated with business. Max of 4.
             Each must be < 256 characters.
         """
-        return self.connection.send(BusinessProfileCommand(
-            address=address,
-            description=description,
-            vertical=vertical,
-            email=email,
-            websites=websites or [],
-        ))
+        try:
+            return self.connection.send(BusinessProfileCommand(
+                address=address,
+                description=description,
+                vertical=vertical,
+                email=email,
+                websites=websites or [],
+            ))
+        finally:
+            self.invalidate(self.BUSINESS_PROFILE)
 
     def get_settings(self):
         """
@@ -395,7 +806,9 @@ class ConfigurationManager(object):
 
         :return: dict
         """
-        data = self.connection.get('/v1/settings/application')
+        data = self.cached(
+            self.SETTINGS,
+            lambda: self.connection.get('/v1/settings/application'))
         return data['settings']['application']
 
     def set_settings(
@@ -429,22 +842,25 @@ class ConfigurationManager(object):
         :param int max_callback_backoff_delay_ms:
             Maximum delay for failed callback. Defaults to ``900000``.
         """
-        return self.connection.send(
-            ApplicationSettingsCommand(
-                on_call_pager,
-                webhooks={
-                    'url': webhook
-                },
-                tcp_listen_address=tcp_listen_address,
-                pass_through=pass_through,
-                sent_status=sent_status,
-                callback_persist=callback_persist,
-                callback_backoff_delay_ms=str(
-                    callback_backoff_delay_ms),
-                max_callback_backoff_delay_ms=str(
-                    max_callback_backoff_delay_ms),
+        try:
+            return self.connection.send(
+                ApplicationSettingsCommand(
+                    on_call_pager,
+                    webhooks={
+                        'url': webhook
+                    },
+                    tcp_listen_address=tcp_listen_address,
+                    pass_through=pass_through,
+                    sent_status=sent_status,
+                    callback_persist=callback_persist,
+                    callback_backoff_delay_ms=str(
+                        callback_backoff_delay_ms),
+                    max_callback_backoff_delay_ms=str(
+                        max_callback_backoff_delay_ms),
+                )
             )
-        )
+        finally:
+            self.invalidate(self.SETTINGS)
 
     def login(self, username, password):
         """
@@ -456,10 +872,11 @@ class ConfigurationManager(object):
         :param str password:
             The password
         """
+        import iso8601
         response = self.connection.post(
             '/v1/users/login', auth=(username, password))
         response.raise_for_status()
-        data = response.json()
+        data = self.connection.codec.loads(response.content)
         [user] = data["users"]
         token = user["token"]
         expires_at = iso8601.parse_date(user["expires_after"])
@@ -506,19 +923,35 @@ class Client(object):
     DIRECT_RECIPIENT = c.RECIPIENT_TYPE_DEFAULT
     GROUP_RECIPIENT = c.RECIPIENT_TYPE_GROUP
 
-    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None):
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, session=None,
+                 codec=None, cache_ttl=None, circuit_breakers=None,
+                 media_cache=None, contact_store=None, compression=None,
+                 transport=None):
         self.url = url
         self.timeout = timeout
-        self.session = session
+        self.session = (
+            new_session(transport, session) if transport is not None
+            else session)
+        self.codec = get_codec(codec)
+        self.circuit_breakers = circuit_breakers
+        self.media_cache = media_cache
+        self.contact_store = contact_store
+        self.compression = compression
         self.connection = Connection(
-            self.url, timeout=self.timeout, session=session)
+            self.url, timeout=self.timeout, session=self.session,
+            codec=self.codec, circuit_breakers=circuit_breakers,
+            compression=compression)
         self.config = ConfigurationManager(
-            self.url, timeout=self.timeout, session=session)
+            self.url, timeout=self.timeout, session=self.session,
+            codec=self.codec, cache_ttl=cache_ttl,
+            circuit_breakers=circuit_breakers, compression=compression)
 
     @property
     def groups(self):
         return GroupManager(
-            self.url, timeout=self.timeout, session=self.session)
+            self.url, timeout=self.timeout, session=self.session,
+            codec=self.codec, circuit_breakers=self.circuit_breakers,
+            compression=self.compression)
 
     def upload(self, path, fp, content_type):
         """
@@ -544,25 +977,120 @@ class Client(object):
 
     def download_media(self, media_id):
         """
+        With a ``media_cache`` the file object is a read only mmap of
+        the cached file.
+
         :param str media_id:
             The ID of the media resource to download
         :return: tuple(content-length, file-object)
         """
-        return self.connection.download_media(media_id)
+        if self.media_cache is None:
+            return self.connection.download_media(media_id)
+        return self.media_cache.get(
+            media_id, lambda: self.connection.download_media(media_id))
+
+    def download_to_file(self, file_name, dest_path, parts=1):
+        """
+        Downloads a file from the container's incoming media directory
+        to ``dest_path``. The download is written to ``dest_path +
+        '.part'`` first, running it again after a failure continues
+        where it stopped.
+
+        :param str file_name:
+            The file to download
+        :param str dest_path:
+            The file to write to
+        :param int parts:
+            The number of byte ranges to fetch in parallel for large
+            files, if the server supports range requests
+        :return: int, the size of the file
+        """
+        return self.connection.download_to_file(
+            file_name, dest_path, parts=parts)
+
+    def download_media_to_file(self, media_id, dest_path, parts=1):
+        """
+        Downloads a media object to ``dest_path``, see
+        ``download_to_file``.
+
+        :param str media_id:
+            The ID of the media resource to download
+        :param str dest_path:
+            The file to write to
+        :param int parts:
+            The number of byte ranges to fetch in parallel
+        :return: int, the size of the file
+        """
+        return self.connection.download_to_file(
+            '/v1/media/%s' % (media_id,), dest_path, parts=parts)
+
+    def iter_download_many(self, media_ids, dest_dir,
+                           concurrency=DEFAULT_CONCURRENCY):
+        """
+        Like ``download_many`` but yields ``(media_id, MediaFile,
+        exception)`` as downloads complete.
+
+        :return: generator of tuple(str, MediaFile, Exception)
+        """
+        from wabclient.media import download_to_dir
+
+        return iter_bulk(
+            download_to_dir,
+            ((media_id, (self.connection, media_id, dest_dir))
+             for media_id in media_ids),
+            concurrency=concurrency)
+
+    def download_many(self, media_ids, dest_dir,
+                      concurrency=DEFAULT_CONCURRENCY):
+        """
+        Streams media objects to files in ``dest_dir`` with at most
+        ``concurrency`` downloads in flight. Files are named after the
+        media id with an extension for the content type.
+
+        The downloads share the client's session, mount an adapter with
+        a ``pool_maxsize`` of at least ``concurrency`` on it to reuse
+        every connection.
+
+        :param iterable media_ids:
+            The media ids to download
+        :param str dest_dir:
+            The directory to write to
+        :param int concurrency:
+            The maximum number of concurrent downloads
+        :return: BulkResult of ``MediaFile`` keyed by media id
+        """
+        from wabclient.media import download_to_dir
+
+        return run_bulk(
+            download_to_dir,
+            ((media_id, (self.connection, media_id, dest_dir))
+             for media_id in media_ids),
+            concurrency=concurrency)
 
     def get_address(self, to_addr):
         """
         Get the WhatsApp username for a to_addr.
         Raises ``AddressException`` if not whatsappable.
 
+        With a ``contact_store`` a fresh record is used instead of
+        checking with the API, and checked results are stored.
+
         :param str to_addr:
             The address to check
         :return: str
         """
-        response = self.check_contacts([to_addr], wait=True)
-        [result] = response['contacts']
-        if result['status'] == ContactsCommand.VALID:
-            return result['wa_id']
+        store = self.contact_store
+        record = store.get(to_addr) if store is not None else None
+        if record is not None:
+            (status, wa_id) = (record.status, record.wa_id)
+        else:
+            response = self.check_contacts([to_addr], wait=True)
+            [result] = response['contacts']
+            (status, wa_id) = (result['status'], result.get('wa_id'))
+            if store is not None and status != ContactsCommand.PROCESSING:
+                store.put(to_addr, status, wa_id)
+        if status == ContactsCommand.VALID:
+            return wa_id
         raise AddressException(
             '%s is not a whatsappable contact' % (to_addr,))
 
@@ -685,7 +1213,8 @@ class Client(object):
             recipient_type=c.RECIPIENT_TYPE_DEFAULT,
             preview_url=True,
             render_mentions=False,
-            check_address=False):
+            check_address=False,
+            idempotency_key=None):
         """
         :param str to_addr:
             The WhatsApp ID
@@ -700,18 +1229,23 @@ class Client(object):
         :param bool check_address:
             Whether or not to verify that the address is whatsapp-able before
             sending. Defaults to ``False``.
+        :param str idempotency_key:
+            A key the message is sent at most once for, needs an
+            ``IdempotentConnection``. Defaults to ``None``.
         """
-        return self.connection.send(
+        return self.send_command(
             TextCommand(
                 to=self.get_address(to_addr) if check_address else to_addr,
                 text=body,
                 recipient_type=recipient_type,
                 preview_url=preview_url and has_url(body),
-                render_mentions=render_mentions))
+                render_mentions=render_mentions),
+            idempotency_key)
 
     def send_hsm(
             self, to_addr, namespace, element_name, language_code, params,
-            language_policy="fallback", check_address=False):
+            language_policy="fallback", check_address=False,
+            idempotency_key=None):
         """
         :param str to_addr:
             The WhatsApp ID
@@ -729,15 +1263,29 @@ class Client(object):
         :param bool check_address:
             Whether or not to verify that the address is whatsapp-able before
             sending. Defaults to ``False``.
+        :param str idempotency_key:
+            A key the message is sent at most once for, needs an
+            ``IdempotentConnection``. Defaults to ``None``.
         """
-        return self.connection.send(
+        return self.send_command(
             HSMCommand(
                 to=self.get_address(to_addr) if check_address else to_addr,
                 namespace=namespace,
                 element_name=element_name,
                 language_code=language_code,
                 language_policy=language_policy,
-                localizable_params=params))
+                localizable_params=params),
+            idempotency_key)
+
+    def send_command(self, command, idempotency_key=None):
+        from wabclient.idempotency import IdempotentConnection
+
+        if idempotency_key is None:
+            return self.connection.send(command)
+        if not isinstance(self.connection, IdempotentConnection):
+            raise ValueError(
+                'idempotency_key needs an IdempotentConnection')
+        return self.connection.send(command, idempotency_key=idempotency_key)
 
     def healthcheck(self):
         """
@@ -745,7 +1293,9 @@ class Client(object):
 
         :return: dict
         """
-        return self.connection.get('/v1/health')
+        return self.config.cached(
+            ConfigurationManager.HEALTH,
+            lambda: self.connection.get('/v1/health'))
 
     def create_backup(self, password):
         """
@@ -768,3 +1318,54 @@ class Client(object):
             The export returned by the create_backup call
         """
         return self.connection.send(RestoreBackupCommand(password, export))
+
+    def create_backup_to_file(self, password, fp):
+        """
+        Create a backup and stream the decoded export into a file,
+        without holding the export in memory.
+
+        :param str password:
+            The password you want to set for the backup
+        :param file fp:
+            A file opened for writing bytes
+        :return: int, the number of bytes written
+        """
+        import codecs
+        from wabclient.backup import (
+            iter_json_string, iter_base64_decode, DEFAULT_CHUNK_SIZE)
+
+        response = self.connection.post(
+            BackupCommand.command_endpoint,
+            data=self.connection.codec.dumps(BackupCommand(password).render()),
+            headers={'Content-Type': 'application/json'},
+            stream=True)
+        response.raise_for_status()
+        size = 0
+        try:
+            text = codecs.iterdecode(
+                response.iter_content(DEFAULT_CHUNK_SIZE), 'utf-8')
+            for data in iter_base64_decode(iter_json_string(text, 'data')):
+                fp.write(data)
+                size += len(data)
+        finally:
+            response.close()
+        return size
+
+    def restore_backup_from_file(self, password, fp):
+        """
+        Restore a backup from a file written by ``create_backup_to_file``,
+        base64 encoding it while the request body is sent.
+
+        :param str password:
+            The password for the backup
+        :param file fp:
+            A file opened for reading bytes
+        """
+        from wabclient.backup import RestoreBody
+
+        response = self.connection.post(
+            RestoreBackupCommand.command_endpoint,
+            data=RestoreBody(password, fp),
+            headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return self.connection.codec.loads(response.content)
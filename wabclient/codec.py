@@ -0,0 +1,77 @@
+import json
+
+import attr
+
+# Codecs in order of preference when none is asked for explicitly.
+PREFERRED_CODECS = ['orjson', 'msgspec', 'ujson', 'json']
+
+
+@attr.s(slots=True, frozen=True)
+class JSONCodec(object):
+    """
+    Encodes objects straight to JSON bytes and decodes JSON bytes.
+    """
+    name = attr.ib(type=str)
+    dumps = attr.ib()
+    loads = attr.ib()
+
+
+def stdlib_codec():
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    return JSONCodec(
+        name='json',
+        dumps=lambda obj: encoder.encode(obj).encode('utf-8'),
+        loads=json.loads)
+
+
+def orjson_codec():
+    import orjson
+    return JSONCodec(name='orjson', dumps=orjson.dumps, loads=orjson.loads)
+
+
+def msgspec_codec():
+    import msgspec
+    return JSONCodec(
+        name='msgspec', dumps=msgspec.json.encode, loads=msgspec.json.decode)
+
+
+def ujson_codec():
+    import ujson
+    return JSONCodec(
+        name='ujson',
+        dumps=lambda obj: ujson.dumps(obj).encode('utf-8'),
+        loads=ujson.loads)
+
+
+CODEC_FACTORIES = {
+    'json': stdlib_codec,
+    'orjson': orjson_codec,
+    'msgspec': msgspec_codec,
+    'ujson': ujson_codec,
+}
+
+_codecs = {}
+
+
+def get_codec(name=None):
+    """
+    Returns a JSON codec by name, or the fastest one installed.
+
+    :param str name:
+        One of ``orjson``, ``msgspec``, ``ujson`` or ``json``. Defaults to
+        ``None`` which picks the first installed in that order.
+    :return: JSONCodec
+    """
+    if isinstance(name, JSONCodec):
+        return name
+    if name is not None:
+        if name not in _codecs:
+            if name not in CODEC_FACTORIES:
+                raise ValueError('Unknown JSON codec %r' % (name,))
+            _codecs[name] = CODEC_FACTORIES[name]()
+        return _codecs[name]
+    for preferred in PREFERRED_CODECS:
+        try:
+            return get_codec(preferred)
+        except ImportError:
+            continue
@@ -1,4 +1,5 @@
 import attr
+from array import array
 
 from wabclient import constants as c
 
@@ -39,6 +40,8 @@ def min_max(min_value, max_value):
 
 class BaseCommand(object):
 
+    __slots__ = ()
+
     def get_endpoint(self):
         return self.command_endpoint
 
@@ -56,7 +59,7 @@ class BaseCommand(object):
             self.render())
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class TextCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/messages'
@@ -83,7 +86,8 @@ class TextCommand(BaseCommand):
             }
         }
 
-@attr.s
+
+@attr.s(slots=True, frozen=True)
 class HSMCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/messages'
@@ -114,7 +118,75 @@ class HSMCommand(BaseCommand):
         }
 
 
-@attr.s
+@attr.s(slots=True)
+class HSMBatch(object):
+    """
+    A memory-lean queue of HSMs that share a template. The namespace,
+    element name and language are stored once, recipients are packed
+    into a single buffer and only recipients with their own
+    localizable params carry a params list.
+    """
+    namespace = attr.ib()
+    element_name = attr.ib()
+    language_code = attr.ib()
+    language_policy = attr.ib(
+        default="fallback",
+        validator=attr.validators.in_(["fallback", "deterministic"]))
+    localizable_params = attr.ib(default=attr.Factory(list))
+
+    _recipients = attr.ib(
+        init=False, repr=False, default=attr.Factory(bytearray))
+    _offsets = attr.ib(
+        init=False, repr=False, default=attr.Factory(lambda: array('L', [0])))
+    _params = attr.ib(init=False, repr=False, default=attr.Factory(dict))
+
+    def append(self, to, localizable_params=None):
+        """
+        :param str to:
+            The WhatsApp ID
+        :param list localizable_params:
+            Params for this recipient only, defaults to the batch's
+            ``localizable_params``
+        """
+        if localizable_params is not None:
+            self._params[len(self)] = localizable_params
+        self._recipients.extend(to.encode('utf-8'))
+        self._offsets.append(len(self._recipients))
+
+    def extend(self, recipients):
+        for to in recipients:
+            self.append(to)
+
+    def get_recipient(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('HSMBatch index out of range')
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._recipients[start:end].decode('utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        to = self.get_recipient(index)
+        if index < 0:
+            index += len(self)
+        return HSMCommand(
+            to=to,
+            namespace=self.namespace,
+            element_name=self.element_name,
+            language_code=self.language_code,
+            language_policy=self.language_policy,
+            localizable_params=self._params.get(
+                index, self.localizable_params))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+@attr.s(slots=True, frozen=True)
 class MediaCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/messages'
@@ -167,7 +239,7 @@ class MediaCommand(BaseCommand):
         return doc
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class BackupCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/settings/backup'
@@ -175,7 +247,7 @@ class BackupCommand(BaseCommand):
     password = attr.ib()
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RestoreBackupCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/settings/restore'
@@ -184,7 +256,7 @@ class RestoreBackupCommand(BaseCommand):
     data = attr.ib()
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class ContactsCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/contacts'
@@ -203,7 +275,7 @@ class ContactsCommand(BaseCommand):
         validator=attr.validators.in_([WAIT, NO_WAIT]))
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RegistrationCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/account'
@@ -224,7 +296,7 @@ class RegistrationCommand(BaseCommand):
         return data
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class VerifyCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/account/verify'
@@ -232,7 +304,7 @@ class VerifyCommand(BaseCommand):
     code = attr.ib(type=str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class AboutCommand(BaseCommand):
     command_method = PATCH
     command_endpoint = '/v1/settings/profile/about'
@@ -240,12 +312,12 @@ class AboutCommand(BaseCommand):
     text = attr.ib(type=str)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class Webhooks():
     url = attr.ib(default=None)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class ApplicationSettingsCommand(BaseCommand):
     command_method = PATCH
     command_endpoint = '/v1/settings/application'
@@ -263,7 +335,7 @@ class ApplicationSettingsCommand(BaseCommand):
     unhealthy_interval = attr.ib(type=int, default=30)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class BusinessProfileCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/settings/business/profile'
@@ -275,7 +347,7 @@ class BusinessProfileCommand(BaseCommand):
     websites = attr.ib(default=attr.Factory(list), validator=validate_websites)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class CreateGroupCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/groups'
@@ -283,7 +355,7 @@ class CreateGroupCommand(BaseCommand):
     subject = attr.ib()
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class UpdateGroupCommand(BaseCommand):
     command_method = PUT
 
@@ -294,13 +366,13 @@ class UpdateGroupCommand(BaseCommand):
         return '/v1/groups/%s' % (self.group_id,)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RetrieveGroups(BaseCommand):
     command_method = GET
     command_endpoint = '/v1/groups'
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RevokeGroupInviteLink(BaseCommand):
     command_method = DELETE
 
@@ -310,7 +382,7 @@ class RevokeGroupInviteLink(BaseCommand):
         return '/v1/groups/%s/invite' % (self.group_id,)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class AddGroupAdminCommand(BaseCommand):
     command_method = PATCH
 
@@ -326,12 +398,12 @@ class AddGroupAdminCommand(BaseCommand):
         }
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RemoveGroupAdminCommand(AddGroupAdminCommand):
     command_method = DELETE
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class RemoveGroupParticipantCommand(AddGroupAdminCommand):
     command_method = DELETE
 
@@ -339,7 +411,7 @@ class RemoveGroupParticipantCommand(AddGroupAdminCommand):
         return '/v1/groups/%s/participants' % (self.group_id,)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class LeaveGroupCommand(BaseCommand):
     command_method = POST
 
@@ -349,7 +421,7 @@ class LeaveGroupCommand(BaseCommand):
         return '/v1/groups/%s/leave' % (self.group_id,)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class UpdatePasswordCommand(BaseCommand):
     command_method = PUT
 
@@ -365,7 +437,7 @@ class UpdatePasswordCommand(BaseCommand):
         }
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class CreateUserCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/users'
@@ -374,7 +446,7 @@ class CreateUserCommand(BaseCommand):
     password = attr.ib(validator=min_max(8, 64))
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class SetShardingCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/account/shards'
@@ -388,7 +460,7 @@ class SetShardingCommand(BaseCommand):
     pin = attr.ib(type=str, default=None)
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
 class InitialPasswordCommand(BaseCommand):
     command_method = POST
     command_endpoint = '/v1/users/login'
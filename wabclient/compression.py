@@ -0,0 +1,115 @@
+import gzip
+import io
+import zlib
+
+from wabclient.breaker import endpoint_class
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+ENCODINGS = (GZIP, DEFLATE)
+
+DEFAULT_THRESHOLD = 8 * 1024
+DEFAULT_LEVEL = 6
+# Compressing a body that ends up nearly as large wastes the server's
+# CPU as well as ours.
+MIN_SAVING = 0.1
+
+# These formats are compressed already.
+INCOMPRESSIBLE_TYPES = (
+    'image/jpeg', 'image/png', 'image/webp', 'image/gif', 'audio/',
+    'video/', 'application/zip', 'application/gzip')
+
+
+def compress(data, encoding=GZIP, level=DEFAULT_LEVEL):
+    if encoding == GZIP:
+        # gzip.compress only takes mtime from Python 3.8
+        buffer = io.BytesIO()
+        with gzip.GzipFile(
+                fileobj=buffer, mode='wb', compresslevel=level,
+                mtime=0) as fp:
+            fp.write(data)
+        return buffer.getvalue()
+    if encoding == DEFLATE:
+        return zlib.compress(data, level)
+    raise ValueError('Unsupported encoding %r' % (encoding,))
+
+
+class Compression(object):
+    """
+    Decides which request bodies to compress.
+
+    Bodies of at least ``threshold`` bytes are compressed unless their
+    content type is known to be compressed already or compression
+    saves less than 10%. Thresholds can be set per endpoint class, the
+    first path segment after the version, so ``{'contacts': 1024,
+    'media': None}`` compresses contact checks from 1 KB and never
+    compresses media uploads. An endpoint that rejects compressed
+    bodies with ``415 Unsupported Media Type`` is sent uncompressed
+    bodies from then on.
+    """
+
+    def __init__(self, encoding=GZIP, threshold=DEFAULT_THRESHOLD,
+                 level=DEFAULT_LEVEL, endpoints=None,
+                 incompressible_types=INCOMPRESSIBLE_TYPES,
+                 accept_encoding=None):
+        """
+        :param str encoding:
+            ``gzip`` or ``deflate``
+        :param int threshold:
+            The smallest body in bytes to compress
+        :param int level:
+            The compression level, 1 (fastest) to 9 (smallest)
+        :param dict endpoints:
+            Thresholds per endpoint class, ``None`` disables compression
+            for the class
+        :param tuple incompressible_types:
+            Content types, or prefixes ending in ``/``, never compressed
+        :param str accept_encoding:
+            An ``Accept-Encoding`` header to send with compressed
+            requests, defaults to ``None`` which keeps the session's,
+            ``requests`` already asks for gzip and deflate responses
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError('Unsupported encoding %r' % (encoding,))
+        self.encoding = encoding
+        self.threshold = threshold
+        self.level = level
+        self.endpoints = endpoints or {}
+        self.incompressible_types = incompressible_types
+        self.accept_encoding = accept_encoding
+        self.rejected = set()
+
+    def threshold_for(self, path):
+        name = endpoint_class(path)
+        if name in self.rejected:
+            return None
+        return self.endpoints.get(name, self.threshold)
+
+    def compressible(self, content_type):
+        if not content_type:
+            return True
+        content_type = content_type.split(';')[0].strip().lower()
+        return not any(
+            content_type.startswith(prefix) if prefix.endswith('/')
+            else content_type == prefix
+            for prefix in self.incompressible_types)
+
+    def compress(self, path, data, content_type=None):
+        """
+        Returns the body to send and the headers to add for it.
+
+        :return: tuple(bytes, dict)
+        """
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        threshold = self.threshold_for(path)
+        if (threshold is None or len(data) < threshold or
+                not self.compressible(content_type)):
+            return (data, {})
+        compressed = compress(data, self.encoding, self.level)
+        if len(compressed) > len(data) * (1 - MIN_SAVING):
+            return (data, {})
+        return (compressed, {'Content-Encoding': self.encoding})
+
+    def reject(self, path):
+        self.rejected.add(endpoint_class(path))
@@ -0,0 +1,373 @@
+import csv
+import threading
+import time
+
+import attr
+
+from wabclient.client import DEFAULT_CONCURRENCY, iter_bulk
+from wabclient.commands import ContactsCommand
+
+DEFAULT_BATCH_SIZE = 1000
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 10000
+DEFAULT_TARGET_LATENCY = 2.0
+DEFAULT_MAX_POLLS = 5
+DEFAULT_POLL_DELAY = 1.0
+MAX_POLL_DELAY = 60.0
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+IMPORT_BATCH_SIZE = 100000
+
+# The status of numbers whose requests kept failing, so the API never
+# answered for them.
+STATUS_ERROR = 'error'
+
+
+@attr.s(slots=True, frozen=True)
+class ContactResult(object):
+    input = attr.ib(type=str)
+    status = attr.ib(type=str)
+    wa_id = attr.ib(type=str, default=None)
+
+
+@attr.s(slots=True, frozen=True)
+class ContactRecord(object):
+    msisdn = attr.ib(type=str)
+    status = attr.ib(type=str)
+    wa_id = attr.ib(type=str, default=None)
+    checked_at = attr.ib(type=float, default=None)
+
+
+class ContactStore(object):
+    """
+    A persistent map of numbers to their WhatsApp id and status, kept
+    in an SQLite database so it can be shared between processes and
+    runs. The database is in WAL mode so readers don't block the
+    writer, lookups are a primary key search.
+
+    Records older than ``max_age`` seconds are treated as missing so
+    numbers are checked again now and then.
+    """
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE, clock=time.time):
+        """
+        :param str path:
+            The database file
+        :param float max_age:
+            The number of seconds a record is trusted for, ``None`` to
+            trust records forever
+        :param callable clock:
+            Returns the current time, defaults to ``time.time``
+        """
+        import sqlite3
+
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            path, timeout=30, isolation_level=None,
+            check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS contacts ('
+            'msisdn TEXT PRIMARY KEY, wa_id TEXT, status TEXT NOT NULL, '
+            'checked_at REAL NOT NULL) WITHOUT ROWID')
+
+    def oldest(self):
+        if self.max_age is None:
+            return float('-inf')
+        return self.clock() - self.max_age
+
+    def get(self, msisdn):
+        """
+        :return: ContactRecord or ``None``
+        """
+        with self.lock:
+            row = self.db.execute(
+                'SELECT msisdn, status, wa_id, checked_at FROM contacts '
+                'WHERE msisdn = ? AND checked_at > ?',
+                (msisdn, self.oldest())).fetchone()
+        return ContactRecord(*row) if row else None
+
+    def put(self, msisdn, status, wa_id=None):
+        self.put_many([(msisdn, status, wa_id)])
+
+    def put_many(self, records, checked_at=None):
+        """
+        Stores ``(msisdn, status, wa_id)`` records, committing every
+        ``IMPORT_BATCH_SIZE`` records.
+
+        :return: int, the number of records stored
+        """
+        if checked_at is None:
+            checked_at = self.clock()
+        rows = (
+            (record[0], record[2], record[1],
+             record[3] if len(record) > 3 else checked_at)
+            for record in records)
+        count = 0
+        while True:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    break
+            if not batch:
+                return count
+            with self.lock:
+                self.db.execute('BEGIN IMMEDIATE')
+                try:
+                    self.db.executemany(
+                        'INSERT OR REPLACE INTO contacts '
+                        '(msisdn, wa_id, status, checked_at) '
+                        'VALUES (?, ?, ?, ?)', batch)
+                except BaseException:
+                    self.db.execute('ROLLBACK')
+                    raise
+                self.db.execute('COMMIT')
+            count += len(batch)
+
+    def import_csv(self, fp):
+        """
+        Imports ``msisdn,wa_id,status[,checked_at]`` rows as written by
+        ``export_csv``.
+
+        :return: int, the number of records imported
+        """
+        def records():
+            for row in csv.reader(fp):
+                if len(row) >= 4 and row[3]:
+                    yield (row[0], row[2], row[1] or None, float(row[3]))
+                elif len(row) >= 3:
+                    yield (row[0], row[2], row[1] or None)
+        return self.put_many(records())
+
+    def export_csv(self, fp):
+        """
+        Writes every record that is still fresh as a
+        ``msisdn,wa_id,status,checked_at`` row.
+
+        :return: int, the number of records exported
+        """
+        writer = csv.writer(fp)
+        count = 0
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT msisdn, wa_id, status, checked_at FROM contacts '
+                'WHERE checked_at > ? ORDER BY msisdn', (self.oldest(),))
+            for row in rows:
+                writer.writerow([row[0], row[1] or '', row[2], repr(row[3])])
+                count += 1
+        return count
+
+    def purge(self):
+        """
+        Removes records older than ``max_age``.
+        """
+        with self.lock:
+            self.db.execute(
+                'DELETE FROM contacts WHERE checked_at <= ?', (self.oldest(),))
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute(
+                'SELECT COUNT(*) FROM contacts WHERE checked_at > ?',
+                (self.oldest(),)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class BatchSizer(object):
+    """
+    Grows the batch size while batches come back faster than the target
+    latency and halves it when they are slower.
+    """
+
+    def __init__(self, size=DEFAULT_BATCH_SIZE, minimum=MIN_BATCH_SIZE,
+                 maximum=MAX_BATCH_SIZE,
+                 target_latency=DEFAULT_TARGET_LATENCY):
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+
+    def record(self, latency):
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        elif latency < self.target_latency / 2:
+            self.size = min(self.maximum, self.size + self.size // 4 + 1)
+
+
+def unique(numbers):
+    seen = set()
+    for number in numbers:
+        number = number.strip()
+        if number and number not in seen:
+            seen.add(number)
+            yield number
+
+
+class ContactChecker(object):
+    """
+    Resolves a stream of numbers to WhatsApp ids with ``/v1/contacts``.
+
+    Numbers are deduplicated and checked in batches with at most
+    ``concurrency`` requests in flight. The batch size adapts to keep
+    requests close to ``target_latency`` seconds. Numbers the API
+    reports as ``processing`` are checked again in later rounds, with
+    the delay between rounds doubling up to ``max_polls`` rounds.
+    """
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE,
+                 min_batch_size=MIN_BATCH_SIZE,
+                 max_batch_size=MAX_BATCH_SIZE,
+                 target_latency=DEFAULT_TARGET_LATENCY,
+                 concurrency=DEFAULT_CONCURRENCY, max_polls=DEFAULT_MAX_POLLS,
+                 poll_delay=DEFAULT_POLL_DELAY, store=None, sleep=time.sleep):
+        """
+        :param Client client:
+            The client to check with
+        :param int batch_size:
+            The initial number of contacts per request
+        :param int min_batch_size:
+            The smallest batch size to adapt down to
+        :param int max_batch_size:
+            The largest batch size to adapt up to
+        :param float target_latency:
+            The request latency in seconds to adapt the batch size to
+        :param int concurrency:
+            The maximum number of requests in flight
+        :param int max_polls:
+            The number of times to check a number again while it is
+            ``processing``
+        :param float poll_delay:
+            The delay before the first recheck, doubled every round
+        :param ContactStore store:
+            A store to answer from before checking with the API and to
+            save results to, defaults to the client's ``contact_store``
+        :param callable sleep:
+            Sleeps between rounds, defaults to ``time.sleep``
+        """
+        self.client = client
+        self.sizer = BatchSizer(
+            batch_size, min_batch_size, max_batch_size, target_latency)
+        self.concurrency = concurrency
+        self.max_polls = max_polls
+        self.poll_delay = poll_delay
+        self.store = (
+            store if store is not None
+            else getattr(client, 'contact_store', None))
+        self.sleep = sleep
+
+    def check_batch(self, batch):
+        if not batch:
+            return []
+        started = time.time()
+        response = self.client.check_contacts(batch, wait=False)
+        self.sizer.record(time.time() - started)
+        return response['contacts']
+
+    def lookup(self, chunk):
+        """
+        Splits ``chunk`` into the numbers without a fresh record in the
+        store and results for the others.
+
+        :return: tuple(list of numbers, tuple of ContactResult)
+        """
+        (unknown, known) = ([], [])
+        for number in chunk:
+            record = self.store.get(number)
+            if record is None:
+                unknown.append(number)
+            else:
+                known.append(
+                    ContactResult(number, record.status, record.wa_id))
+        return (unknown, tuple(known))
+
+    def batches(self, numbers, lookup=False):
+        """
+        Yields ``((batch, known), (batch,))`` for ``iter_bulk``. With
+        ``lookup`` every chunk of input is split into store hits, which
+        travel with the batch as ``known``, and the numbers left to
+        check, so hits stream out however warm the store is.
+        """
+        chunk = []
+        for number in numbers:
+            chunk.append(number)
+            if len(chunk) >= self.sizer.size:
+                yield self.batch_for(chunk, lookup)
+                chunk = []
+        if chunk:
+            yield self.batch_for(chunk, lookup)
+
+    def batch_for(self, chunk, lookup):
+        (batch, known) = self.lookup(chunk) if lookup else (chunk, ())
+        return ((tuple(batch), known), (batch,))
+
+    def check_round(self, numbers, retry, failed, lookup=False):
+        """
+        Checks ``numbers`` once, yielding the resolved results. Numbers
+        that are still processing are added to ``retry``, numbers whose
+        request failed to ``failed``. With ``lookup`` numbers with a
+        fresh record in the store are answered from it instead.
+        """
+        for ((batch, known), contacts, exception) in iter_bulk(
+                self.check_batch, self.batches(numbers, lookup),
+                concurrency=self.concurrency):
+            for result in known:
+                yield result
+            if exception is not None:
+                failed.extend(batch)
+                continue
+            answered = set()
+            resolved = []
+            for contact in contacts:
+                answered.add(contact['input'])
+                if contact['status'] == ContactsCommand.PROCESSING:
+                    retry.append(contact['input'])
+                else:
+                    resolved.append(ContactResult(
+                        contact['input'], contact['status'],
+                        contact.get('wa_id')))
+            retry.extend(
+                number for number in batch if number not in answered)
+            if self.store is not None and resolved:
+                self.store.put_many(
+                    (result.input, result.status, result.wa_id)
+                    for result in resolved)
+            for result in resolved:
+                yield result
+
+    def iter_check(self, numbers):
+        """
+        Checks every number, yielding results as they are resolved.
+        Numbers still ``processing`` after the last poll are yielded
+        with that status, numbers whose requests kept failing with
+        ``STATUS_ERROR``.
+
+        :param iterable numbers:
+            E.164 formatted numbers, duplicates are skipped
+        :return: generator of ContactResult
+        """
+        (retry, failed) = ([], [])
+        for result in self.check_round(
+                unique(numbers), retry, failed,
+                lookup=self.store is not None):
+            yield result
+
+        delay = self.poll_delay
+        for _ in range(self.max_polls):
+            if not (retry or failed):
+                return
+            self.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_DELAY)
+            (numbers, retry, failed) = (retry + failed, [], [])
+            for result in self.check_round(numbers, retry, failed):
+                yield result
+
+        for number in retry:
+            yield ContactResult(number, ContactsCommand.PROCESSING)
+        for number in failed:
+            yield ContactResult(number, STATUS_ERROR)
@@ -25,3 +25,11 @@ class RequestRateLimitingException(WhatsAppAPIException):
 
 class ConcurrencyRateLimitingException(WhatsAppAPIException):
     pass
+
+
+class CircuitOpenException(WhatsAppAPIException):
+    pass
+
+
+class DuplicateSendException(WhatsAppAPIException):
+    pass
@@ -0,0 +1,184 @@
+import threading
+
+DEFAULT_MAX_CONNECTIONS = 4
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+# httpx is an optional dependency, ``pip install wabclient[http2]``, and
+# is imported when an adapter is created so that importing this module
+# stays cheap.
+
+
+def timeout_for(timeout):
+    import httpx
+
+    if isinstance(timeout, tuple):
+        (connect, read) = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def body_for(body):
+    if body is None or isinstance(body, (bytes, str)):
+        return body
+    if hasattr(body, 'read'):
+        return iter(lambda: body.read(DEFAULT_CHUNK_SIZE), b'')
+    return body
+
+
+class HTTP2Body(object):
+    """
+    The ``raw`` attribute of responses from ``HTTP2Adapter``, standing in
+    for urllib3's response. Like urllib3, ``read`` only decodes gzip and
+    deflate content when ``decode_content`` is set.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.decode_content = False
+        self.chunks = None
+        self.buffer = b''
+
+    def stream(self, chunk_size=DEFAULT_CHUNK_SIZE, decode_content=None):
+        import httpx
+        import requests
+
+        if decode_content is None:
+            decode_content = self.decode_content
+        if self.buffer:
+            (chunk, self.buffer) = (self.buffer, b'')
+            yield chunk
+        if self.chunks is None:
+            self.chunks = (
+                self.response.iter_bytes(chunk_size) if decode_content
+                else self.response.iter_raw(chunk_size))
+        try:
+            for chunk in self.chunks:
+                yield chunk
+        except httpx.TransportError as exception:
+            raise requests.exceptions.ChunkedEncodingError(exception)
+        self.close()
+
+    def read(self, amt=None):
+        chunks = self.stream()
+        while amt is None or len(self.buffer) < amt:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if amt is None:
+            (data, self.buffer) = (self.buffer, b'')
+        else:
+            (data, self.buffer) = (self.buffer[:amt], self.buffer[amt:])
+        return data
+
+    def close(self):
+        self.response.close()
+
+    release_conn = close
+
+
+class HTTP2Adapter(object):
+    """
+    A ``requests`` transport adapter that sends requests over HTTP/2
+    with ``httpx``, so concurrent requests to a gateway share a few
+    multiplexed connections instead of opening one each. Mount it on a
+    session or pass it to ``Client``, ``Connection`` or ``ClientPool``
+    as ``transport``::
+
+        client = Client(url, transport=HTTP2Adapter(max_connections=2))
+
+    Servers that don't negotiate HTTP/2 with ALPN are spoken to over
+    HTTP/1.1. TLS verification, client certificates and proxies are
+    settings of the adapter rather than of each request.
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, verify=True,
+                 cert=None, proxy=None, client=None):
+        """
+        :param int max_connections:
+            The most connections to open, shared by every host
+        :param verify:
+            ``False`` or a CA bundle path, as for ``requests``
+        :param cert:
+            A client certificate path or ``(cert, key)`` tuple
+        :param str proxy:
+            A proxy URL
+        :param httpx.Client client:
+            The client to send with, for full control over its settings
+        """
+        import httpx
+
+        if client is None:
+            client = httpx.Client(
+                http2=True, verify=verify, cert=cert, proxy=proxy,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections))
+        self.client = client
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        import httpx
+        import requests
+
+        http2_request = self.client.build_request(
+            request.method, request.url, headers=dict(request.headers),
+            content=body_for(request.body), timeout=timeout_for(timeout))
+        try:
+            http2_response = self.client.send(http2_request, stream=True)
+        except httpx.TimeoutException as exception:
+            if isinstance(exception, httpx.ConnectTimeout):
+                raise requests.exceptions.ConnectTimeout(
+                    exception, request=request)
+            raise requests.exceptions.ReadTimeout(exception, request=request)
+        except httpx.TransportError as exception:
+            raise requests.exceptions.ConnectionError(
+                exception, request=request)
+        with self.lock:
+            self.requests += 1
+        response = self.build_response(request, http2_response)
+        if not stream:
+            # frees the stream for other requests on the connection
+            response.content
+        return response
+
+    def build_response(self, request, http2_response):
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        response = requests.Response()
+        response.status_code = http2_response.status_code
+        response.headers = CaseInsensitiveDict(http2_response.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = http2_response.reason_phrase
+        response.raw = HTTP2Body(http2_response)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def connection_stats(self):
+        """
+        Returns the number of open connections and requests made.
+
+        The connection count is best-effort, httpx doesn't expose its
+        pool so it is read from httpx's internals and is 0 when they
+        aren't there, with a custom transport or a newer httpx.
+
+        :return: tuple(connections, requests)
+        """
+        transport = getattr(self.client, '_transport', None)
+        connections = getattr(
+            getattr(transport, '_pool', None), 'connections', None)
+        try:
+            count = len(connections)
+        except TypeError:
+            count = 0
+        return (count, self.requests)
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,349 @@
+import collections
+import hashlib
+import json
+import threading
+import time
+
+from wabclient.cache import Flight
+from wabclient.exceptions import (
+    CircuitOpenException, DuplicateSendException)
+
+DEFAULT_WINDOW = 24 * 60 * 60
+DEFAULT_MAX_KEYS = 5000000
+DEFAULT_BUCKETS = 24
+PURGE_EVERY = 10000
+
+MESSAGES_ENDPOINT = '/v1/messages'
+
+# Recorded before a send goes out and replaced by the message id once
+# it is accepted, so a send that timed out or a process that died
+# mid-send leaves a marker that the message may have gone out.
+AMBIGUOUS = '?'
+
+
+def command_key(command):
+    """
+    Returns a 16 byte key for a command, derived from its endpoint and
+    rendered payload, which includes the recipient.
+    """
+    payload = json.dumps(
+        [command.get_endpoint(), command.render()],
+        sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(
+        payload.encode('utf-8'), digest_size=16,
+        person=b'wabclient-cmd').digest()
+
+
+def caller_key(key):
+    """
+    Returns a 16 byte key for a caller supplied idempotency key.
+    """
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return hashlib.blake2b(
+        key, digest_size=16, person=b'wabclient-key').digest()
+
+
+def is_ambiguous(exception):
+    """
+    Whether a failed send may still have been delivered to the API.
+    Failures before a connection was made and error responses are
+    definite, timeouts and dropped connections are not.
+    """
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(exception, CircuitOpenException):
+        return False
+    if isinstance(exception, requests.HTTPError):
+        response = exception.response
+        return response is not None and response.status_code == 504
+    if isinstance(exception, requests.ConnectTimeout):
+        return False
+    if isinstance(exception, requests.ConnectionError):
+        reason = getattr(
+            exception.args[0] if exception.args else None, 'reason', None)
+        return not isinstance(reason, NewConnectionError)
+    return True
+
+
+def sent_message_id(data):
+    try:
+        [message] = data['messages']
+        return message['id']
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class MemoryStore(object):
+    """
+    Remembers keys for at least ``window`` seconds in memory.
+
+    Keys are kept in generations that each cover ``window / buckets``
+    seconds, expiring a generation drops all of its keys at once so no
+    per key timestamps are stored. Once more than ``max_keys`` keys are
+    held the oldest generations are dropped early.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_keys=DEFAULT_MAX_KEYS,
+                 buckets=DEFAULT_BUCKETS, clock=time.time):
+        """
+        :param float window:
+            The number of seconds keys are remembered for
+        :param int max_keys:
+            The maximum number of keys held
+        :param int buckets:
+            The number of generations the window is split into
+        :param callable clock:
+            Returns the current time, defaults to ``time.time``
+        """
+        self.window = window
+        self.max_keys = max_keys
+        self.span = float(window) / buckets
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.generations = collections.deque()
+        self.size = 0
+
+    def rotate(self):
+        now = self.clock()
+        generations = self.generations
+        while generations and (
+                generations[0][0] + self.span + self.window <= now):
+            self.size -= len(generations.popleft()[1])
+        if not generations or generations[-1][0] + self.span <= now:
+            generations.append((now, {}))
+        while self.size > self.max_keys and len(generations) > 1:
+            self.size -= len(generations.popleft()[1])
+
+    def get(self, key):
+        with self.lock:
+            self.rotate()
+            for (_, entries) in reversed(self.generations):
+                value = entries.get(key)
+                if value is not None:
+                    return value
+            return None
+
+    def claim(self, key):
+        """
+        Returns the value for ``key``, marking it ``AMBIGUOUS`` if it
+        has none.
+        """
+        with self.lock:
+            self.rotate()
+            for (_, entries) in reversed(self.generations):
+                value = entries.get(key)
+                if value is not None:
+                    return value
+            self.generations[-1][1][key] = AMBIGUOUS
+            self.size += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.rotate()
+            # a claim made in an older generation moves to the newest
+            for (_, entries) in list(self.generations)[:-1]:
+                if entries.pop(key, None) is not None:
+                    self.size -= 1
+            entries = self.generations[-1][1]
+            if key not in entries:
+                self.size += 1
+            entries[key] = value
+
+    def delete(self, key):
+        with self.lock:
+            for (_, entries) in self.generations:
+                if entries.pop(key, None) is not None:
+                    self.size -= 1
+
+    def __len__(self):
+        return self.size
+
+
+class SQLiteStore(object):
+    """
+    Remembers keys for ``window`` seconds in an SQLite database so
+    duplicates are suppressed across restarts and between processes
+    sharing the file.
+    """
+
+    def __init__(self, path, window=DEFAULT_WINDOW, clock=time.time):
+        """
+        :param str path:
+            The database file
+        :param float window:
+            The number of seconds keys are remembered for
+        :param callable clock:
+            Returns the current time, defaults to ``time.time``
+        """
+        import sqlite3
+
+        self.window = window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.db = sqlite3.connect(
+            path, timeout=30, isolation_level=None,
+            check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS sends ('
+            'key BLOB PRIMARY KEY, value TEXT NOT NULL, '
+            'created REAL NOT NULL) WITHOUT ROWID')
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT value FROM sends WHERE key = ? AND created > ?',
+                (key, self.clock() - self.window)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, key):
+        """
+        Returns the value for ``key``, marking it ``AMBIGUOUS`` if it
+        has none. The check and the mark happen in one transaction so
+        only one process sharing the database gets to send.
+        """
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.db.execute(
+                    'SELECT value FROM sends WHERE key = ? AND created > ?',
+                    (key, self.clock() - self.window)).fetchone()
+                if row is None:
+                    self.db.execute(
+                        'INSERT OR REPLACE INTO sends (key, value, created) '
+                        'VALUES (?, ?, ?)', (key, AMBIGUOUS, self.clock()))
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+        return row[0] if row else None
+
+    def put(self, key, value):
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO sends (key, value, created) '
+                'VALUES (?, ?, ?)', (key, value, self.clock()))
+            self.writes += 1
+            if self.writes % PURGE_EVERY == 0:
+                self.purge()
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute('DELETE FROM sends WHERE key = ?', (key,))
+
+    def purge(self):
+        self.db.execute(
+            'DELETE FROM sends WHERE created <= ?',
+            (self.clock() - self.window,))
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute(
+                'SELECT COUNT(*) FROM sends WHERE created > ?',
+                (self.clock() - self.window,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class IdempotentConnection(object):
+    """
+    Wraps a connection so a message is sent at most once per key
+    within the store's window. Sending a duplicate returns the message
+    id of the first send instead of sending again, everything other
+    than message sends goes to the connection directly::
+
+        client = Client(url, session=session)
+        client.connection = IdempotentConnection(
+            client.connection, SQLiteStore('sends.db'))
+
+    Without an explicit ``idempotency_key`` the key is derived from the
+    recipient and rendered payload. A key whose earlier send may or may
+    not have gone out raises ``DuplicateSendException`` unless
+    ``resend_ambiguous`` is set.
+    """
+
+    def __init__(self, connection, store=None, resend_ambiguous=False):
+        """
+        :param Connection connection:
+            The connection to send through
+        :param store:
+            A ``MemoryStore`` or ``SQLiteStore``, defaults to a
+            ``MemoryStore``
+        :param bool resend_ambiguous:
+            Whether to send again when an earlier send's outcome is
+            unknown
+        """
+        self.connection = connection
+        self.store = MemoryStore() if store is None else store
+        self.resend_ambiguous = resend_ambiguous
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.suppressed = 0
+
+    def send(self, command, idempotency_key=None):
+        if idempotency_key is not None:
+            key = caller_key(idempotency_key)
+        elif command.get_endpoint() == MESSAGES_ENDPOINT:
+            key = command_key(command)
+        else:
+            return self.connection.send(command)
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            data = flight.wait()
+            self.count_suppressed()
+            return data
+
+        try:
+            data = self.send_once(key, command)
+        except BaseException as exception:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.fail(exception)
+            raise
+        with self.lock:
+            self.flights.pop(key, None)
+        flight.resolve(data)
+        return data
+
+    def send_once(self, key, command):
+        previous = self.store.claim(key)
+        if previous == AMBIGUOUS:
+            if not self.resend_ambiguous:
+                raise DuplicateSendException(
+                    'An earlier send with this key may have been delivered')
+        elif previous is not None:
+            self.count_suppressed()
+            return {'messages': [{'id': previous}]}
+
+        try:
+            data = self.connection.send(command)
+        except Exception as exception:
+            if not is_ambiguous(exception):
+                self.store.delete(key)
+            raise
+
+        message_id = sent_message_id(data)
+        if message_id is None:
+            self.store.delete(key)
+        else:
+            self.store.put(key, message_id)
+        return data
+
+    def count_suppressed(self):
+        with self.lock:
+            self.suppressed += 1
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
@@ -0,0 +1,222 @@
+import json
+import math
+import threading
+import time
+
+import attr
+
+from wabclient.client import error_map, fail, default_exception
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = int(math.ceil(pct / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(index, 0)]
+
+
+def classify_error(exception):
+    """
+    Returns a name for the class of error, using ``error_map`` for
+    HTTP errors returned by the API.
+
+    :param Exception exception:
+        The exception raised while sending
+    :return: str
+    """
+    response = getattr(exception, 'response', None)
+    if response is None:
+        return exception.__class__.__name__
+    try:
+        exception_class = fail(response.json()).__class__
+    except ValueError:
+        exception_class = default_exception
+    if exception_class is default_exception:
+        exception_class = error_map.get(response.status_code)
+    if exception_class is None:
+        return 'HTTP %s' % (response.status_code,)
+    return exception_class.__name__
+
+
+def connection_stats(session):
+    """
+    Returns the number of connections opened and requests made
+    over the ``requests`` session's connection pools.
+
+    :return: tuple(connections, requests)
+    """
+    connections = requests = 0
+    adapters = dict(
+        (id(adapter), adapter) for adapter in session.adapters.values())
+    for adapter in adapters.values():
+        if hasattr(adapter, 'connection_stats'):
+            (opened, made) = adapter.connection_stats()
+            connections += opened
+            requests += made
+            continue
+        poolmanager = getattr(adapter, 'poolmanager', None)
+        if poolmanager is None:
+            continue
+        for key in list(poolmanager.pools.keys()):
+            pool = poolmanager.pools.get(key)
+            connections += getattr(pool, 'num_connections', 0)
+            requests += getattr(pool, 'num_requests', 0)
+    return (connections, requests)
+
+
+@attr.s(slots=True)
+class LoadTestReport(object):
+    duration = attr.ib(type=float)
+    requests = attr.ib(type=int)
+    successes = attr.ib(type=int)
+    errors = attr.ib(default=attr.Factory(dict))
+    latencies = attr.ib(default=attr.Factory(dict))
+    connections = attr.ib(type=int, default=None)
+    connection_requests = attr.ib(type=int, default=None)
+
+    @property
+    def throughput(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    @property
+    def requests_per_connection(self):
+        if not self.connections:
+            return None
+        return self.connection_requests / float(self.connections)
+
+    def as_dict(self):
+        return {
+            'duration': self.duration,
+            'requests': self.requests,
+            'successes': self.successes,
+            'throughput': self.throughput,
+            'latency': self.latencies,
+            'errors': self.errors,
+            'connections': {
+                'opened': self.connections,
+                'requests': self.connection_requests,
+                'requests_per_connection': self.requests_per_connection,
+            },
+        }
+
+    def as_json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def as_table(self):
+        def ms(value):
+            return '-' if value is None else '%.1f ms' % (value * 1000,)
+
+        rows = [
+            ('duration', '%.2f s' % (self.duration,)),
+            ('requests', str(self.requests)),
+            ('successes', str(self.successes)),
+            ('throughput', '%.1f req/s' % (self.throughput,)),
+        ]
+        for name in ['p%s' % (pct,) for pct in PERCENTILES] + ['max']:
+            rows.append(('latency %s' % (name,), ms(self.latencies.get(name))))
+        if self.connections is not None:
+            rows.append(('connections opened', str(self.connections)))
+            rows.append((
+                'requests/connection',
+                '%.1f' % (self.requests_per_connection or 0,)))
+        for error, count in sorted(self.errors.items()):
+            rows.append(('error %s' % (error,), str(count)))
+        width = max(len(name) for name, _ in rows)
+        return '\n'.join(
+            '%s  %s' % (name.ljust(width), value) for name, value in rows)
+
+
+class LoadTest(object):
+    """
+    Calls ``send`` from ``concurrency`` threads for ``duration``
+    seconds, optionally paced to a target ``rate`` per second.
+    """
+
+    def __init__(self, send, concurrency=10, rate=None, duration=10,
+                 session=None):
+        """
+        :param callable send:
+            Called without arguments to send a single request
+        :param int concurrency:
+            The number of requests in flight at most
+        :param float rate:
+            The target requests per second, defaults to ``None``
+            which sends as fast as ``concurrency`` allows.
+        :param float duration:
+            The number of seconds to run for
+        :param requests.Session session:
+            The session ``send`` uses, to report connection reuse.
+        """
+        self.send = send
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.session = session
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.ticket = 0
+
+    def next_slot(self, start, deadline):
+        with self.lock:
+            ticket = self.ticket
+            self.ticket += 1
+        if self.rate is None:
+            return time.time() < deadline
+        slot = start + ticket / float(self.rate)
+        if slot >= deadline or time.time() >= deadline:
+            return False
+        delay = slot - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def worker(self, start, deadline):
+        while self.next_slot(start, deadline):
+            sent_at = time.time()
+            try:
+                self.send()
+            except Exception as exception:
+                error = classify_error(exception)
+                with self.lock:
+                    self.errors[error] = self.errors.get(error, 0) + 1
+            else:
+                latency = time.time() - sent_at
+                with self.lock:
+                    self.latencies.append(latency)
+
+    def run(self):
+        """
+        :return: LoadTestReport
+        """
+        start = time.time()
+        deadline = start + self.duration
+        threads = [
+            threading.Thread(target=self.worker, args=(start, deadline))
+            for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.time() - start)
+
+    def report(self, duration):
+        latencies = sorted(self.latencies)
+        summary = dict(
+            ('p%s' % (pct,), percentile(latencies, pct))
+            for pct in PERCENTILES)
+        summary['max'] = latencies[-1] if latencies else None
+        (connections, connection_requests) = (
+            connection_stats(self.session) if self.session is not None
+            else (None, None))
+        return LoadTestReport(
+            duration=duration,
+            requests=len(latencies) + sum(self.errors.values()),
+            successes=len(latencies),
+            errors=dict(self.errors),
+            latencies=summary,
+            connections=connections,
+            connection_requests=connection_requests)
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+
+import attr
+
+from wabclient.exceptions import WhatsAppAPIException
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+PARTIAL_SUFFIX = '.part'
+STATE_SUFFIX = '.json'
+# Files smaller than two parts of this size are streamed in one go.
+MIN_PART_SIZE = 4 * 1024 * 1024
+
+# mimetypes' answers for these vary between Python versions and
+# platforms, so the types WhatsApp sends media as are pinned here.
+EXTENSIONS = {
+    'application/pdf': '.pdf',
+    'audio/aac': '.aac',
+    'audio/amr': '.amr',
+    'audio/mp4': '.m4a',
+    'audio/mpeg': '.mp3',
+    'audio/ogg': '.ogg',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'text/plain': '.txt',
+    'video/3gpp': '.3gp',
+    'video/mp4': '.mp4',
+}
+
+UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]')
+
+
+@attr.s(slots=True, frozen=True)
+class MediaFile(object):
+    media_id = attr.ib(type=str)
+    path = attr.ib(type=str)
+    content_type = attr.ib(type=str)
+    size = attr.ib(type=int)
+    sha256 = attr.ib(type=str)
+
+
+def media_type(content_type):
+    return (content_type or DEFAULT_CONTENT_TYPE).split(';')[0].strip().lower()
+
+
+def extension_for(content_type):
+    """
+    Returns the file extension, including the dot, for a content type
+    or an empty string if it is unknown.
+    """
+    content_type = media_type(content_type)
+    return (
+        EXTENSIONS.get(content_type) or
+        mimetypes.guess_extension(content_type) or '')
+
+
+def file_name_for(media_id, content_type):
+    return UNSAFE_CHARACTERS.sub('_', media_id) + extension_for(content_type)
+
+
+def download_to_dir(connection, media_id, dest_dir,
+                    chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Streams a media object into ``dest_dir``, named after its id with an
+    extension for its content type. The file only appears under its
+    final name once it has been downloaded completely, and nothing is
+    left behind when the download fails.
+
+    :param Connection connection:
+        The connection to download with
+    :param str media_id:
+        The media id
+    :param str dest_dir:
+        The directory to write to
+    :return: MediaFile
+    """
+    response = connection.stream_media(media_id)
+    try:
+        content_type = media_type(response.headers.get('Content-Type'))
+        path = os.path.join(dest_dir, file_name_for(media_id, content_type))
+        partial_path = path + PARTIAL_SUFFIX
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(partial_path, 'wb') as fp:
+                for chunk in iter(
+                        lambda: response.raw.read(chunk_size), b''):
+                    digest.update(chunk)
+                    fp.write(chunk)
+                    size += len(chunk)
+            os.replace(partial_path, path)
+        except BaseException:
+            discard(partial_path)
+            raise
+    finally:
+        response.close()
+    return MediaFile(
+        media_id=media_id, path=path, content_type=content_type,
+        size=size, sha256=digest.hexdigest())
+
+
+def ranged_size(connection, path):
+    """
+    Returns the size of ``path`` if the server advertises support for
+    byte range requests, ``None`` otherwise.
+    """
+    response = connection.head(path)
+    response.raise_for_status()
+    if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+        return None
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def split_parts(size, parts, min_part_size=MIN_PART_SIZE):
+    """
+    Splits ``size`` bytes into at most ``parts`` inclusive byte ranges
+    of at least ``min_part_size`` bytes.
+
+    :return: list of list(first, last)
+    """
+    parts = max(1, min(parts, size // min_part_size))
+    bounds = [size * index // parts for index in range(parts + 1)]
+    return [[start, end - 1] for (start, end) in zip(bounds, bounds[1:])]
+
+
+def discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def download_file(connection, path, dest_path, parts=1,
+                  min_part_size=MIN_PART_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Downloads ``path`` to ``dest_path`` through ``dest_path + '.part'``,
+    which is renamed into place once complete.
+
+    A single stream resumes from the end of an existing partial file
+    with a range request and starts over if the server answers with
+    the whole file instead. With more than one part, and a server that
+    advertises ``Accept-Ranges: bytes``, the file is preallocated and
+    the parts are fetched in parallel and written at their offsets.
+    Completed parts are recorded next to the partial file so running
+    the download again only fetches the missing ones.
+
+    :param Connection connection:
+        The connection to download with
+    :param str path:
+        The path to download
+    :param str dest_path:
+        The file to write to
+    :param int parts:
+        The number of byte ranges to fetch in parallel
+    :param int min_part_size:
+        The smallest part worth a request of its own
+    :return: int, the size of the file
+    """
+    partial_path = dest_path + PARTIAL_SUFFIX
+    size = None
+    if parts > 1 and hasattr(os, 'pwrite'):
+        size = ranged_size(connection, path)
+    if size is not None and size >= 2 * min_part_size:
+        download_parts(
+            connection, path, partial_path, size,
+            split_parts(size, parts, min_part_size), chunk_size)
+    else:
+        size = download_stream(connection, path, partial_path, chunk_size)
+    os.replace(partial_path, dest_path)
+    return size
+
+
+def download_stream(connection, path, partial_path, chunk_size):
+    import requests
+
+    state_path = partial_path + STATE_SUFFIX
+    if os.path.exists(state_path):
+        # holes left by a parallel download can't be resumed in order
+        discard(partial_path, state_path)
+    offset = (
+        os.path.getsize(partial_path) if os.path.exists(partial_path) else 0)
+
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers['Range'] = 'bytes=%s-' % (offset,)
+    try:
+        response = connection.stream(path, headers=headers)
+    except requests.HTTPError as exception:
+        if not offset or exception.response.status_code != 416:
+            raise
+        # the partial file doesn't match what the server has now
+        discard(partial_path)
+        return download_stream(connection, path, partial_path, chunk_size)
+
+    try:
+        if response.status_code == 206:
+            mode = 'ab'
+        else:
+            (mode, offset) = ('wb', 0)
+        with open(partial_path, mode) as fp:
+            for chunk in iter(lambda: response.raw.read(chunk_size), b''):
+                fp.write(chunk)
+                offset += len(chunk)
+    finally:
+        response.close()
+    return offset
+
+
+def download_parts(connection, path, partial_path, size, ranges,
+                   chunk_size):
+    from concurrent.futures import ThreadPoolExecutor
+
+    state_path = partial_path + STATE_SUFFIX
+    state = {'size': size, 'ranges': ranges, 'done': []}
+    if os.path.exists(state_path) and os.path.exists(partial_path):
+        with open(state_path) as fp:
+            previous = json.load(fp)
+        if previous['size'] == size:
+            state = previous
+    else:
+        discard(partial_path)
+    lock = threading.Lock()
+
+    def save_state():
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(state, fp)
+        os.replace(tmp_path, state_path)
+
+    def fetch(fd, first, last):
+        response = connection.stream(path, headers={
+            'Range': 'bytes=%s-%s' % (first, last),
+            'Accept-Encoding': 'identity',
+        })
+        try:
+            if response.status_code != 206:
+                raise WhatsAppAPIException(
+                    'Range request for %s answered with %s' % (
+                        path, response.status_code))
+            offset = first
+            for chunk in iter(lambda: response.raw.read(chunk_size), b''):
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+        finally:
+            response.close()
+        if offset != last + 1:
+            raise WhatsAppAPIException(
+                'Range %s-%s of %s ended at %s' % (first, last, path, offset))
+        with lock:
+            state['done'].append(first)
+            save_state()
+
+    save_state()
+    fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        pending = [
+            (first, last) for (first, last) in state['ranges']
+            if first not in state['done']]
+        with ThreadPoolExecutor(max_workers=len(pending) or 1) as executor:
+            futures = [
+                executor.submit(fetch, fd, first, last)
+                for (first, last) in pending]
+        for future in futures:
+            future.result()
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.unlink(state_path)
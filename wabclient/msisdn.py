@@ -0,0 +1,234 @@
+import re
+from functools import lru_cache
+from itertools import islice
+
+import attr
+
+from wabclient.exceptions import AddressException
+
+DEFAULT_CACHE_SIZE = 2 ** 16
+DEFAULT_CHUNK_SIZE = 10000
+
+# Numbers already in E.164 format, or wa_id format when there is no
+# default region to read them as national numbers, skip parsing and
+# validation with phonenumbers.
+E164_PATTERN = re.compile(r'^\+?[1-9]\d{7,14}$')
+STRIP_PATTERN = re.compile(r'[\s\-().]')
+
+
+@attr.s(slots=True, frozen=True)
+class NormalizedNumber(object):
+    row = attr.ib(type=int)
+    input = attr.ib(type=str)
+    e164 = attr.ib(type=str)
+    wa_id = attr.ib(type=str)
+
+
+@attr.s(slots=True, frozen=True)
+class InvalidNumber(object):
+    row = attr.ib(type=int)
+    input = attr.ib(type=str)
+    reason = attr.ib(type=str)
+
+
+@attr.s(slots=True)
+class NormalizationResult(object):
+    valid = attr.ib(default=attr.Factory(list))
+    invalid = attr.ib(default=attr.Factory(list))
+
+
+_possible_lengths = {}
+
+
+def possible_lengths(country_code):
+    """
+    Returns the possible national number lengths for a country calling
+    code, those of its main region, empty if the code isn't assigned.
+
+    :return: frozenset of int
+    """
+    lengths = _possible_lengths.get(country_code)
+    if lengths is None:
+        import phonenumbers
+        lengths = frozenset()
+        regions = phonenumbers.COUNTRY_CODE_TO_REGION_CODE.get(country_code)
+        if regions:
+            metadata = (
+                phonenumbers.PhoneMetadata
+                .metadata_for_region_or_calling_code(
+                    country_code, regions[0]))
+            if metadata is not None:
+                lengths = frozenset(metadata.general_desc.possible_length)
+        _possible_lengths[country_code] = lengths
+    return lengths
+
+
+def is_plausible(digits):
+    """
+    Whether ``digits``, an E.164 number without the "+", starts with an
+    assigned country calling code followed by a national number of a
+    possible length for it. Country codes are prefix free so at most
+    one of the one to three digit prefixes is assigned.
+    """
+    for size in (1, 2, 3):
+        lengths = possible_lengths(int(digits[:size]))
+        if lengths:
+            return len(digits) - size in lengths
+    return False
+
+
+class MSISDNNormalizer(object):
+    """
+    Normalizes phone numbers to E.164 and wa_id format.
+
+    Numbers that already look like E.164, or like a wa_id without the
+    leading "+" when there is no ``default_region``, take a fast path
+    that only checks the format, the country code and the length.
+    Everything else is parsed and validated with ``phonenumbers``.
+    Results are kept in an LRU cache.
+    """
+
+    def __init__(self, default_region=None, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param str default_region:
+            The ISO 3166-1 region used to parse numbers in national format,
+            for example "ZA". Defaults to ``None``.
+        :param int cache_size:
+            The number of normalized numbers to cache.
+        """
+        self.default_region = default_region
+        self.cache_size = cache_size
+        self._normalize = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _parse(self, number):
+        cleaned = STRIP_PATTERN.sub('', number)
+        if ((cleaned.startswith('+') or self.default_region is None) and
+                E164_PATTERN.match(cleaned)):
+            wa_id = cleaned.lstrip('+')
+            if not is_plausible(wa_id):
+                raise AddressException(
+                    '%s is not a valid number' % (number,))
+            return ('+%s' % (wa_id,), wa_id)
+
+        import phonenumbers
+        try:
+            pn = phonenumbers.parse(cleaned, self.default_region)
+        except phonenumbers.NumberParseException as exception:
+            raise AddressException(
+                '%s is not a valid number: %s' % (number, exception))
+        if not phonenumbers.is_valid_number(pn):
+            raise AddressException('%s is not a valid number' % (number,))
+        e164 = phonenumbers.format_number(
+            pn, phonenumbers.PhoneNumberFormat.E164)
+        return (e164, e164[1:])
+
+    def normalize(self, number):
+        """
+        Normalize a single number.
+        Raises ``AddressException`` if the number is not valid.
+
+        :param str number:
+            The number to normalize
+        :return: tuple(e164, wa_id)
+        """
+        return self._normalize(number.strip())
+
+    def iter_normalize(self, numbers, start=0):
+        """
+        Normalize numbers lazily.
+
+        :param iterable numbers:
+            The numbers to normalize
+        :param int start:
+            The row number of the first number. Defaults to ``0``.
+        :return: generator of NormalizedNumber or InvalidNumber
+        """
+        for row, number in enumerate(numbers, start):
+            try:
+                (e164, wa_id) = self.normalize(number)
+            except AddressException as exception:
+                yield InvalidNumber(
+                    row=row, input=number, reason=str(exception))
+            else:
+                yield NormalizedNumber(
+                    row=row, input=number, e164=e164, wa_id=wa_id)
+
+    def iter_normalize_parallel(self, numbers, processes,
+                                chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Normalize numbers in chunks over a pool of worker processes,
+        results are returned in input order.
+
+        :param iterable numbers:
+            The numbers to normalize
+        :param int processes:
+            The number of worker processes
+        :param int chunk_size:
+            The number of rows sent to a worker at a time
+        :return: generator of NormalizedNumber or InvalidNumber
+        """
+        from multiprocessing import Pool
+
+        pool = Pool(
+            processes, initializer=_init_worker,
+            initargs=(self.default_region, self.cache_size))
+        try:
+            for results in pool.imap(
+                    _normalize_chunk, iter_chunks(numbers, chunk_size)):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+
+    def normalize_many(self, numbers, processes=1,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Normalize many numbers, separating the valid from the invalid ones.
+
+        :param iterable numbers:
+            The numbers to normalize
+        :param int processes:
+            The number of worker processes, defaults to ``1`` which
+            normalizes in the current process.
+        :param int chunk_size:
+            The number of rows sent to a worker at a time
+        :return: NormalizationResult
+        """
+        if processes > 1:
+            results = self.iter_normalize_parallel(
+                numbers, processes, chunk_size=chunk_size)
+        else:
+            results = self.iter_normalize(numbers)
+
+        normalization_result = NormalizationResult()
+        for result in results:
+            if isinstance(result, NormalizedNumber):
+                normalization_result.valid.append(result)
+            else:
+                normalization_result.invalid.append(result)
+        return normalization_result
+
+
+def iter_chunks(numbers, chunk_size):
+    iterator = iter(numbers)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield (start, chunk)
+        start += len(chunk)
+
+
+_worker_normalizer = None
+
+
+def _init_worker(default_region, cache_size):
+    global _worker_normalizer
+    _worker_normalizer = MSISDNNormalizer(
+        default_region=default_region, cache_size=cache_size)
+
+
+def _normalize_chunk(args):
+    (start, chunk) = args
+    return list(_worker_normalizer.iter_normalize(chunk, start=start))
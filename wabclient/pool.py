@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+
+import attr
+from six.moves import urllib_parse
+
+from wabclient.client import Client, new_session
+
+DEFAULT_MAX_CLIENTS = 50
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_MAX_HOSTS = 50
+DEFAULT_CONNECTIONS_PER_HOST = 10
+
+
+@attr.s(slots=True)
+class Account(object):
+    url = attr.ib(type=str)
+    token = attr.ib(type=str, default=None)
+
+
+def host_of(url):
+    parts = urllib_parse.urlsplit(url)
+    port = parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+    return (parts.scheme, parts.hostname, port)
+
+
+class ClientPool(object):
+    """
+    Clients for many accounts (numbers), each with its own gateway URL
+    and token, sharing one bounded connection pool.
+
+    Clients are created on first use and the least recently used
+    ones are evicted once there are more than ``max_clients`` or when
+    idle for longer than ``idle_timeout`` seconds. When the last client
+    for a host is evicted, that host's sockets are closed.
+    """
+
+    def __init__(self, max_clients=DEFAULT_MAX_CLIENTS,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_hosts=DEFAULT_MAX_HOSTS,
+                 connections_per_host=DEFAULT_CONNECTIONS_PER_HOST,
+                 clock=time.time, transport=None, **client_options):
+        """
+        :param int max_clients:
+            The number of clients kept alive at most
+        :param float idle_timeout:
+            Seconds after which an unused client is evicted
+        :param int max_hosts:
+            The number of hosts with pooled connections at most
+        :param int connections_per_host:
+            The number of connections per host at most, requests
+            wait for a free connection beyond that.
+        :param transport:
+            The transport adapter to share instead, such as
+            ``HTTP2Adapter``, ``max_hosts`` and ``connections_per_host``
+            don't apply to it
+        :param client_options:
+            Keyword arguments for every ``Client``, each client gets
+            its own copy of ``circuit_breakers`` so a failing gateway
+            doesn't open the breakers of the others
+        """
+        import requests
+
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.client_options = client_options
+        self.adapter = transport or requests.adapters.HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=connections_per_host,
+            pool_block=True)
+        self.lock = threading.RLock()
+        self.accounts = {}
+        self.clients = OrderedDict()
+        self.last_used = {}
+
+    def register(self, key, url, token=None):
+        """
+        Adds or updates an account, its client is created on first use.
+
+        :param str key:
+            The account key, e.g. the number
+        :param str url:
+            The gateway URL
+        :param str token:
+            The gateway auth token
+        """
+        with self.lock:
+            account = self.accounts.get(key)
+            self.accounts[key] = Account(url=url, token=token)
+            if account is not None and account.url != url:
+                self.evict(key)
+            elif token is not None:
+                self.set_token(key, token)
+
+    def set_token(self, key, token):
+        """
+        Updates the token for an account, including its live client.
+        """
+        with self.lock:
+            self.accounts[key].token = token
+            client = self.clients.get(key)
+            if client is not None:
+                client.connection.set_token(token)
+
+    def get(self, key):
+        """
+        Returns the client for an account, creating it if needed.
+        Raises ``KeyError`` for unregistered accounts.
+
+        :param str key:
+            The account key
+        :return: Client
+        """
+        with self.lock:
+            now = self.clock()
+            self.evict_idle(now)
+            client = self.clients.get(key)
+            if client is None:
+                client = self.create_client(self.accounts[key])
+                self.clients[key] = client
+                while len(self.clients) > self.max_clients:
+                    self.evict(next(iter(self.clients)))
+            else:
+                self.clients.move_to_end(key)
+            self.last_used[key] = now
+            return client
+
+    __getitem__ = get
+
+    def create_client(self, account):
+        session = new_session()
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        options = dict(self.client_options)
+        if options.get('circuit_breakers') is not None:
+            options['circuit_breakers'] = options['circuit_breakers'].copy()
+        client = Client(account.url, session=session, **options)
+        if account.token:
+            client.connection.set_token(account.token)
+        return client
+
+    def evict_idle(self, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            for key in list(self.clients):
+                if now - self.last_used[key] < self.idle_timeout:
+                    # clients are ordered by last use
+                    break
+                self.evict(key)
+
+    def evict(self, key):
+        """
+        Drops an account's client, closing the host's pooled connections
+        if no other live client uses that host.
+        """
+        with self.lock:
+            client = self.clients.pop(key, None)
+            self.last_used.pop(key, None)
+            if client is None:
+                return
+            host = host_of(client.url)
+            if all(host_of(other.url) != host
+                   for other in self.clients.values()):
+                self.close_host(host)
+
+    def close_host(self, host):
+        (scheme, hostname, port) = host
+        poolmanager = getattr(self.adapter, 'poolmanager', None)
+        if poolmanager is None:
+            return
+        pools = poolmanager.pools
+        for pool_key in list(pools.keys()):
+            if (pool_key.key_scheme, pool_key.key_host,
+                    pool_key.key_port) == (scheme, hostname, port):
+                try:
+                    # the pool manager closes pools as they're removed
+                    del pools[pool_key]
+                except KeyError:
+                    pass
+
+    def close(self):
+        with self.lock:
+            self.clients.clear()
+            self.last_used.clear()
+            self.adapter.close()
+
+    def __len__(self):
+        return len(self.clients)
+
+    def __contains__(self, key):
+        return key in self.clients
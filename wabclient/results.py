@@ -0,0 +1,205 @@
+import csv
+import json
+import os
+import time
+
+import attr
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+STATUS_INVALID = 'invalid'
+STATUS_DRY_RUN = 'dry_run'
+
+
+@attr.s(slots=True, frozen=True)
+class SendResult(object):
+    msisdn = attr.ib(type=str)
+    status = attr.ib(type=str)
+    message_id = attr.ib(type=str, default=None)
+    error_code = attr.ib(default=None)
+    latency = attr.ib(type=float, default=None)
+
+
+def message_id(response):
+    try:
+        [message] = response.json()['messages']
+        return message['id']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def error_code(response):
+    """
+    Returns the API error code from an error response, falling back
+    to the HTTP status code.
+    """
+    try:
+        data = response.json()
+    except ValueError:
+        return response.status_code
+    if isinstance(data, dict):
+        errors = data.get('errors')
+        if errors:
+            return errors[0].get('code', response.status_code)
+        error = data.get('error')
+        if isinstance(error, dict) and 'errorcode' in error:
+            return error['errorcode']
+    return response.status_code
+
+
+def count_rows(fp):
+    """
+    Counts the lines in a file without parsing it, returns ``None``
+    if the file isn't a regular file on disk (e.g. stdin).
+    """
+    try:
+        with open(fp.name, 'rb') as source:
+            return sum(
+                chunk.count(b'\n')
+                for chunk in iter(lambda: source.read(DEFAULT_BUFFER_SIZE),
+                                  b''))
+    except (AttributeError, TypeError, IOError, OSError):
+        return None
+
+
+class ResultsWriter(object):
+    """
+    Writes a ``SendResult`` per row to a buffered CSV or JSON lines file.
+    """
+
+    FIELDS = ('msisdn', 'status', 'message_id', 'error_code', 'latency')
+
+    def __init__(self, fp, output_format):
+        self.fp = fp
+        self.output_format = output_format
+        if output_format == 'csv':
+            self.writer = csv.writer(fp)
+            if not fp.tell():
+                self.writer.writerow(self.FIELDS)
+
+    @classmethod
+    def open(cls, path, buffer_size=DEFAULT_BUFFER_SIZE, resume_at=None):
+        """
+        :param str path:
+            The file to write to, files ending in ``.csv`` are written as
+            CSV, anything else as JSON lines.
+        :param int buffer_size:
+            The write buffer size in bytes
+        :param int resume_at:
+            Append to an existing file, discarding anything written
+            after this offset. Defaults to ``None`` which truncates the file.
+        :return: ResultsWriter
+        """
+        output_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if resume_at is not None and os.path.exists(path):
+            fp = open(path, 'r+', buffering=buffer_size, newline='')
+            fp.seek(resume_at)
+            fp.truncate()
+        else:
+            fp = open(path, 'w', buffering=buffer_size, newline='')
+        return cls(fp, output_format)
+
+    def flush(self):
+        """
+        Flushes buffered rows to disk and returns the file offset
+        """
+        self.fp.flush()
+        return self.fp.tell()
+
+    def write(self, result):
+        if self.output_format == 'csv':
+            self.writer.writerow(attr.astuple(result))
+        else:
+            self.fp.write(json.dumps(attr.asdict(result)))
+            self.fp.write('\n')
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_results(path):
+    """
+    Reads a results file written by ``ResultsWriter``.
+
+    :param str path:
+        The CSV or JSON lines results file
+    :return: generator of SendResult
+    """
+    with open(path, newline='') as fp:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(fp):
+                yield SendResult(**dict(
+                    (key, value or None) for key, value in row.items()))
+        else:
+            for line in fp:
+                if line.strip():
+                    yield SendResult(**json.loads(line))
+
+
+class Progress(object):
+    """
+    Keeps counts of results and produces a periodic summary line.
+    """
+
+    def __init__(self, total=None, interval=DEFAULT_PROGRESS_INTERVAL,
+                 clock=time.time):
+        self.total = total
+        self.interval = interval
+        self.clock = clock
+        self.started = self.last_report = clock()
+        self.count = 0
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, result):
+        self.count += 1
+        self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+        if result.error_code is not None:
+            self.errors[result.error_code] = (
+                self.errors.get(result.error_code, 0) + 1)
+
+    def due(self):
+        now = self.clock()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            return True
+        return False
+
+    def rate(self):
+        elapsed = self.clock() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        rate = self.rate()
+        if self.total is None or not rate:
+            return None
+        return max(self.total - self.count, 0) / rate
+
+    def summary(self):
+        eta = self.eta()
+        parts = [
+            '%s/%s rows' % (
+                self.count, '?' if self.total is None else self.total),
+            '%.1f/s' % (self.rate(),),
+            'ETA %s' % (
+                '?' if eta is None else time.strftime(
+                    '%H:%M:%S', time.gmtime(eta)),),
+        ]
+        parts.extend(
+            '%s=%s' % (status, count)
+            for status, count in sorted(self.statuses.items()))
+        if self.errors:
+            parts.append('errors: %s' % (', '.join(
+                '%s=%s' % (code, count)
+                for code, count in sorted(
+                    self.errors.items(), key=lambda item: str(item[0]))),))
+        return ', '.join(parts)
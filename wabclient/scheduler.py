@@ -0,0 +1,215 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from wabclient.client import DEFAULT_CONCURRENCY
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITIES = (PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_BULK)
+
+DEFAULT_FLOW = 'default'
+DEFAULT_MAX_PENDING = 10000
+
+
+class FairQueue(object):
+    """
+    A weighted fair queue across flows. Every item gets a virtual finish
+    time of ``max(virtual time, flow's last finish) + 1 / weight`` and
+    items are served in finish time order, so a flow with weight 2 is
+    served twice as often as a flow with weight 1 while both have
+    items queued.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.virtual_time = 0.0
+        self.last_finish = {}
+        self.counter = itertools.count()
+
+    def push(self, flow, weight, item):
+        start = max(self.virtual_time, self.last_finish.get(flow, 0.0))
+        finish = start + 1.0 / weight
+        self.last_finish[flow] = finish
+        heapq.heappush(self.heap, (finish, next(self.counter), item))
+
+    def pop(self):
+        (finish, _, item) = heapq.heappop(self.heap)
+        self.virtual_time = finish
+        if not self.heap:
+            # idle flows don't bank credit for later
+            self.last_finish.clear()
+        return item
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class SendScheduler(object):
+    """
+    Sends commands through a connection from a fixed number of workers,
+    serving priority classes strictly in order and flows within a
+    class by weighted fair queuing.
+
+    Urgent sends only wait for a worker to finish its current send,
+    bulk sends use whatever capacity is left. Bulk submissions block
+    once ``max_pending`` bulk sends are queued.
+    """
+
+    def __init__(self, connection, workers=DEFAULT_CONCURRENCY,
+                 weights=None, max_pending=DEFAULT_MAX_PENDING):
+        """
+        :param Connection connection:
+            The connection to send through
+        :param int workers:
+            The number of sends in flight at most
+        :param dict weights:
+            Weights per flow (campaign or tenant), flows not listed
+            get weight 1
+        :param int max_pending:
+            The maximum number of queued bulk sends
+        """
+        self.connection = connection
+        self.weights = weights or {}
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.queues = dict((priority, FairQueue()) for priority in PRIORITIES)
+        self.waits = dict((priority, [0, 0.0]) for priority in PRIORITIES)
+        self.closed = False
+        self.threads = [
+            threading.Thread(target=self.work) for _ in range(workers)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, command, priority=PRIORITY_NORMAL, flow=DEFAULT_FLOW):
+        """
+        Queues a command to be sent.
+
+        :param command:
+            The command to send
+        :param int priority:
+            ``PRIORITY_URGENT``, ``PRIORITY_NORMAL`` or ``PRIORITY_BULK``
+        :param str flow:
+            The campaign or tenant the send belongs to
+        :return: Future resolving to the API response
+        """
+        if priority not in self.queues:
+            raise ValueError('Unknown priority %r' % (priority,))
+        future = Future()
+        with self.condition:
+            if priority == PRIORITY_BULK:
+                while (len(self.queues[PRIORITY_BULK]) >= self.max_pending and
+                       not self.closed):
+                    self.condition.wait()
+            if self.closed:
+                raise RuntimeError('SendScheduler is closed')
+            self.queues[priority].push(
+                flow, self.weights.get(flow, 1),
+                (command, future, time.time()))
+            self.condition.notify_all()
+        return future
+
+    def send(self, command, priority=PRIORITY_URGENT, flow=DEFAULT_FLOW):
+        """
+        Submits a command and waits for the response.
+        """
+        return self.submit(command, priority=priority, flow=flow).result()
+
+    def bind(self, priority=PRIORITY_NORMAL, flow=DEFAULT_FLOW):
+        """
+        Returns a connection whose ``send`` goes through this scheduler
+        with the given priority and flow, for use as a Client's
+        connection::
+
+            replies = Client(url, session=session)
+            replies.connection = scheduler.bind(PRIORITY_URGENT)
+
+        :return: ScheduledConnection
+        """
+        return ScheduledConnection(self, priority, flow)
+
+    def next_item(self):
+        with self.condition:
+            while True:
+                for priority in PRIORITIES:
+                    queue = self.queues[priority]
+                    if queue:
+                        (command, future, queued_at) = queue.pop()
+                        stats = self.waits[priority]
+                        stats[0] += 1
+                        stats[1] += time.time() - queued_at
+                        self.condition.notify_all()
+                        return (command, future)
+                if self.closed:
+                    return None
+                self.condition.wait()
+
+    def work(self):
+        while True:
+            item = self.next_item()
+            if item is None:
+                return
+            (command, future) = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.connection.send(command))
+            except Exception as exception:
+                future.set_exception(exception)
+
+    def stats(self):
+        """
+        Returns the queue depth and mean queueing delay per priority.
+
+        :return: dict
+        """
+        with self.condition:
+            return dict(
+                (priority, {
+                    'queued': len(self.queues[priority]),
+                    'sent': self.waits[priority][0],
+                    'mean_wait': (
+                        self.waits[priority][1] / self.waits[priority][0]
+                        if self.waits[priority][0] else 0.0),
+                })
+                for priority in PRIORITIES)
+
+    def close(self, wait=True):
+        """
+        Stops accepting sends, queued sends are still sent.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ScheduledConnection(object):
+    """
+    Wraps a scheduler's connection so ``send`` is scheduled, everything
+    else goes to the connection directly.
+    """
+
+    def __init__(self, scheduler, priority, flow):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.flow = flow
+
+    def send(self, command):
+        return self.scheduler.submit(
+            command, priority=self.priority, flow=self.flow).result()
+
+    def __getattr__(self, name):
+        return getattr(self.scheduler.connection, name)
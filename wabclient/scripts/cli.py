@@ -1,8 +1,10 @@
-from limit import limit
-import json
 import click
 import csv
-import requests
+
+# limit and requests are imported inside the commands that use them
+# so that ``wabclient --help`` does not pay for loading them.
+
+SEND_TIMEOUT = 5
 
 
 class RateLimitType(click.ParamType):
@@ -33,31 +35,82 @@ def main():
 @click.option(
     "--base-url", "-b", default="https://whatsapp.praekelt.org/v3.3", type=click.STRING
 )
-def create(number, token, name, language, category, template, base_url):
-    session = requests.Session()
-    session.headers.update(
-        {
-            "User-Agent": "WABClient/CLI",
-            "Authorization": "Bearer %s" % (token,),
-            "Content-Type": "application/json",
-        }
+@click.option(
+    "--spec-file", "-s", type=click.Path(exists=True, dir_okay=False), default=None
+)
+@click.option("--concurrency", type=click.INT, default=10)
+@click.option("--timeout", type=click.FLOAT, default=5)
+@click.option("--skip-existing/--no-skip-existing", default=True)
+def create(
+    number,
+    token,
+    name,
+    language,
+    category,
+    template,
+    base_url,
+    spec_file,
+    concurrency,
+    timeout,
+    skip_existing,
+):
+    from wabclient.templates import (
+        Template,
+        TemplateManager,
+        load_templates,
+        STATUS_SKIPPED,
     )
 
-    payload = {
-        "category": category,
-        "components": json.dumps([{"type": "BODY", "text": template}]),
-        "name": name.lower(),
-        "language": language,
-    }
-
-    response = session.post(
-        "%s/%s/message_templates" % (base_url, number),
-        timeout=5,
-        data=json.dumps(payload),
+    manager = TemplateManager(
+        base_url, number, token=token, timeout=timeout, concurrency=concurrency
     )
-    response.raise_for_status()
-    data = response.json()
-    click.echo(click.style("Template created: %(id)s" % data, fg="green"))
+    manager.session.headers.update({"User-Agent": "WABClient/CLI"})
+
+    if not spec_file:
+        data = manager.create(
+            Template(
+                name=name,
+                language=language,
+                category=category,
+                components=[{"type": "BODY", "text": template}],
+            )
+        )
+        click.echo(click.style("Template created: %(id)s" % data, fg="green"))
+        return
+
+    templates = load_templates(spec_file)
+    bulk_result = manager.create_many(templates, skip_existing=skip_existing)
+    for (template_name, template_language), result in sorted(
+        bulk_result.results.items()
+    ):
+        if result["status"] == STATUS_SKIPPED:
+            click.echo(
+                click.style(
+                    "Template exists: %s (%s)" % (template_name, template_language),
+                    fg="yellow",
+                )
+            )
+        else:
+            click.echo(
+                click.style(
+                    "Template created: %s (%s) %s"
+                    % (template_name, template_language, result["id"]),
+                    fg="green",
+                )
+            )
+    for (template_name, template_language), exception in sorted(
+        bulk_result.errors.items()
+    ):
+        click.echo(
+            click.style(
+                "Template failed: %s (%s) %s"
+                % (template_name, template_language, exception),
+                fg="red",
+            ),
+            err=True,
+        )
+    if bulk_result.errors:
+        raise SystemExit(1)
 
 
 @main.command()
@@ -76,7 +129,23 @@ def create(number, token, name, language, category, template, base_url):
     default="https://whatsapp.praekelt.org/v1/messages",
     type=click.STRING,
 )
-@click.option("--csv-file", "-f", type=click.File("r"))
+@click.option("--csv-file", "-f", type=click.File("rb"))
+@click.option("--normalize/--no-normalize", default=False)
+@click.option("--region", type=click.STRING, default=None)
+@click.option("--results-file", type=click.Path(dir_okay=False), default=None)
+@click.option("--progress-interval", type=click.FLOAT, default=5.0)
+@click.option("--checkpoint-file", type=click.Path(dir_okay=False), default=None)
+@click.option("--checkpoint-interval", type=click.FLOAT, default=5.0)
+@click.option("--resume/--no-resume", default=False)
+@click.option(
+    "--retry-failed", type=click.Path(exists=True, dir_okay=False), default=None
+)
+@click.option(
+    "--json-codec",
+    type=click.Choice(["orjson", "msgspec", "ujson", "json"]),
+    default=None,
+)
+@click.option("--processes", type=click.INT, default=1)
 def send(
     token,
     namespace,
@@ -89,7 +158,33 @@ def send(
     base_url,
     dry_run,
     csv_file,
+    normalize,
+    region,
+    results_file,
+    progress_interval,
+    checkpoint_file,
+    checkpoint_interval,
+    resume,
+    retry_failed,
+    json_codec,
+    processes,
 ):
+    import os
+    import time
+    import requests
+    from itertools import islice
+    from limit import limit
+    from wabclient import results as r
+    from wabclient.checkpoint import Checkpoint, Checkpointer, iter_csv_rows
+    from wabclient.codec import get_codec
+
+    if resume and not checkpoint_file:
+        raise click.UsageError("--resume requires --checkpoint-file")
+    if bool(csv_file) == bool(retry_failed):
+        raise click.UsageError("Use one of --csv-file or --retry-failed")
+    if processes > 1 and checkpoint_file:
+        raise click.UsageError("--processes can't be used with --checkpoint-file")
+
     session = requests.Session()
     session.headers.update(
         {
@@ -100,8 +195,54 @@ def send(
     )
 
     localizable_params = [{"default": p} for p in param]
+    codec = get_codec(json_codec)
+
+    input_path = retry_failed or getattr(csv_file, "name", None)
+    checkpoint = Checkpoint(input_path=input_path)
+    if resume:
+        checkpoint = Checkpoint.load(checkpoint_file)
+        if checkpoint.input_path != input_path:
+            raise click.UsageError(
+                "Checkpoint is for %s, not %s" % (checkpoint.input_path, input_path)
+            )
+
+    # Every row is paired with its position in the input, a byte offset
+    # for CSV files and a row count when retrying failed rows.
+    if retry_failed:
+        failed = (
+            result.msisdn
+            for result in r.read_results(retry_failed)
+            if result.status == r.STATUS_FAILED
+        )
+        reader = islice(enumerate(failed, 1), checkpoint.offset, None)
+        total = None
+    else:
+        reader = (
+            (offset, record)
+            for (offset, (record,)) in iter_csv_rows(csv_file, checkpoint.offset)
+        )
+        total = r.count_rows(csv_file)
+        if total is not None:
+            total -= checkpoint.rows
+
+    checkpointer = None
+    if checkpoint_file:
+        checkpointer = Checkpointer(
+            checkpoint_file, checkpoint, interval=checkpoint_interval
+        )
+
+    results = progress = None
+    if results_file:
+        results = r.ResultsWriter.open(
+            results_file, resume_at=checkpoint.results_offset if resume else None
+        )
+        progress = r.Progress(total=total, interval=progress_interval)
 
-    reader = filter(None, csv.reader(csv_file))
+    def record_result(result):
+        results.write(result)
+        progress.record(result)
+        if progress.due():
+            click.echo(progress.summary(), err=True)
 
     @limit(*rate_limit)
     def send_one(msisdn):
@@ -117,26 +258,376 @@ def send(
         }
 
         if not dry_run:
+            started = time.time()
             try:
-                response = session.post(base_url, timeout=5, data=json.dumps(payload))
+                response = session.post(
+                    base_url, timeout=SEND_TIMEOUT, data=codec.dumps(payload)
+                )
                 response.raise_for_status()
-                click.echo(click.style(record, fg="green"))
+                if results:
+                    record_result(
+                        r.SendResult(
+                            msisdn,
+                            r.STATUS_SENT,
+                            message_id=r.message_id(response),
+                            latency=time.time() - started,
+                        )
+                    )
+                else:
+                    click.echo(click.style(record, fg="green"))
+                return r.STATUS_SENT
             except requests.exceptions.HTTPError as exception:
-                if debug:
+                if results:
+                    record_result(
+                        r.SendResult(
+                            msisdn,
+                            r.STATUS_FAILED,
+                            error_code=r.error_code(exception.response),
+                            latency=time.time() - started,
+                        )
+                    )
+                elif debug:
                     click.echo(
                         "%s, %s"
                         % (
                             click.style(record, fg="red"),
-                            click.style(
-                                json.dumps(exception.response.json()), fg="yellow"
-                            ),
+                            click.style(exception.response.text, fg="yellow"),
                         ),
                         err=True,
                     )
                 else:
                     click.echo(click.style(record, fg="red"), err=True)
+                return r.STATUS_FAILED
+            except requests.exceptions.RequestException as exception:
+                if not results:
+                    raise
+                record_result(
+                    r.SendResult(
+                        msisdn,
+                        r.STATUS_FAILED,
+                        error_code=exception.__class__.__name__,
+                        latency=time.time() - started,
+                    )
+                )
+                return r.STATUS_FAILED
+        elif results:
+            record_result(r.SendResult(msisdn, r.STATUS_DRY_RUN))
         else:
             click.echo(click.style(record, fg="green"))
+        return r.STATUS_DRY_RUN
+
+    if normalize:
+        from wabclient.exceptions import AddressException
+        from wabclient.msisdn import MSISDNNormalizer
+
+        normalizer = MSISDNNormalizer(default_region=region)
+
+    def process(record):
+        if normalize:
+            try:
+                (_, record) = normalizer.normalize(record)
+            except AddressException as exception:
+                if results:
+                    record_result(
+                        r.SendResult(
+                            record, r.STATUS_INVALID, error_code="invalid_number"
+                        )
+                    )
+                else:
+                    click.echo(
+                        "%s, %s"
+                        % (
+                            click.style(record, fg="red"),
+                            click.style(str(exception), fg="yellow"),
+                        ),
+                        err=True,
+                    )
+                return r.STATUS_INVALID
+        return send_one(record)
+
+    def save_checkpoint():
+        checkpointer.save(results.flush() if results else None)
+
+    def send_sharded():
+        from wabclient.sharded import ShardedSender
+
+        sender = ShardedSender(
+            base_url,
+            token,
+            processes=processes,
+            rate=rate_limit[0],
+            per=rate_limit[1],
+            timeout=SEND_TIMEOUT,
+            codec=json_codec,
+            headers={"User-Agent": "WABClient/CLI"},
+            normalize=normalize,
+            region=region,
+            dry_run=dry_run,
+        )
+        # Workers read CSV files themselves, anything else is handed to
+        # them by this process.
+        if csv_file and os.path.isfile(input_path):
+            source = input_path
+        else:
+            source = (record for (_, record) in reader)
+        for result in sender.send_hsm(
+            source, namespace, name, language, localizable_params, policy
+        ):
+            if results:
+                record_result(result)
+            elif result.status in (r.STATUS_FAILED, r.STATUS_INVALID):
+                click.echo(click.style(result.msisdn, fg="red"), err=True)
+            else:
+                click.echo(click.style(result.msisdn, fg="green"))
+
+    try:
+        if processes > 1:
+            send_sharded()
+        else:
+            for (position, record) in reader:
+                status = process(record)
+                if checkpointer:
+                    checkpointer.advance(position, status)
+                    if checkpointer.due():
+                        save_checkpoint()
+    finally:
+        if checkpointer:
+            save_checkpoint()
+        if results:
+            results.close()
+            click.echo(progress.summary(), err=True)
+
+
+@main.command()
+@click.option("--csv-file", "-f", type=click.File("r"))
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@click.option("--invalid", "-i", type=click.File("w"), default=None)
+@click.option("--region", type=click.STRING, default=None)
+@click.option(
+    "--output-format", type=click.Choice(["wa_id", "e164"]), default="wa_id"
+)
+@click.option("--processes", "-p", type=click.INT, default=1)
+def normalize(csv_file, output, invalid, region, output_format, processes):
+    from wabclient.msisdn import MSISDNNormalizer, NormalizedNumber
+
+    normalizer = MSISDNNormalizer(default_region=region)
+    numbers = (row[0] for row in csv.reader(csv_file) if row)
+    if processes > 1:
+        results = normalizer.iter_normalize_parallel(numbers, processes)
+    else:
+        results = normalizer.iter_normalize(numbers)
+
+    invalid_writer = csv.writer(invalid) if invalid else None
+    for result in results:
+        if isinstance(result, NormalizedNumber):
+            output.write("%s\n" % (getattr(result, output_format),))
+        elif invalid_writer:
+            invalid_writer.writerow([result.row, result.input, result.reason])
+        else:
+            click.echo(click.style(result.reason, fg="red"), err=True)
+
+
+@main.command("check-contacts")
+@click.option("--token", "-t", type=click.STRING, envvar="WABCLIENT_TOKEN")
+@click.option("--base-url", "-b", required=True, type=click.STRING)
+@click.option("--csv-file", "-f", required=True, type=click.File("r"))
+@click.option("--output", "-o", type=click.File("w"), default="-")
+@click.option("--invalid", "-i", type=click.File("w"), default=None)
+@click.option("--batch-size", type=click.INT, default=1000)
+@click.option("--concurrency", "-c", type=click.INT, default=4)
+@click.option("--max-polls", type=click.INT, default=5)
+@click.option("--contact-store", type=click.Path(dir_okay=False), default=None)
+def check_contacts(
+    token,
+    base_url,
+    csv_file,
+    output,
+    invalid,
+    batch_size,
+    concurrency,
+    max_polls,
+    contact_store,
+):
+    import requests
+    from wabclient.client import Client
+    from wabclient.commands import ContactsCommand
+    from wabclient.contacts import ContactChecker, ContactStore
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=concurrency
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": "WABClient/CLI",
+            "Authorization": "Bearer %s" % (token,),
+            "Content-Type": "application/json",
+        }
+    )
+    store = ContactStore(contact_store) if contact_store else None
+    checker = ContactChecker(
+        Client(base_url, session=session, contact_store=store),
+        batch_size=batch_size,
+        concurrency=concurrency,
+        max_polls=max_polls,
+    )
+
+    numbers = (row[0] for row in csv.reader(csv_file) if row)
+    valid_writer = csv.writer(output)
+    invalid_writer = csv.writer(invalid) if invalid else None
+    counts = {}
+    for result in checker.iter_check(numbers):
+        counts[result.status] = counts.get(result.status, 0) + 1
+        if result.status == ContactsCommand.VALID:
+            valid_writer.writerow([result.input, result.wa_id])
+        elif invalid_writer:
+            invalid_writer.writerow([result.input, result.status])
+        else:
+            click.echo(click.style(result.input, fg="red"), err=True)
+
+    summary = ", ".join(
+        "%s %s" % (count, status) for (status, count) in sorted(counts.items())
+    )
+    click.echo(summary, err=True)
+
+
+@main.command()
+@click.option("--token", "-t", type=click.STRING, envvar="WABCLIENT_TOKEN")
+@click.option("--base-url", "-b", required=True, type=click.STRING)
+@click.option("--to", required=True, type=click.STRING)
+@click.option(
+    "--message-type", type=click.Choice(["text", "hsm"]), default="text"
+)
+@click.option("--text", type=click.STRING, default="load test")
+@click.option("--namespace", "-ns", type=click.STRING)
+@click.option("--name", "-n", type=click.STRING)
+@click.option("--language", "-l", type=click.STRING, default="en")
+@click.option("--param", "-p", type=click.STRING, multiple=True)
+@click.option("--concurrency", "-c", type=click.INT, default=10)
+@click.option("--rate", "-r", type=click.FLOAT, default=None)
+@click.option("--duration", "-d", type=click.FLOAT, default=10)
+@click.option(
+    "--output-format", type=click.Choice(["table", "json"]), default="table"
+)
+@click.option("--http2/--no-http2", default=False)
+def loadtest(
+    token,
+    base_url,
+    to,
+    message_type,
+    text,
+    namespace,
+    name,
+    language,
+    param,
+    concurrency,
+    rate,
+    duration,
+    output_format,
+    http2,
+):
+    import requests
+    from wabclient.client import Client
+    from wabclient.loadtest import LoadTest
+
+    session = requests.Session()
+    if http2:
+        from wabclient.http2 import HTTP2Adapter
+
+        adapter = HTTP2Adapter()
+    else:
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=concurrency, pool_maxsize=concurrency
+        )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": "WABClient/CLI",
+            "Authorization": "Bearer %s" % (token,),
+            "Content-Type": "application/json",
+        }
+    )
+    client = Client(base_url, session=session)
+
+    if message_type == "hsm":
+        params = [{"default": p} for p in param]
+
+        def send():
+            client.send_hsm(to, namespace, name, language, params)
+
+    else:
+
+        def send():
+            client.send_message(to, text)
+
+    report = LoadTest(
+        send,
+        concurrency=concurrency,
+        rate=rate,
+        duration=duration,
+        session=session,
+    ).run()
+
+    if output_format == "json":
+        click.echo(report.as_json())
+    else:
+        click.echo(report.as_table())
+
+
+@main.command()
+@click.option("--token", "-t", type=click.STRING, envvar="WABCLIENT_TOKEN")
+@click.option("--base-url", "-b", required=True, type=click.STRING)
+@click.option("--ids-file", "-f", required=True, type=click.File("r"))
+@click.option(
+    "--dest-dir", "-d", required=True, type=click.Path(file_okay=False)
+)
+@click.option("--concurrency", "-c", type=click.INT, default=10)
+@click.option("--manifest", "-m", type=click.Path(dir_okay=False), default=None)
+def download(token, base_url, ids_file, dest_dir, concurrency, manifest):
+    import json
+    import os
+    import requests
+    from wabclient.client import Client
+
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=concurrency
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {"User-Agent": "WABClient/CLI", "Authorization": "Bearer %s" % (token,)}
+    )
+    client = Client(base_url, session=session)
+
+    media_ids = (line.strip() for line in ids_file if line.strip())
+    downloaded = failed = 0
+    with open(manifest or os.path.join(dest_dir, "manifest.jsonl"), "w") as fp:
+        for (media_id, media_file, exception) in client.iter_download_many(
+            media_ids, dest_dir, concurrency=concurrency
+        ):
+            if exception is None:
+                downloaded += 1
+                entry = {
+                    "media_id": media_id,
+                    "path": media_file.path,
+                    "content_type": media_file.content_type,
+                    "size": media_file.size,
+                    "sha256": media_file.sha256,
+                    "error": None,
+                }
+            else:
+                failed += 1
+                entry = {"media_id": media_id, "error": str(exception)}
+                click.echo(click.style(media_id, fg="red"), err=True)
+            fp.write(json.dumps(entry) + "\n")
 
-    for (record,) in reader:
-        send_one(record)
+    click.echo("%s downloaded, %s failed" % (downloaded, failed), err=True)
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,367 @@
+import csv
+import mmap
+import os
+import threading
+import time
+import traceback
+
+from wabclient.client import Connection, DEFAULT_TIMEOUT
+from wabclient.commands import HSMCommand
+from wabclient.exceptions import WhatsAppException
+from wabclient.idempotency import sent_message_id
+from wabclient import results as r
+
+DEFAULT_PROCESSES = 4
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+MESSAGE_RESULTS = 'results'
+MESSAGE_DONE = 'done'
+MESSAGE_ERROR = 'error'
+
+
+def split_ranges(path, parts):
+    """
+    Splits a file into at most ``parts`` byte ranges of roughly equal
+    size, each ending just after a newline.
+
+    :return: list of tuple(start, end)
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return []
+    with open(path, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            boundaries = [0]
+            for part in range(1, parts):
+                split = max(size * part // parts - 1, boundaries[-1])
+                newline = data.find(b'\n', split)
+                if newline == -1:
+                    break
+                boundaries.append(newline + 1)
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def iter_range(path, start, end, encoding='utf-8'):
+    """
+    Yields the first column of every CSV row between byte ``start`` and
+    ``end`` of a file, reading it through an mmap. Empty rows are
+    skipped.
+    """
+    with open(path, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = start
+            while position < end:
+                newline = data.find(b'\n', position, end)
+                if newline == -1:
+                    newline = end
+                line = data[position:newline]
+                position = newline + 1
+                row = next(csv.reader([line.decode(encoding)]), None)
+                if row and row[0]:
+                    yield row[0]
+
+
+def iter_queue(tasks):
+    while True:
+        chunk = tasks.get()
+        if chunk is None:
+            return
+        for record in chunk:
+            yield record
+
+
+class RateBudget(object):
+    """
+    Spaces calls ``per / rate`` seconds apart across every process it
+    is shared with. It has to be handed to the processes when they are
+    started.
+    """
+
+    def __init__(self, rate, per=1, context=None):
+        """
+        :param int rate:
+            The number of calls allowed every ``per`` seconds
+        :param float per:
+            The period in seconds
+        :param context:
+            The multiprocessing context the budget will be used in
+        """
+        import multiprocessing
+
+        context = context or multiprocessing.get_context()
+        self.interval = float(per) / rate
+        self.next_slot = context.Value('d', 0.0)
+
+    def acquire(self):
+        with self.next_slot.get_lock():
+            now = time.time()
+            slot = max(now, self.next_slot.value)
+            self.next_slot.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HSMTemplate(object):
+    """
+    The HSM sent to every recipient, sent from the worker processes so
+    it has to be picklable. It is posted to the connection's URL as
+    given, like ``wabclient send`` does with ``--base-url``.
+    """
+
+    def __init__(self, namespace, element_name, language_code, params,
+                 language_policy='fallback'):
+        self.namespace = namespace
+        self.element_name = element_name
+        self.language_code = language_code
+        self.params = params
+        self.language_policy = language_policy
+
+    def send(self, connection, msisdn):
+        command = HSMCommand(
+            to=msisdn,
+            namespace=self.namespace,
+            element_name=self.element_name,
+            language_code=self.language_code,
+            language_policy=self.language_policy,
+            localizable_params=self.params)
+        response = connection.post(
+            connection.url, data=connection.codec.dumps(command.render()),
+            headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return connection.codec.loads(response.content)
+
+
+class ShardWorker(object):
+    """
+    Sends a shard of recipients from a worker process with its own
+    ``Connection`` and reports results back in batches.
+    """
+
+    def __init__(self, sender, template, budget, results):
+        self.sender = sender
+        self.template = template
+        self.budget = budget
+        self.results = results
+        self.normalizer = None
+
+    def __call__(self, source):
+        try:
+            self.run(source)
+        except BaseException:
+            self.results.put((MESSAGE_ERROR, traceback.format_exc()))
+        else:
+            self.results.put((MESSAGE_DONE, None))
+
+    def run(self, source):
+        sender = self.sender
+        connection = Connection(
+            sender.url, timeout=sender.timeout, codec=sender.codec)
+        connection.session.headers.update(sender.headers)
+        connection.set_token(sender.token)
+        if sender.normalize:
+            from wabclient.msisdn import MSISDNNormalizer
+            self.normalizer = MSISDNNormalizer(default_region=sender.region)
+
+        if isinstance(source, tuple):
+            records = iter_range(sender.path, *source)
+        else:
+            records = iter_queue(source)
+
+        batch = []
+        flushed = time.time()
+        for msisdn in records:
+            batch.append(self.send_one(connection, msisdn))
+            if (len(batch) >= sender.batch_size or
+                    time.time() - flushed >= DEFAULT_FLUSH_INTERVAL):
+                self.results.put((MESSAGE_RESULTS, batch))
+                batch = []
+                flushed = time.time()
+        if batch:
+            self.results.put((MESSAGE_RESULTS, batch))
+
+    def send_one(self, connection, msisdn):
+        import requests
+        from wabclient.exceptions import (
+            AddressException, WhatsAppAPIException)
+
+        if self.normalizer is not None:
+            try:
+                (_, msisdn) = self.normalizer.normalize(msisdn)
+            except AddressException:
+                return r.SendResult(
+                    msisdn, r.STATUS_INVALID, error_code='invalid_number')
+        if self.sender.dry_run:
+            return r.SendResult(msisdn, r.STATUS_DRY_RUN)
+
+        if self.budget is not None:
+            self.budget.acquire()
+        started = time.time()
+        try:
+            data = self.template.send(connection, msisdn)
+        except requests.HTTPError as exception:
+            return r.SendResult(
+                msisdn, r.STATUS_FAILED,
+                error_code=r.error_code(exception.response),
+                latency=time.time() - started)
+        except (requests.RequestException, WhatsAppAPIException) as exception:
+            return r.SendResult(
+                msisdn, r.STATUS_FAILED,
+                error_code=exception.__class__.__name__,
+                latency=time.time() - started)
+        return r.SendResult(
+            msisdn, r.STATUS_SENT, message_id=sent_message_id(data),
+            latency=time.time() - started)
+
+
+class ShardedSender(object):
+    """
+    Sends to a list of recipients from several worker processes, each
+    with its own ``Connection`` and connection pool, sharing one rate
+    budget. Results are streamed back to the parent as they complete.
+
+    A CSV file is split into byte ranges that the workers read directly
+    through an mmap, any other iterable of recipients is handed out to
+    the workers in chunks.
+    """
+
+    def __init__(self, url, token, processes=DEFAULT_PROCESSES, rate=None,
+                 per=1, timeout=DEFAULT_TIMEOUT, codec=None, headers=None,
+                 normalize=False, region=None, dry_run=False,
+                 batch_size=DEFAULT_BATCH_SIZE, context=None):
+        """
+        :param str url:
+            The URL to post messages to, such as
+            ``https://whatsapp.example.org/v1/messages``
+        :param str token:
+            The API token
+        :param int processes:
+            The number of worker processes
+        :param int rate:
+            The number of sends allowed every ``per`` seconds across all
+            workers, unlimited by default
+        :param float per:
+            The rate period in seconds
+        :param float timeout:
+            The request timeout
+        :param str codec:
+            The JSON codec's name, see ``wabclient.codec.get_codec``
+        :param dict headers:
+            Extra headers to send with every request
+        :param bool normalize:
+            Whether to normalize numbers before sending
+        :param str region:
+            The default region for numbers without a country code
+        :param bool dry_run:
+            Whether to skip the actual sends
+        :param int batch_size:
+            The most results a worker reports at once, a worker reports
+            at least every second regardless
+        :param context:
+            The multiprocessing context, defaults to the platform's
+        """
+        import multiprocessing
+
+        self.url = url
+        self.token = token
+        self.processes = processes
+        self.rate = rate
+        self.per = per
+        self.timeout = timeout
+        self.codec = codec
+        self.headers = headers or {}
+        self.normalize = normalize
+        self.region = region
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.context = context or multiprocessing.get_context()
+        self.path = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('context')
+        return state
+
+    def send_hsm(self, source, namespace, element_name, language_code,
+                 params, language_policy='fallback'):
+        """
+        Sends an HSM to every recipient in ``source``.
+
+        :param source:
+            The path of a CSV file with a recipient in the first column,
+            or an iterable of recipients
+        :return: generator of ``SendResult``
+        """
+        return self.run(source, HSMTemplate(
+            namespace, element_name, language_code, params,
+            language_policy=language_policy))
+
+    def run(self, source, template):
+        budget = None
+        if self.rate and not self.dry_run:
+            budget = RateBudget(self.rate, self.per, context=self.context)
+        results = self.context.Queue()
+
+        feeder = None
+        if isinstance(source, str):
+            self.path = source
+            shards = split_ranges(source, self.processes)
+        else:
+            tasks = self.context.Queue(maxsize=self.processes * 4)
+            shards = [tasks] * self.processes
+            feeder = threading.Thread(
+                target=self.feed, args=(source, tasks, len(shards)))
+            feeder.daemon = True
+
+        worker = ShardWorker(self, template, budget, results)
+        workers = [
+            self.context.Process(target=worker, args=(shard,))
+            for shard in shards]
+        for process in workers:
+            process.daemon = True
+            process.start()
+        if feeder is not None:
+            feeder.start()
+
+        return self.collect(workers, results)
+
+    def feed(self, source, tasks, consumers):
+        chunk = []
+        for record in source:
+            chunk.append(record)
+            if len(chunk) >= self.batch_size:
+                tasks.put(chunk)
+                chunk = []
+        if chunk:
+            tasks.put(chunk)
+        for _ in range(consumers):
+            tasks.put(None)
+
+    def collect(self, workers, results):
+        import queue
+
+        running = len(workers)
+        try:
+            while running:
+                try:
+                    (kind, payload) = results.get(timeout=1)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in workers):
+                        raise WhatsAppException(
+                            'Worker processes exited without finishing')
+                    continue
+                if kind == MESSAGE_RESULTS:
+                    for result in payload:
+                        yield result
+                elif kind == MESSAGE_DONE:
+                    running -= 1
+                else:
+                    raise WhatsAppException(
+                        'Worker process failed:\n%s' % (payload,))
+        finally:
+            for process in workers:
+                if running:
+                    process.terminate()
+                process.join()
@@ -0,0 +1,177 @@
+import csv
+import json
+
+import attr
+
+from wabclient.client import run_bulk, DEFAULT_CONCURRENCY, new_session
+from wabclient.codec import get_codec
+
+DEFAULT_TEMPLATE_TIMEOUT = 5
+STATUS_CREATED = 'created'
+STATUS_SKIPPED = 'skipped'
+
+
+@attr.s(slots=True, frozen=True)
+class Template(object):
+    name = attr.ib(type=str, converter=lambda value: value.lower())
+    language = attr.ib(type=str, default='en')
+    category = attr.ib(type=str, default='ALERT_UPDATE')
+    components = attr.ib(default=attr.Factory(list))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a template from a spec, either with a list of ``components``
+        or with a ``text`` shortcut for a single BODY component.
+        """
+        data = dict((key, value) for key, value in data.items() if value)
+        text = data.pop('text', None)
+        components = data.pop('components', None)
+        if isinstance(components, str):
+            components = json.loads(components)
+        if components is None:
+            components = [{'type': 'BODY', 'text': text}]
+        return cls(components=components, **data)
+
+    @property
+    def key(self):
+        return (self.name, self.language)
+
+    def render(self):
+        return {
+            'category': self.category,
+            'components': self.components,
+            'name': self.name,
+            'language': self.language,
+        }
+
+
+def load_templates(path):
+    """
+    Reads template specs from a YAML, JSON or CSV file. YAML and JSON
+    files hold a list of templates, CSV files have a header with
+    ``name``, ``language``, ``category`` and ``text`` or ``components``
+    columns, components being JSON encoded.
+
+    :param str path:
+        The spec file
+    :return: list of Template
+    """
+    lower_path = path.lower()
+    with open(path, newline='') as fp:
+        if lower_path.endswith('.csv'):
+            specs = list(csv.DictReader(fp))
+        elif lower_path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    'PyYAML is required to read YAML template specs')
+            specs = yaml.safe_load(fp)
+        else:
+            specs = json.load(fp)
+    return [Template.from_dict(spec) for spec in specs]
+
+
+class TemplateManager(object):
+    """
+    Creates message templates for a WhatsApp Business account over a
+    single pooled session.
+    """
+
+    def __init__(self, url, number, token=None,
+                 timeout=DEFAULT_TEMPLATE_TIMEOUT, session=None,
+                 concurrency=DEFAULT_CONCURRENCY, codec=None):
+        """
+        :param str url:
+            The Graph API base URL
+        :param str number:
+            The WhatsApp Business account id
+        :param str token:
+            The access token, not needed if the session is authorized
+        :param int timeout:
+            The request timeout in seconds
+        :param int concurrency:
+            The connection pool size for a new session
+        """
+        self.url = '%s/%s/message_templates' % (url.rstrip('/'), number)
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.codec = get_codec(codec)
+        if session is None:
+            import requests
+            session = new_session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=concurrency, pool_maxsize=concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        if token:
+            self.session.headers.update({
+                'Authorization': 'Bearer %s' % (token,),
+            })
+
+    def list(self):
+        """
+        Returns all existing templates, following pagination.
+
+        :return: list of dict
+        """
+        templates = []
+        url = self.url
+        while url:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = self.codec.loads(response.content)
+            templates.extend(data.get('data', []))
+            url = data.get('paging', {}).get('next')
+        return templates
+
+    def create(self, template):
+        """
+        :param Template template:
+            The template to create
+        :return: dict
+        """
+        response = self.session.post(
+            self.url, data=self.codec.dumps(template.render()),
+            headers={'Content-Type': 'application/json'},
+            timeout=self.timeout)
+        response.raise_for_status()
+        return self.codec.loads(response.content)
+
+    def create_many(self, templates, skip_existing=True, concurrency=None):
+        """
+        Creates templates concurrently.
+
+        :param list templates:
+            The templates to create
+        :param bool skip_existing:
+            Whether or not to skip templates for which a template with the
+            same name and language exists. Defaults to ``True``.
+        :param int concurrency:
+            The maximum number of concurrent requests, defaults to the
+            connection pool size.
+        :return: BulkResult with ``{"status": ..., "id": ...}`` per
+            ``(name, language)``
+        """
+        existing = set()
+        if skip_existing:
+            existing = set(
+                (template['name'], template['language'])
+                for template in self.list())
+
+        def create(template):
+            data = self.create(template)
+            return {'status': STATUS_CREATED, 'id': data.get('id')}
+
+        bulk_result = run_bulk(
+            create,
+            ((template.key, (template,)) for template in templates
+             if template.key not in existing),
+            concurrency=concurrency or self.concurrency)
+        for template in templates:
+            if template.key in existing:
+                bulk_result.results[template.key] = {
+                    'status': STATUS_SKIPPED, 'id': None}
+        return bulk_result
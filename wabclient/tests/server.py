@@ -0,0 +1,114 @@
+import json
+import sys
+import threading
+
+from six.moves import BaseHTTPServer, socketserver
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that time out close the connection before the response
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address)
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def handle_any(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path, body))
+        self.server.headers.append(self.headers)
+        (status, headers, content) = self.server.respond(
+            self.command, self.path, self.headers, body)
+        if not isinstance(content, bytes):
+            content = json.dumps(content).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = handle_any
+
+
+def default_respond(method, path, headers, body):
+    if path == '/v1/messages':
+        return (201, {}, {'messages': [{'id': 'the-message-id'}]})
+    if path == '/v1/health':
+        return (200, {}, {'health': {'gateway_status': 'connected'}})
+    return (404, {}, {'errors': [{'code': 404, 'title': 'Not found'}]})
+
+
+def serve_bytes(data, content_type='application/octet-stream', ranges=True):
+    """
+    Returns a ``respond`` function that serves ``data`` for every GET,
+    honouring single ``Range: bytes=first-[last]`` headers when
+    ``ranges`` is set.
+    """
+    def respond(method, path, headers, body):
+        response_headers = {'Content-Type': content_type}
+        if not ranges:
+            return (200, response_headers, data)
+        response_headers['Accept-Ranges'] = 'bytes'
+        requested = headers.get('Range')
+        if not requested:
+            return (200, response_headers, data)
+        (first, last) = requested[len('bytes='):].split('-')
+        first = int(first)
+        last = int(last) if last else len(data) - 1
+        if first >= len(data):
+            return (416, {'Content-Range': 'bytes */%s' % (len(data),)}, b'')
+        last = min(last, len(data) - 1)
+        response_headers['Content-Range'] = 'bytes %s-%s/%s' % (
+            first, last, len(data))
+        return (206, response_headers, data[first:last + 1])
+    return respond
+
+
+class StubServer(object):
+    """
+    A local stand-in for the WhatsApp Business API, for tests that
+    need a real socket rather than ``responses``.
+    """
+
+    def __init__(self, respond=default_respond):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.respond = respond
+        self.server.requests = []
+        self.server.headers = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s' % (self.server.server_address[1],)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def headers(self):
+        return self.server.headers
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tempfile
+from base64 import b64encode, b64decode
+from unittest import TestCase
+
+import responses
+
+from wabclient.backup import iter_json_string, iter_base64_decode
+from wabclient.client import Client
+from wabclient.exceptions import WhatsAppAPIException
+from wabclient.tests.server import StubServer
+from wabclient.tests.test_client import WhatsAppClientTest
+
+EXPORT = os.urandom(100000)
+
+
+class StreamingTest(TestCase):
+
+    def test_iter_json_string(self):
+        document = '{"meta": {}, "settings": {"data": "ab\\/c\\/d=="}}'
+        for size in (1, 3, 7, len(document)):
+            chunks = [
+                document[i:i + size] for i in range(0, len(document), size)]
+            self.assertEqual(
+                ''.join(iter_json_string(chunks, 'data')), 'ab/c/d==')
+
+    def test_iter_json_string_missing(self):
+        self.assertRaises(
+            WhatsAppAPIException,
+            list, iter_json_string(['{"settings": {}}'], 'data'))
+        self.assertRaises(
+            WhatsAppAPIException,
+            list, iter_json_string(['{"data": "abc'], 'data'))
+
+    def test_iter_base64_decode(self):
+        encoded = b64encode(EXPORT).decode('ascii')
+        pieces = [encoded[i:i + 1001] for i in range(0, len(encoded), 1001)]
+        self.assertEqual(b''.join(iter_base64_decode(pieces)), EXPORT)
+
+
+class BackupFileTest(WhatsAppClientTest):
+
+    @responses.activate
+    def test_create_backup_to_file(self):
+        encoded = json.dumps(b64encode(EXPORT).decode('ascii'))
+        responses.add(
+            responses.POST, '%s/v1/settings/backup' % (self.BASE_URL,),
+            body='{"settings": {"data": %s}}' % (
+                encoded.replace('/', '\\/'),),
+            content_type='application/json')
+
+        fp = io.BytesIO()
+        self.assertEqual(
+            self.client.create_backup_to_file('the-password', fp),
+            len(EXPORT))
+        self.assertEqual(fp.getvalue(), EXPORT)
+        self.assertEqual(
+            json.loads(responses.calls[0].request.body),
+            {'password': 'the-password'})
+
+    def test_restore_backup_from_file(self):
+        received = []
+
+        def respond(method, path, headers, body):
+            received.append((path, headers['Content-Length'], body))
+            return (200, {}, {})
+
+        with tempfile.TemporaryFile() as fp, StubServer(respond) as server:
+            fp.write(EXPORT)
+            fp.seek(0)
+            client = Client(server.url)
+            self.assertEqual(
+                client.restore_backup_from_file('the-password', fp), {})
+
+        [(path, content_length, body)] = received
+        self.assertEqual(path, '/v1/settings/restore')
+        self.assertEqual(int(content_length), len(body))
+        data = json.loads(body.decode('utf-8'))
+        self.assertEqual(data['password'], 'the-password')
+        self.assertEqual(b64decode(data['data']), EXPORT)
@@ -0,0 +1,152 @@
+import json
+from unittest import TestCase
+
+import mock
+import requests
+import responses
+
+from wabclient.breaker import (
+    CircuitBreaker, CircuitBreakers, endpoint_class, CLOSED, HALF_OPEN,
+    OPEN)
+from wabclient.client import Client
+from wabclient.exceptions import CircuitOpenException
+
+BASE_URL = 'http://127.0.0.1:1234'
+
+
+class CircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        self.clock = mock.Mock(return_value=1000.0)
+
+    def mk_breaker(self, **kwargs):
+        kwargs.setdefault('min_calls', 4)
+        kwargs.setdefault('reset_timeout', 10)
+        return CircuitBreaker('messages', clock=self.clock, **kwargs)
+
+    def test_endpoint_class(self):
+        self.assertEqual(endpoint_class('/v1/messages'), 'messages')
+        self.assertEqual(endpoint_class('/v1/media/the-id'), 'media')
+        self.assertEqual(endpoint_class('/v1/groups/id/admins'), 'groups')
+        self.assertEqual(endpoint_class('/health'), 'default')
+
+    def test_opens_on_failure_rate(self):
+        breaker = self.mk_breaker()
+        for failed in (False, True, False):
+            breaker.record(failed)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(True)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertRaises(CircuitOpenException, breaker.allow)
+        self.assertEqual(breaker.snapshot()['rejected'], 1)
+
+    def test_slow_calls_are_failures(self):
+        breaker = self.mk_breaker(min_calls=1, slow_call_duration=2)
+        breaker.record(False, duration=1)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(False, duration=3)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_window(self):
+        breaker = self.mk_breaker(min_calls=2, window=10)
+        breaker.record(True)
+        self.clock.return_value += 10
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.snapshot()['calls'], 1)
+
+    def test_half_open(self):
+        probe = mock.Mock(side_effect=[False, True, True])
+        breaker = self.mk_breaker(min_calls=1, probe=probe)
+        breaker.record(True)
+
+        self.clock.return_value += 10
+        self.assertRaises(CircuitOpenException, breaker.allow)
+        self.clock.return_value += 10
+        self.assertTrue(breaker.allow())
+        # only a single trial call while half open
+        self.assertRaises(CircuitOpenException, breaker.allow)
+        breaker.record(False, trial=True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(probe.call_count, 2)
+
+    def test_late_record_while_half_open(self):
+        breaker = self.mk_breaker(min_calls=1)
+        breaker.record(True)
+        self.clock.return_value += 10
+        self.assertTrue(breaker.allow())
+        # a call that started before the breaker opened
+        breaker.record(False)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.record(True, trial=True)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_interrupted_trial(self):
+        breaker = self.mk_breaker(min_calls=1)
+        breaker.record(True)
+        self.clock.return_value += 10
+        self.assertRaises(
+            KeyboardInterrupt, breaker.call,
+            mock.Mock(side_effect=KeyboardInterrupt))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        response = breaker.call(mock.Mock(return_value=mock.Mock(
+            status_code=200)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_interrupted_probe(self):
+        probe = mock.Mock(side_effect=[KeyboardInterrupt, True])
+        breaker = self.mk_breaker(min_calls=1, probe=probe)
+        breaker.record(True)
+        self.clock.return_value += 10
+        self.assertRaises(KeyboardInterrupt, breaker.allow)
+        self.assertTrue(breaker.allow())
+
+
+class ConnectionBreakerTest(TestCase):
+
+    @responses.activate
+    def test_fail_fast(self):
+        responses.add(
+            responses.POST, '%s/v1/messages' % (BASE_URL,),
+            status=503, json={})
+        responses.add(
+            responses.GET, '%s/v1/health' % (BASE_URL,),
+            status=503, json={})
+        breakers = CircuitBreakers(min_calls=2, reset_timeout=0)
+        client = Client(BASE_URL, circuit_breakers=breakers)
+
+        for _ in range(2):
+            self.assertRaises(
+                requests.exceptions.HTTPError,
+                client.send_message, '27123456789', 'hi')
+        self.assertRaises(
+            CircuitOpenException,
+            client.send_message, '27123456789', 'hi')
+        self.assertEqual(
+            [call.request.path_url for call in responses.calls],
+            ['/v1/messages', '/v1/messages', '/v1/health'])
+        self.assertEqual(breakers.snapshot()['messages']['state'], OPEN)
+
+        responses.replace(
+            responses.GET, '%s/v1/health' % (BASE_URL,), json={})
+        responses.replace(
+            responses.POST, '%s/v1/messages' % (BASE_URL,),
+            json={'messages': [{'id': 'the-id'}]})
+        self.assertEqual(
+            client.send_message('27123456789', 'hi'),
+            {'messages': [{'id': 'the-id'}]})
+        self.assertEqual(breakers.snapshot()['messages']['state'], CLOSED)
+
+    @responses.activate
+    def test_client_errors_are_not_failures(self):
+        responses.add(
+            responses.POST, '%s/v1/messages' % (BASE_URL,),
+            status=400, body=json.dumps({}))
+        breakers = CircuitBreakers(min_calls=1)
+        client = Client(BASE_URL, circuit_breakers=breakers)
+        self.assertRaises(
+            requests.exceptions.HTTPError,
+            client.send_message, '27123456789', 'hi')
+        self.assertEqual(breakers.snapshot()['messages']['failures'], 0)
@@ -0,0 +1,214 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+import mock
+
+from wabclient.cache import TTLCache, MediaCache
+
+
+class TTLCacheTest(TestCase):
+
+    def test_expiry(self):
+        clock = mock.Mock(return_value=100.0)
+        cache = TTLCache(10, clock=clock)
+        loader = mock.Mock(side_effect=['first', 'second'])
+
+        self.assertEqual(cache.get('key', loader), 'first')
+        clock.return_value = 109.0
+        self.assertEqual(cache.get('key', loader), 'first')
+        clock.return_value = 110.0
+        self.assertEqual(cache.get('key', loader), 'second')
+
+    def test_copies(self):
+        cache = TTLCache(10)
+        loader = mock.Mock(return_value={'settings': {'webhooks': {}}})
+        cache.get('key', loader)['settings']['webhooks']['url'] = 'changed'
+        cache.get('key', loader)['settings'].clear()
+        self.assertEqual(
+            cache.get('key', loader), {'settings': {'webhooks': {}}})
+        self.assertEqual(loader.call_count, 1)
+
+    def test_invalidate(self):
+        cache = TTLCache(10)
+        loader = mock.Mock(side_effect=['first', 'second'])
+        cache.get('key', loader)
+        cache.invalidate('key')
+        self.assertEqual(cache.get('key', loader), 'second')
+
+    def test_errors_are_not_cached(self):
+        cache = TTLCache(10)
+        loader = mock.Mock(side_effect=[ValueError(), 'value'])
+        self.assertRaises(ValueError, cache.get, 'key', loader)
+        self.assertEqual(cache.get('key', loader), 'value')
+
+    def test_single_flight(self):
+        cache = TTLCache(10)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'value'
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(cache.get('key', loader)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(cache.get('key', loader)))
+            for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 6)
+
+    def test_invalidate_during_load(self):
+        cache = TTLCache(10)
+
+        def loader():
+            cache.invalidate('key')
+            return 'stale'
+
+        self.assertEqual(cache.get('key', loader), 'stale')
+        self.assertEqual(cache.get('key', lambda: 'fresh'), 'fresh')
+
+
+def media(data):
+    return lambda: (len(data), io.BytesIO(data))
+
+
+class MediaCacheTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.directory = os.path.join(self.tempdir, 'media')
+
+    def test_get(self):
+        cache = MediaCache(self.directory)
+        loader = mock.Mock(side_effect=media(b'image data'))
+        (size, data) = cache.get('media-id', loader)
+        self.assertEqual((size, data.read()), (10, b'image data'))
+        (size, data) = cache.get('media-id', loader)
+        self.assertEqual(bytes(memoryview(data)), b'image data')
+        self.assertEqual(loader.call_count, 1)
+        self.assertIn('media-id', cache)
+        self.assertEqual(os.listdir(self.directory), [
+            cache.file_name('media-id')])
+
+    def test_empty_file(self):
+        cache = MediaCache(self.directory)
+        self.assertEqual(cache.get('empty', media(b''))[0], 0)
+        self.assertEqual(cache.open('empty')[1].read(), b'')
+
+    def test_lru_budget(self):
+        cache = MediaCache(self.directory, max_bytes=10)
+        cache.get('a', media(b'aaaa'))
+        cache.get('b', media(b'bbbb'))
+        cache.open('a')
+        cache.get('c', media(b'cccc'))
+        self.assertEqual(
+            ['a' in cache, 'b' in cache, 'c' in cache], [True, False, True])
+        self.assertEqual(cache.size, 8)
+
+        (size, data) = cache.get('big', media(b'x' * 20))
+        self.assertEqual(data.read(), b'x' * 20)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failed_download_leaves_nothing(self):
+        cache = MediaCache(self.directory)
+
+        class Broken(object):
+            def read(self, size):
+                raise IOError('connection reset')
+
+        self.assertRaises(
+            IOError, cache.get, 'media-id', lambda: (10, Broken()))
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertNotIn('media-id', cache)
+
+    def test_reopen(self):
+        MediaCache(self.directory).get('a', media(b'aaaa'))
+        for name in ('stale.tmp', 'writing.tmp'):
+            with open(os.path.join(self.directory, name), 'wb') as fp:
+                fp.write(b'partial')
+        an_hour_ago = time.time() - 3601
+        os.utime(
+            os.path.join(self.directory, 'stale.tmp'),
+            (an_hour_ago, an_hour_ago))
+        cache = MediaCache(self.directory)
+        self.assertEqual(cache.size, 4)
+        self.assertEqual(cache.open('a')[1].read(), b'aaaa')
+        # another process may still be writing the younger one
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted([cache.file_name('a'), 'writing.tmp']))
+
+    def test_reopen_over_budget(self):
+        cache = MediaCache(self.directory)
+        cache.get('a', media(b'aaaa'))
+        cache.get('b', media(b'bbbb'))
+        an_hour_ago = time.time() - 3600
+        os.utime(cache.path('a'), (an_hour_ago, an_hour_ago))
+        cache = MediaCache(self.directory, max_bytes=6)
+        self.assertEqual(cache.size, 4)
+        self.assertEqual(['a' in cache, 'b' in cache], [False, True])
+        self.assertEqual(
+            os.listdir(self.directory), [cache.file_name('b')])
+
+    def test_removed_by_another_process(self):
+        cache = MediaCache(self.directory)
+        for media_id in ('a', 'b', 'c'):
+            cache.get(media_id, media(b'data'))
+        for media_id in ('a', 'b'):
+            os.unlink(cache.path(media_id))
+        cache.evict('a')
+        self.assertNotIn('a', cache)
+        cache.clear()
+        self.assertEqual((len(cache), cache.size), (0, 0))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_single_flight(self):
+        cache = MediaCache(self.directory)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return (5, io.BytesIO(b'media'))
+
+        results = []
+
+        def get():
+            results.append(cache.get('media-id', loader)[1].read())
+
+        leader = threading.Thread(target=get)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=get) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b'media'] * 4)
@@ -0,0 +1,34 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from wabclient.checkpoint import Checkpoint, iter_csv_rows
+
+
+class CheckpointTest(TestCase):
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, 'checkpoint')
+
+        checkpoint = Checkpoint(
+            input_path='input.csv', offset=24, rows=2,
+            statuses={'sent': 2})
+        checkpoint.save(path)
+
+        self.assertEqual(Checkpoint.load(path), checkpoint)
+        self.assertFalse(os.path.exists('%s.tmp' % (path,)))
+
+    def test_iter_csv_rows(self):
+        fp = io.BytesIO(b'27000000001\n\n27000000002\n27000000003')
+        rows = list(iter_csv_rows(fp))
+        self.assertEqual(rows, [
+            (12, ['27000000001']),
+            (25, ['27000000002']),
+            (36, ['27000000003']),
+        ])
+        self.assertEqual(
+            list(iter_csv_rows(fp, offset=12)), rows[1:])
@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import mock
+from click.testing import CliRunner
+
+from wabclient.scripts.cli import main
+from wabclient.tests.server import StubServer
+
+
+def respond_to_send(method, path, headers, body):
+    to = json.loads(body.decode('utf-8'))['to']
+    if to.endswith('9'):
+        return (400, {}, {'errors': [{'code': 1013}]})
+    return (201, {}, {'messages': [{'id': 'id-%s' % (to,)}]})
+
+
+class SendTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.server = StubServer(respond_to_send)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def mk_csv(self, rows):
+        path = os.path.join(self.tempdir, 'input.csv')
+        with open(path, 'w') as fp:
+            fp.write(''.join('%s\n' % (row,) for row in rows))
+        return path
+
+    def invoke_send(self, *args, **kwargs):
+        exit_code = kwargs.pop('exit_code', 0)
+        result = CliRunner().invoke(main, [
+            'send', '--token', 'token',
+            '--namespace', 'ns', '--name', 'name',
+            '--rate-limit', '1000/1',
+            '--base-url', '%s/v1/messages' % (self.server.url,),
+        ] + list(args))
+        self.assertEqual(result.exit_code, exit_code, result.output)
+        return result
+
+    def sent_to(self):
+        return [
+            json.loads(body.decode('utf-8'))['to']
+            for (_, _, body) in self.server.requests]
+
+    def read_results(self, path):
+        with open(path) as fp:
+            return [json.loads(line) for line in fp]
+
+    def test_send(self):
+        result = self.invoke_send(
+            '--csv-file', self.mk_csv(['27000000001']))
+        self.assertIn('27000000001', result.output)
+        [(method, path, body)] = self.server.requests
+        self.assertEqual(path, '/v1/messages')
+        self.assertEqual(json.loads(body.decode('utf-8'))['hsm'], {
+            'namespace': 'ns',
+            'element_name': 'name',
+            'language': {'policy': 'fallback', 'code': 'en'},
+            'localizable_params': [],
+        })
+
+    def test_results_file(self):
+        results_file = os.path.join(self.tempdir, 'results.jsonl')
+        result = self.invoke_send(
+            '--csv-file',
+            self.mk_csv(['27000000001', '27000000009', 'foo']),
+            '--normalize', '--results-file', results_file)
+
+        self.assertNotIn('27000000001', result.output)
+        self.assertIn('3/3 rows', result.output)
+        results = self.read_results(results_file)
+        self.assertEqual(
+            [(r['msisdn'], r['status'], r['message_id'], r['error_code'])
+             for r in results],
+            [('27000000001', 'sent', 'id-27000000001', None),
+             ('27000000009', 'failed', None, 1013),
+             ('foo', 'invalid', None, 'invalid_number')])
+
+    def test_processes(self):
+        results_file = os.path.join(self.tempdir, 'results.jsonl')
+        result = self.invoke_send(
+            '--csv-file',
+            self.mk_csv(['27000000001', '27000000009', 'foo']),
+            '--normalize', '--results-file', results_file,
+            '--processes', '2')
+
+        self.assertIn('3/3 rows', result.output)
+        self.assertEqual(
+            sorted((r['msisdn'], r['status'], r['error_code'])
+                   for r in self.read_results(results_file)),
+            [('27000000001', 'sent', None),
+             ('27000000009', 'failed', 1013),
+             ('foo', 'invalid', 'invalid_number')])
+        self.assertEqual(
+            sorted(self.sent_to()), ['27000000001', '27000000009'])
+
+    def test_processes_base_url(self):
+        csv_file = self.mk_csv(['27000000001'])
+        for processes in ('1', '2'):
+            CliRunner().invoke(main, [
+                'send', '--token', 'token', '--namespace', 'ns',
+                '--name', 'name',
+                '--base-url', '%s/whatsapp/v1/messages' % (self.server.url,),
+                '--csv-file', csv_file, '--processes', processes])
+        self.assertEqual(
+            [path for (_, path, _) in self.server.requests],
+            ['/whatsapp/v1/messages', '/whatsapp/v1/messages'])
+
+    def test_processes_without_checkpoint(self):
+        result = self.invoke_send(
+            '--csv-file', self.mk_csv(['27000000001']), '--processes', '2',
+            '--checkpoint-file', os.path.join(self.tempdir, 'checkpoint'),
+            exit_code=2)
+        self.assertIn("--processes can't be used", result.output)
+
+    def test_resume(self):
+        csv_file = self.mk_csv([
+            '27000000001', '27000000002', '27000000003', '27000000004'])
+        results_file = os.path.join(self.tempdir, 'results.jsonl')
+        checkpoint_file = os.path.join(self.tempdir, 'checkpoint')
+
+        with mock.patch(
+                'wabclient.results.message_id',
+                side_effect=['id-1', 'id-2', RuntimeError('boom')]):
+            self.invoke_send(
+                '--csv-file', csv_file, '--results-file', results_file,
+                '--checkpoint-file', checkpoint_file, exit_code=1)
+
+        self.invoke_send(
+            '--csv-file', csv_file, '--results-file', results_file,
+            '--checkpoint-file', checkpoint_file, '--resume')
+
+        self.assertEqual(self.sent_to(), [
+            '27000000001', '27000000002', '27000000003',
+            '27000000003', '27000000004'])
+        self.assertEqual(
+            [result['msisdn'] for result in self.read_results(results_file)],
+            ['27000000001', '27000000002', '27000000003', '27000000004'])
+
+    def test_resume_requires_checkpoint_file(self):
+        result = self.invoke_send(
+            '--csv-file', self.mk_csv(['27000000001']), '--resume',
+            exit_code=2)
+        self.assertIn('--resume requires --checkpoint-file', result.output)
+
+    def test_retry_failed(self):
+        results_file = os.path.join(self.tempdir, 'results.csv')
+        retry_file = os.path.join(self.tempdir, 'retry.csv')
+        self.invoke_send(
+            '--csv-file', self.mk_csv(['27000000001', '27000000009']),
+            '--results-file', results_file)
+        self.invoke_send(
+            '--retry-failed', results_file, '--results-file', retry_file)
+
+        self.assertEqual(
+            self.sent_to(), ['27000000001', '27000000009', '27000000009'])
@@ -1,11 +1,14 @@
 import responses
 import json
+import shutil
 import tempfile
 import requests
 import iso8601
 from base64 import b64encode
 from datetime import datetime
 from unittest import TestCase
+from wabclient.cache import MediaCache
+from wabclient.contacts import ContactStore
 from wabclient.client import (
     Client, GroupManager, fail)
 from wabclient.commands import (
@@ -17,7 +20,7 @@ from wabclient.commands import (
     RemoveGroupParticipantCommand, LeaveGroupCommand, HSMCommand,
     UpdatePasswordCommand, CreateUserCommand, SetShardingCommand,
     InitialPasswordCommand)
-from wabclient.exceptions import AddressException
+from wabclient.exceptions import AddressException, GroupException
 from wabclient.constants import (
     MESSAGE_TYPE_AUDIO, MESSAGE_TYPE_IMAGE, MESSAGE_TYPE_DOCUMENT,
     RECIPIENT_TYPE_GROUP)
@@ -433,6 +436,104 @@ class SettingsTest(WhatsAppClientTest):
         self.client.config.setup_shards('+27123456789', 4)
 
 
+class CachedSettingsTest(WhatsAppClientTest):
+
+    def setUp(self):
+        super(CachedSettingsTest, self).setUp()
+        self.client = Client(
+            self.BASE_URL, session=self.client.session, cache_ttl=60)
+
+    @responses.activate
+    def test_get_settings_cached(self):
+        self.expectGet('token', '/v1/settings/application', {
+            'settings': {'application': {'webhooks': {'url': 'first'}}}})
+
+        self.assertEqual(
+            self.client.config.get_settings(),
+            {'webhooks': {'url': 'first'}})
+        self.assertEqual(
+            self.client.config.get_settings(),
+            {'webhooks': {'url': 'first'}})
+
+    @responses.activate
+    def test_set_about_invalidates(self):
+        for text in ('before', 'after'):
+            self.expectGet('token', '/v1/settings/profile/about', {
+                'settings': {'profile': {'about': {'text': text}}}})
+        self.expectCommand(
+            'token', '/v1/settings/profile/about', AboutCommand('after'), {})
+
+        self.assertEqual(self.client.config.get_about(), 'before')
+        self.assertEqual(self.client.config.get_about(), 'before')
+        self.client.config.set_about('after')
+        self.assertEqual(self.client.config.get_about(), 'after')
+
+    @responses.activate
+    def test_health_cached(self):
+        self.expectGet('token', '/v1/health', {'health': {}})
+        self.client.healthcheck()
+        self.assertEqual(self.client.healthcheck(), {'health': {}})
+
+
+class CachedMediaTest(WhatsAppClientTest):
+
+    def setUp(self):
+        super(CachedMediaTest, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.client = Client(
+            self.BASE_URL, session=self.client.session,
+            media_cache=MediaCache(self.tempdir))
+
+    @responses.activate
+    def test_download_media_cached(self):
+        responses.add(
+            responses.GET, self.BASE_URL + '/v1/media/the-media-id',
+            body=b'the media', content_type='image/jpeg',
+            headers={'Content-Length': '9'})
+
+        for _ in range(2):
+            (size, data) = self.client.download_media('the-media-id')
+            self.assertEqual((size, data.read()), (9, b'the media'))
+        self.assertEqual(len(responses.calls), 1)
+
+
+class ContactStoreClientTest(WhatsAppClientTest):
+
+    def setUp(self):
+        super(ContactStoreClientTest, self).setUp()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.store = ContactStore(tempdir + '/contacts.db')
+        self.addCleanup(self.store.close)
+        self.client = Client(
+            self.BASE_URL, session=self.client.session,
+            contact_store=self.store)
+
+    @responses.activate
+    def test_get_address_stored(self):
+        self.expectCommand(
+            'token', '/v1/contacts',
+            ContactsCommand(
+                contacts=['+27123456789'], blocking=ContactsCommand.WAIT),
+            response={"contacts": [{
+                "input": "+27123456789",
+                "status": "valid",
+                "wa_id": "27123456789",
+            }]})
+
+        for _ in range(2):
+            self.assertEqual(
+                self.client.get_address('+27123456789'), '27123456789')
+        self.assertEqual(
+            self.store.get('+27123456789').wa_id, '27123456789')
+
+    def test_get_address_stored_invalid(self):
+        self.store.put('+27123456789', ContactsCommand.INVALID)
+        self.assertRaises(
+            AddressException, self.client.get_address, '+27123456789')
+
+
 class GroupTest(WhatsAppClientTest):
 
     @responses.activate
@@ -459,6 +560,45 @@ class GroupTest(WhatsAppClientTest):
         self.assertEqual(
             group.creation_time, datetime.fromtimestamp(1234567890))
 
+    @responses.activate
+    def test_group_create_many(self):
+        for index in (1, 2):
+            self.expectCommand(
+                'token', '/v1/groups',
+                CreateGroupCommand(subject='cohort %s' % (index,)),
+                {
+                    "groups": [{
+                        "creation_time": 1234567890,
+                        "id": "group-%s" % (index,)
+                    }]
+                })
+            self.expectUpload(
+                'token', '/v1/groups/group-%s/icon' % (index,), 'image/png')
+            self.expectGet('token', '/v1/groups/group-%s/invite' % (index,), {
+                "groups": [{
+                    "link": "link-%s" % (index,)
+                }]
+            })
+
+        with tempfile.NamedTemporaryFile(suffix='.txt') as fp:
+            fp.write('this is the content!'.encode('utf-8'))
+            fp.seek(0)
+            result = self.client.groups.create_many(
+                ['cohort 1', 'cohort 2'], fp, 'cohort.png',
+                invite_links=True, concurrency=1)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(
+            [(group.id, group.subject, group.invite_link)
+             for _, group in sorted(result.results.items())],
+            [('group-1', 'cohort 1', 'link-1'),
+             ('group-2', 'cohort 2', 'link-2')])
+
+    def test_group_create_many_validates_subjects(self):
+        self.assertRaises(
+            GroupException,
+            self.client.groups.create_many, ['fine', 'x' * 26])
+
     @responses.activate
     def test_set_group_subject(self):
         self.expectCommand('token', '/v1/groups/group-id', UpdateGroupCommand(
@@ -535,6 +675,68 @@ class GroupTest(WhatsAppClientTest):
 
         self.client.groups.leave('group-id')
 
+    @responses.activate
+    def test_group_bulk_add_admins(self):
+        self.expectCommand(
+            'token', '/v1/groups/group-1/admins',
+            AddGroupAdminCommand(
+                group_id='group-1', wa_ids=['27000000001', '27000000002']))
+        self.expectCommand(
+            'token', '/v1/groups/group-1/admins',
+            AddGroupAdminCommand(
+                group_id='group-1', wa_ids=['27000000003']))
+        self.expectCommand(
+            'token', '/v1/groups/group-2/admins',
+            AddGroupAdminCommand(
+                group_id='group-2', wa_ids=['27000000004']))
+
+        groups = self.client.groups
+        groups.MAX_PARTICIPANTS_PER_REQUEST = 2
+        result = groups.bulk_add_admins([
+            ('group-1', ['27000000001', '27000000002', '27000000003']),
+            ('group-2', ['27000000004']),
+        ], concurrency=1)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.results, {
+            'group-1': [{}, {}],
+            'group-2': [{}],
+        })
+
+    @responses.activate
+    def test_group_bulk_remove_participants_errors(self):
+        self.expectCommand(
+            'token', '/v1/groups/group-1/participants',
+            RemoveGroupParticipantCommand(
+                group_id='group-1', wa_ids=['27000000001']))
+        self.expectCommand(
+            'token', '/v1/groups/group-2/participants',
+            RemoveGroupParticipantCommand(
+                group_id='group-2', wa_ids=['27000000002']),
+            status_code=404)
+
+        result = self.client.groups.bulk_remove_participants([
+            ('group-1', ['27000000001']),
+            ('group-2', ['27000000002']),
+        ])
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.results, {'group-1': [{}]})
+        self.assertIsInstance(
+            result.errors['group-2'], requests.exceptions.HTTPError)
+
+    @responses.activate
+    def test_group_bulk_leave(self):
+        self.expectCommand(
+            'token', '/v1/groups/group-1/leave',
+            LeaveGroupCommand(group_id='group-1'))
+        self.expectCommand(
+            'token', '/v1/groups/group-2/leave',
+            LeaveGroupCommand(group_id='group-2'))
+
+        result = self.client.groups.bulk_leave(['group-1', 'group-2'])
+        self.assertEqual(result.results, {'group-1': {}, 'group-2': {}})
+
 
 class ConnectionTest(WhatsAppClientTest):
 
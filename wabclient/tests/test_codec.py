@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import mock
+
+from wabclient import codec
+from wabclient.codec import get_codec, JSONCodec
+
+
+class CodecTest(TestCase):
+
+    def test_roundtrip(self):
+        for name in codec.PREFERRED_CODECS:
+            try:
+                json_codec = get_codec(name)
+            except ImportError:
+                continue
+            payload = {'to': '27123456789', 'text': {'body': u'h\xe9llo'}}
+            encoded = json_codec.dumps(payload)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json_codec.loads(encoded), payload)
+
+    def test_stdlib_is_compact(self):
+        self.assertEqual(
+            get_codec('json').dumps({'a': [1, 2]}), b'{"a":[1,2]}')
+
+    def test_preference(self):
+        def unavailable():
+            raise ImportError()
+
+        with mock.patch.dict(codec.CODEC_FACTORIES, {
+                'orjson': unavailable,
+                'msgspec': unavailable,
+                'ujson': unavailable}), \
+                mock.patch.dict(codec._codecs, clear=True):
+            self.assertEqual(get_codec().name, 'json')
+
+    def test_passthrough_and_unknown(self):
+        json_codec = JSONCodec('custom', dumps=None, loads=None)
+        self.assertIs(get_codec(json_codec), json_codec)
+        self.assertRaises(ValueError, get_codec, 'yaml')
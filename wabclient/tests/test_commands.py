@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import attr
+
+from wabclient import commands
+from wabclient.client import Group
+from wabclient.commands import HSMBatch, HSMCommand, TextCommand
+
+
+class SlotsTest(TestCase):
+
+    def test_commands_are_slotted(self):
+        for value in vars(commands).values():
+            if (isinstance(value, type) and
+                    issubclass(value, commands.BaseCommand) and
+                    attr.has(value)):
+                for klass in value.__mro__[:-1]:
+                    self.assertIn('__slots__', vars(klass), klass)
+
+    def test_commands_are_frozen(self):
+        command = TextCommand(to='to_addr', text='hello')
+        self.assertRaises(
+            attr.exceptions.FrozenInstanceError,
+            setattr, command, 'to', 'other')
+
+    def test_group_is_slotted(self):
+        group = Group(id='the-group-id', creation_time=1234567890)
+        self.assertFalse(hasattr(group, '__dict__'))
+
+
+class HSMBatchTest(TestCase):
+
+    def mk_batch(self):
+        return HSMBatch(
+            namespace='namespace',
+            element_name='element_name',
+            language_code='en',
+            localizable_params=[{'default': 'shared'}])
+
+    def test_append(self):
+        batch = self.mk_batch()
+        batch.extend(['27000000001', '27000000002'])
+        batch.append('27000000003', [{'default': 'own'}])
+
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.get_recipient(-1), '27000000003')
+        self.assertEqual(list(batch), [
+            HSMCommand(
+                to='27000000001',
+                namespace='namespace',
+                element_name='element_name',
+                language_code='en',
+                localizable_params=[{'default': 'shared'}]),
+            HSMCommand(
+                to='27000000002',
+                namespace='namespace',
+                element_name='element_name',
+                language_code='en',
+                localizable_params=[{'default': 'shared'}]),
+            HSMCommand(
+                to='27000000003',
+                namespace='namespace',
+                element_name='element_name',
+                language_code='en',
+                localizable_params=[{'default': 'own'}]),
+        ])
+
+    def test_index_error(self):
+        batch = self.mk_batch()
+        batch.append('27000000001')
+        self.assertRaises(IndexError, batch.__getitem__, 1)
+
+    def test_language_policy(self):
+        self.assertRaises(
+            ValueError, HSMBatch, 'namespace', 'element_name', 'en',
+            language_policy='foo')
@@ -0,0 +1,195 @@
+import gzip
+import json
+import os
+import zlib
+from unittest import TestCase
+
+from wabclient.client import Client, Connection
+from wabclient.commands import ContactsCommand, TextCommand
+from wabclient.compression import Compression
+from wabclient.tests.server import StubServer
+
+
+def decode_body(headers, body):
+    encoding = headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        return zlib.decompress(body)
+    return body
+
+
+def respond_decoded(method, path, headers, body):
+    payload = json.loads(decode_body(headers, body).decode('utf-8'))
+    if path == '/v1/contacts':
+        return (200, {}, {'contacts': [
+            {'input': number, 'status': 'valid', 'wa_id': number}
+            for number in payload['contacts']]})
+    return (201, {}, {'messages': [{'id': 'the-message-id'}]})
+
+
+def refuse_encoded(method, path, headers, body):
+    if headers.get('Content-Encoding'):
+        return (415, {}, {'errors': [{'code': 415}]})
+    return respond_decoded(method, path, headers, body)
+
+
+def numbers(count):
+    return ['+2712345%04d' % (index,) for index in range(count)]
+
+
+class CompressionTest(TestCase):
+
+    def test_below_threshold(self):
+        compression = Compression(threshold=1024)
+        self.assertEqual(
+            compression.compress('/v1/messages', b'{"to":"27123"}'),
+            (b'{"to":"27123"}', {}))
+
+    def test_gzip(self):
+        data = json.dumps(numbers(1000)).encode('utf-8')
+        (body, headers) = Compression(threshold=1024).compress(
+            '/v1/contacts', data)
+        self.assertEqual(headers, {'Content-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(body), data)
+        self.assertLess(len(body), len(data))
+        # no timestamp in the header, so equal bodies compress equally
+        self.assertEqual(
+            Compression(threshold=1024).compress('/v1/contacts', data)[0],
+            body)
+
+    def test_deflate(self):
+        data = json.dumps(numbers(1000)).encode('utf-8')
+        (body, headers) = Compression('deflate', threshold=1024).compress(
+            '/v1/contacts', data)
+        self.assertEqual(headers, {'Content-Encoding': 'deflate'})
+        self.assertEqual(zlib.decompress(body), data)
+
+    def test_unknown_encoding(self):
+        self.assertRaises(ValueError, Compression, 'br')
+
+    def test_endpoint_thresholds(self):
+        compression = Compression(
+            threshold=1024, endpoints={'contacts': 10, 'groups': None})
+        data = json.dumps(numbers(100)).encode('utf-8')
+        self.assertEqual(
+            compression.compress('/v1/contacts', data[:100])[1],
+            {'Content-Encoding': 'gzip'})
+        self.assertEqual(compression.compress('/v1/groups/1', data)[1], {})
+        self.assertEqual(
+            compression.compress('/v1/messages', data)[1],
+            {'Content-Encoding': 'gzip'})
+
+    def test_incompressible(self):
+        compression = Compression(threshold=10)
+        data = b'\0' * 4096
+        self.assertEqual(
+            compression.compress('/v1/media', data, 'image/jpeg'), (data, {}))
+        self.assertEqual(
+            compression.compress('/v1/media', data, 'video/mp4'), (data, {}))
+        self.assertEqual(
+            compression.compress('/v1/media', data, 'application/pdf')[1],
+            {'Content-Encoding': 'gzip'})
+
+    def test_too_little_saved(self):
+        data = os.urandom(4096)
+        self.assertEqual(
+            Compression(threshold=10).compress('/v1/media', data)[1], {})
+
+
+class CompressedConnectionTest(TestCase):
+
+    def serve(self, respond=respond_decoded):
+        server = StubServer(respond)
+        server.__enter__()
+        self.addCleanup(server.__exit__)
+        return server
+
+    def test_send(self):
+        server = self.serve()
+        connection = Connection(
+            server.url, compression=Compression(threshold=1024))
+        command = ContactsCommand(contacts=numbers(500), blocking='no_wait')
+        data = connection.send(command)
+
+        self.assertEqual(len(data['contacts']), 500)
+        [headers] = server.headers
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('gzip', headers['Accept-Encoding'])
+        [(_, _, body)] = server.requests
+        self.assertEqual(
+            json.loads(gzip.decompress(body).decode('utf-8')),
+            command.render())
+
+    def test_accept_encoding(self):
+        import requests
+
+        server = self.serve()
+        session = requests.Session()
+        connection = Connection(
+            server.url, session=session,
+            compression=Compression(accept_encoding='gzip'))
+        connection.send(TextCommand(to='27123', text='hi'))
+        connection.fast_sender().send(TextCommand(to='27123', text='hi'))
+
+        self.assertEqual(
+            [headers['Accept-Encoding'] for headers in server.headers],
+            ['gzip', 'gzip'])
+        self.assertEqual(
+            session.headers['Accept-Encoding'],
+            requests.utils.default_headers()['Accept-Encoding'])
+
+    def test_small_send(self):
+        server = self.serve()
+        connection = Connection(
+            server.url, compression=Compression(threshold=1024))
+        connection.send(TextCommand(to='27123', text='hi'))
+        [headers] = server.headers
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_upload(self):
+        server = self.serve(
+            lambda method, path, headers, body: (
+                201, {}, {'media': [{'id': str(len(
+                    decode_body(headers, body)))}]}))
+        connection = Connection(
+            server.url, compression=Compression(threshold=1024))
+        self.assertEqual(
+            connection.upload_data('/v1/media', b'a' * 4096, 'text/plain'),
+            {'media': [{'id': '4096'}]})
+        [headers] = server.headers
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+
+    def test_unsupported_media_type(self):
+        server = self.serve(refuse_encoded)
+        compression = Compression(threshold=1024)
+        connection = Connection(server.url, compression=compression)
+        command = ContactsCommand(contacts=numbers(500), blocking='no_wait')
+        connection.send(command)
+        connection.send(command)
+
+        self.assertEqual(
+            [headers.get('Content-Encoding') for headers in server.headers],
+            ['gzip', None, None])
+        self.assertEqual(compression.rejected, set(['contacts']))
+
+    def test_fast_sender(self):
+        server = self.serve(refuse_encoded)
+        connection = Connection(
+            server.url, compression=Compression(threshold=10))
+        sender = connection.fast_sender()
+        self.assertEqual(
+            sender.send(TextCommand(to='27123', text='hi ' * 100)),
+            {'messages': [{'id': 'the-message-id'}]})
+        self.assertEqual(
+            [headers.get('Content-Encoding') for headers in server.headers],
+            ['gzip', None])
+
+    def test_client(self):
+        server = self.serve()
+        client = Client(server.url, compression=Compression(threshold=1024))
+        self.assertEqual(
+            len(client.check_contacts(numbers(500), wait=False)['contacts']),
+            500)
+        [headers] = server.headers
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
@@ -0,0 +1,254 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from click.testing import CliRunner
+
+from wabclient.contacts import (
+    BatchSizer, ContactChecker, ContactResult, ContactRecord, ContactStore,
+    STATUS_ERROR)
+from wabclient.scripts.cli import main
+from wabclient.tests.server import StubServer
+
+
+def contact(number, polls):
+    """
+    Numbers ending in 0 are invalid, numbers ending in 5 are processing
+    on their first check.
+    """
+    if number.endswith('0'):
+        return {'input': number, 'status': 'invalid'}
+    if number.endswith('5') and polls.get(number, 0) < 2:
+        return {'input': number, 'status': 'processing'}
+    return {'input': number, 'status': 'valid', 'wa_id': number.lstrip('+')}
+
+
+class FakeClient(object):
+
+    def __init__(self, fail_first=0):
+        self.batches = []
+        self.polls = {}
+        self.fail_first = fail_first
+
+    def check_contacts(self, addresses, wait=False):
+        self.batches.append(list(addresses))
+        if len(self.batches) <= self.fail_first:
+            raise IOError('connection reset')
+        for number in addresses:
+            self.polls[number] = self.polls.get(number, 0) + 1
+        return {'contacts': [
+            contact(number, self.polls) for number in addresses]}
+
+
+class BatchSizerTest(TestCase):
+
+    def test_adapts(self):
+        sizer = BatchSizer(100, minimum=10, maximum=150, target_latency=1)
+        sizer.record(0.1)
+        self.assertEqual(sizer.size, 126)
+        sizer.record(0.1)
+        self.assertEqual(sizer.size, 150)
+        sizer.record(0.7)
+        self.assertEqual(sizer.size, 150)
+        for _ in range(5):
+            sizer.record(2)
+        self.assertEqual(sizer.size, 10)
+
+
+class ContactCheckerTest(TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+
+    def check(self, client, numbers, **kwargs):
+        checker = ContactChecker(
+            client, batch_size=3, concurrency=2,
+            sleep=self.sleeps.append, **kwargs)
+        return sorted(
+            checker.iter_check(numbers), key=lambda result: result.input)
+
+    def test_iter_check(self):
+        client = FakeClient()
+        results = self.check(
+            client, ['+271', '+272', '+272', '+270', '+275', ' +271 '])
+
+        self.assertEqual(results, [
+            ContactResult('+270', 'invalid'),
+            ContactResult('+271', 'valid', '271'),
+            ContactResult('+272', 'valid', '272'),
+            ContactResult('+275', 'valid', '275'),
+        ])
+        self.assertEqual(sum(len(batch) for batch in client.batches), 5)
+        self.assertEqual(client.batches[-1], ['+275'])
+        self.assertEqual(self.sleeps, [1.0])
+
+    def test_gives_up(self):
+        results = self.check(FakeClient(), ['+275'], max_polls=0)
+        self.assertEqual(results, [ContactResult('+275', 'processing')])
+
+    def test_failed_batches_retried(self):
+        client = FakeClient(fail_first=1)
+        results = self.check(client, ['+271', '+272'])
+        self.assertEqual(
+            [result.status for result in results], ['valid', 'valid'])
+
+        client = FakeClient(fail_first=10)
+        results = self.check(client, ['+271'], max_polls=2)
+        self.assertEqual(results, [ContactResult('+271', STATUS_ERROR)])
+        self.assertEqual(self.sleeps[-2:], [1.0, 2.0])
+
+
+def respond_to_contacts(method, path, headers, body):
+    numbers = json.loads(body.decode('utf-8'))['contacts']
+    return (200, {}, {'contacts': [
+        contact(number, {number: 2}) for number in numbers]})
+
+
+class CheckContactsCommandTest(TestCase):
+
+    def test_check_contacts(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        csv_file = os.path.join(tempdir, 'numbers.csv')
+        with open(csv_file, 'w') as fp:
+            fp.write('+271\n+270\n+271\n')
+        output_file = os.path.join(tempdir, 'valid.csv')
+        invalid_file = os.path.join(tempdir, 'invalid.csv')
+
+        with StubServer(respond_to_contacts) as server:
+            result = CliRunner().invoke(main, [
+                'check-contacts', '--token', 'token',
+                '--base-url', server.url, '--csv-file', csv_file,
+                '--output', output_file, '--invalid', invalid_file])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('1 invalid, 1 valid', result.output)
+        with open(output_file) as fp:
+            self.assertEqual(fp.read(), '+271,271\n')
+        with open(invalid_file) as fp:
+            self.assertEqual(fp.read(), '+270,invalid\n')
+
+    def test_check_contacts_store(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        csv_file = os.path.join(tempdir, 'numbers.csv')
+        with open(csv_file, 'w') as fp:
+            fp.write('+271\n+270\n')
+        store_path = os.path.join(tempdir, 'contacts.db')
+
+        with StubServer(respond_to_contacts) as server:
+            for _ in range(2):
+                result = CliRunner().invoke(main, [
+                    'check-contacts', '--token', 'token',
+                    '--base-url', server.url, '--csv-file', csv_file,
+                    '--output', os.path.join(tempdir, 'valid.csv'),
+                    '--contact-store', store_path])
+                self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(ContactStore(store_path)), 2)
+
+
+def put_range(path, start):
+    store = ContactStore(path)
+    store.put_many(
+        ('+27%s' % (index,), 'valid', '27%s' % (index,))
+        for index in range(start, start + 500))
+    store.close()
+
+
+class ContactStoreTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.path = os.path.join(self.tempdir, 'contacts.db')
+        self.now = [1000.0]
+
+    def store(self, **kwargs):
+        store = ContactStore(
+            self.path, clock=lambda: self.now[0], **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_get_put(self):
+        store = self.store()
+        self.assertEqual(store.get('+271'), None)
+        store.put('+271', 'valid', '271')
+        store.put('+270', 'invalid')
+        self.assertEqual(
+            store.get('+271'), ContactRecord('+271', 'valid', '271', 1000.0))
+        self.assertEqual(self.store().get('+270').status, 'invalid')
+        self.assertEqual(len(store), 2)
+
+    def test_max_age(self):
+        store = self.store(max_age=60)
+        store.put('+271', 'valid', '271')
+        self.now[0] += 61
+        self.assertEqual(store.get('+271'), None)
+        self.assertEqual(len(store), 0)
+        store.purge()
+        self.assertEqual(len(self.store(max_age=None)), 0)
+
+    def test_import_export(self):
+        store = self.store()
+        self.assertEqual(store.import_csv(io.StringIO(
+            '+271,271,valid,900.5\n+270,,invalid\n')), 2)
+        self.assertEqual(store.get('+271').checked_at, 900.5)
+        self.assertEqual(store.get('+270').wa_id, None)
+
+        exported = io.StringIO()
+        self.assertEqual(store.export_csv(exported), 2)
+        self.assertEqual(
+            exported.getvalue().splitlines(),
+            ['+270,,invalid,1000.0', '+271,271,valid,900.5'])
+
+    def test_concurrent_processes(self):
+        import multiprocessing
+
+        processes = [
+            multiprocessing.Process(target=put_range, args=(self.path, start))
+            for start in (0, 500)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(len(ContactStore(self.path)), 1000)
+
+    def test_checker_uses_store(self):
+        store = self.store()
+        store.put('+271', 'valid', '271')
+        client = FakeClient()
+        checker = ContactChecker(
+            client, store=store, sleep=lambda delay: None)
+
+        results = sorted(
+            checker.iter_check(['+271', '+272', '+275']),
+            key=lambda result: result.input)
+
+        self.assertEqual(
+            [result.status for result in results], ['valid'] * 3)
+        self.assertEqual(client.batches, [['+272', '+275'], ['+275']])
+        self.assertEqual(store.get('+275').wa_id, '275')
+
+    def test_warm_store_streams(self):
+        store = self.store()
+        numbers = ['+27%05d' % (index,) for index in range(10000)]
+        store.put_many((number, 'valid', number[1:]) for number in numbers)
+        consumed = []
+
+        def read():
+            for number in numbers:
+                consumed.append(number)
+                yield number
+
+        client = FakeClient()
+        checker = ContactChecker(
+            client, batch_size=100, concurrency=2, store=store)
+        results = checker.iter_check(read())
+        self.assertEqual(next(results).status, 'valid')
+        self.assertLess(len(consumed), 1000)
+        self.assertEqual(len(list(results)), 9999)
+        self.assertEqual(client.batches, [])
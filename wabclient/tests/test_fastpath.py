@@ -0,0 +1,130 @@
+import json
+import time
+from unittest import TestCase
+
+import requests
+
+from wabclient.breaker import CircuitBreakers
+from wabclient.client import Connection
+from wabclient.commands import HSMCommand, TextCommand
+from wabclient.exceptions import CircuitOpenException
+from wabclient.fastpath import FastSender
+from wabclient.tests.server import StubServer
+
+
+def respond_to_send(method, path, headers, body):
+    to = json.loads(body.decode('utf-8'))['to']
+    if to.endswith('9'):
+        return (400, {}, {'errors': [{'code': 1013}]})
+    if to.endswith('8'):
+        return (503, {}, {'errors': [{'code': 503}]})
+    return (201, {}, {'messages': [{'id': 'id-%s' % (to,)}]})
+
+
+class FastSenderTest(TestCase):
+
+    def setUp(self):
+        self.server = StubServer(respond_to_send)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.connection = Connection(self.server.url)
+        self.connection.set_token('token')
+
+    def sent(self):
+        return [
+            (method, path, json.loads(body.decode('utf-8')))
+            for (method, path, body) in self.server.requests]
+
+    def test_send(self):
+        sender = self.connection.fast_sender()
+        command = TextCommand(to='27123', text='hi')
+        self.assertEqual(
+            sender.send(command), {'messages': [{'id': 'id-27123'}]})
+        self.assertEqual(
+            self.sent(), [('POST', '/v1/messages', command.render())])
+        [headers] = self.server.headers
+        self.assertEqual(headers['Authorization'], 'Bearer token')
+        self.assertEqual(headers['Content-Type'], 'application/json')
+
+    def test_send_to(self):
+        sender = self.connection.fast_sender()
+        template = HSMCommand(
+            to='', namespace='ns', element_name='name', language_code='en')
+        sender.send_to(template, '27001')
+        response = sender.send_to(template, '27002')
+
+        self.assertEqual(response, {'messages': [{'id': 'id-27002'}]})
+        self.assertEqual(
+            [payload for (_, _, payload) in self.sent()], [
+                HSMCommand(
+                    to=to, namespace='ns', element_name='name',
+                    language_code='en').render()
+                for to in ('27001', '27002')])
+
+    def test_error(self):
+        sender = self.connection.fast_sender()
+        with self.assertRaises(requests.HTTPError) as context:
+            sender.send(TextCommand(to='27129', text='hi'))
+        self.assertEqual(context.exception.response.status_code, 400)
+
+    def test_set_token_refreshes(self):
+        sender = self.connection.fast_sender()
+        self.connection.set_token('other')
+        self.assertIs(self.connection.fast_sender(), sender)
+        sender.send(TextCommand(to='27123', text='hi'))
+        [headers] = self.server.headers
+        self.assertEqual(headers['Authorization'], 'Bearer other')
+
+    def test_circuit_breaker(self):
+        breakers = CircuitBreakers(min_calls=2, failure_rate=0.5)
+        connection = Connection(self.server.url, circuit_breakers=breakers)
+        sender = connection.fast_sender()
+        self.assertRaises(
+            requests.HTTPError, sender.send,
+            TextCommand(to='27129', text='hi'))
+        self.assertEqual(breakers.get('/v1/messages').state, 'closed')
+        self.assertRaises(
+            requests.HTTPError, sender.send,
+            TextCommand(to='27128', text='hi'))
+        self.assertRaises(
+            CircuitOpenException, sender.send,
+            TextCommand(to='27123', text='hi'))
+
+    def test_send_to_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        sender = SlowCacheSender(self.connection)
+        templates = dict(
+            (name, HSMCommand(
+                to='', namespace='ns', element_name=name,
+                language_code='en'))
+            for name in ('first', 'second'))
+        sends = [
+            ('first' if index % 2 else 'second', '27%05d1' % (index,))
+            for index in range(100)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                lambda send: sender.send_to(templates[send[0]], send[1]),
+                sends))
+
+        self.assertEqual(
+            sorted(
+                (payload['hsm']['element_name'], payload['to'])
+                for (_, _, payload) in self.sent()),
+            sorted(sends))
+
+
+class SlowCacheSender(FastSender):
+    """
+    Gives other threads time to replace the cached template right after
+    it is stored.
+    """
+
+    @property
+    def template(self):
+        return self.__dict__.get('cached_template')
+
+    @template.setter
+    def template(self, value):
+        self.__dict__['cached_template'] = value
+        time.sleep(0.001)
@@ -0,0 +1,140 @@
+import socket
+from unittest import TestCase, skipUnless
+
+import requests
+
+from wabclient.client import Client, Connection, new_session
+from wabclient.commands import TextCommand
+from wabclient.loadtest import connection_stats
+from wabclient.pool import ClientPool
+from wabclient.tests.server import StubServer, serve_bytes
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class CountingAdapter(requests.adapters.HTTPAdapter):
+
+    def __init__(self):
+        super(CountingAdapter, self).__init__()
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        return super(CountingAdapter, self).send(request, **kwargs)
+
+    def connection_stats(self):
+        return (1, self.sent)
+
+
+class TransportTest(TestCase):
+
+    def test_new_session(self):
+        adapter = CountingAdapter()
+        session = new_session(adapter)
+        self.assertIs(session.get_adapter('http://example.org'), adapter)
+        self.assertIs(session.get_adapter('https://example.org'), adapter)
+
+    def test_client(self):
+        adapter = CountingAdapter()
+        with StubServer() as server:
+            client = Client(server.url, transport=adapter)
+            client.connection.set_token('token')
+            client.send_message('27123', 'hi')
+            client.config.connection.health_probe()
+            client.groups.connection.health_probe()
+            client.connection.fast_sender().send(
+                TextCommand(to='27123', text='hi'))
+        self.assertEqual(adapter.sent, 4)
+        self.assertEqual(connection_stats(client.session), (1, 4))
+
+    def test_connection(self):
+        adapter = CountingAdapter()
+        with StubServer() as server:
+            Connection(server.url, transport=adapter).health_probe()
+        self.assertEqual(adapter.sent, 1)
+
+    def test_session_and_transport(self):
+        session = requests.Session()
+        adapter = CountingAdapter()
+        self.assertRaises(
+            ValueError, Client, 'http://example.org', session=session,
+            transport=adapter)
+        self.assertRaises(
+            ValueError, Connection, 'http://example.org', session=session,
+            transport=adapter)
+        self.assertIsNot(session.get_adapter('http://example.org'), adapter)
+
+    def test_client_pool(self):
+        adapter = CountingAdapter()
+        with StubServer() as server:
+            pool = ClientPool(transport=adapter)
+            pool.register('a', server.url, token='token-a')
+            pool.register('b', server.url, token='token-b')
+            pool.get('a').send_message('27000000001', 'hi')
+            pool.get('b').send_message('27000000002', 'hi')
+            pool.evict('a')
+            pool.close()
+        self.assertEqual(adapter.sent, 2)
+
+
+def unused_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@skipUnless(httpx, 'httpx is not installed')
+class HTTP2AdapterTest(TestCase):
+
+    def setUp(self):
+        from wabclient.http2 import HTTP2Adapter
+        self.adapter = HTTP2Adapter(max_connections=1)
+        self.addCleanup(self.adapter.close)
+
+    def test_send(self):
+        with StubServer() as server:
+            client = Client(server.url, transport=self.adapter)
+            client.connection.set_token('token')
+            self.assertEqual(
+                client.send_message('27123', 'hi'),
+                {'messages': [{'id': 'the-message-id'}]})
+            self.assertEqual(
+                client.connection.fast_sender().send(
+                    TextCommand(to='27123', text='hi')),
+                {'messages': [{'id': 'the-message-id'}]})
+            [headers, _] = server.headers
+        self.assertEqual(headers['Authorization'], 'Bearer token')
+        self.assertEqual(self.adapter.connection_stats(), (1, 2))
+
+    def test_connection_stats_without_pool(self):
+        from wabclient.http2 import HTTP2Adapter
+        adapter = HTTP2Adapter(client=httpx.Client(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json={}))))
+        self.addCleanup(adapter.close)
+        with StubServer() as server:
+            Connection(server.url, transport=adapter).health_probe()
+        self.assertEqual(adapter.connection_stats(), (0, 1))
+
+    def test_errors(self):
+        with StubServer() as server:
+            connection = Connection(server.url, transport=self.adapter)
+            with self.assertRaises(requests.HTTPError):
+                connection.get('/v1/missing')
+        connection = Connection(
+            'http://127.0.0.1:%s' % (unused_port(),), transport=self.adapter)
+        with self.assertRaises(requests.ConnectionError):
+            connection.health_probe()
+
+    def test_download(self):
+        data = b'the media ' * 10000
+        with StubServer(serve_bytes(data, 'image/jpeg')) as server:
+            connection = Connection(server.url, transport=self.adapter)
+            (size, fp) = connection.download_media('the-media-id')
+            self.assertEqual((size, fp.read(1024)), (len(data), data[:1024]))
+            self.assertEqual(fp.read(), data[1024:])
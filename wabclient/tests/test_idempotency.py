@@ -0,0 +1,222 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+import requests
+
+from wabclient.commands import TextCommand, LeaveGroupCommand
+from wabclient.exceptions import DuplicateSendException
+from wabclient.idempotency import (
+    IdempotentConnection, MemoryStore, SQLiteStore, AMBIGUOUS, command_key,
+    caller_key)
+
+
+class FakeConnection(object):
+
+    def __init__(self, fail=None):
+        self.sent = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def send(self, command):
+        self.release.wait()
+        self.sent.append(command)
+        if self.fail is not None:
+            raise self.fail
+        return {'messages': [{'id': 'gBEG%s' % (len(self.sent),)}]}
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class KeyTest(TestCase):
+
+    def test_command_key(self):
+        self.assertEqual(
+            command_key(TextCommand(to='27123', text='hi')),
+            command_key(TextCommand(to='27123', text='hi')))
+        self.assertNotEqual(
+            command_key(TextCommand(to='27123', text='hi')),
+            command_key(TextCommand(to='27124', text='hi')))
+        self.assertEqual(len(command_key(TextCommand(to='1', text='a'))), 16)
+
+    def test_caller_key(self):
+        self.assertEqual(caller_key('abc'), caller_key(b'abc'))
+        self.assertNotEqual(caller_key('abc'), caller_key('abd'))
+
+
+class MemoryStoreTest(TestCase):
+
+    def test_window(self):
+        clock = FakeClock()
+        store = MemoryStore(window=60, buckets=6, clock=clock)
+        store.put(b'a', 'id-a')
+        clock.now += 60
+        self.assertEqual(store.get(b'a'), 'id-a')
+        clock.now += 11
+        self.assertEqual(store.get(b'a'), None)
+        self.assertEqual(len(store), 0)
+
+    def test_max_keys(self):
+        clock = FakeClock()
+        store = MemoryStore(window=60, max_keys=2, buckets=6, clock=clock)
+        store.put(b'a', 'id-a')
+        clock.now += 10
+        store.put(b'b', 'id-b')
+        clock.now += 10
+        store.put(b'c', 'id-c')
+        self.assertEqual(store.get(b'a'), None)
+        self.assertEqual(store.get(b'c'), 'id-c')
+
+    def test_put_after_older_claim(self):
+        clock = FakeClock()
+        store = MemoryStore(window=60, buckets=6, clock=clock)
+        store.claim(b'a')
+        clock.now += 10
+        store.put(b'a', 'id-a')
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get(b'a'), 'id-a')
+        store.delete(b'a')
+        self.assertEqual(len(store), 0)
+
+    def test_claim(self):
+        store = MemoryStore()
+        self.assertEqual(store.claim(b'a'), None)
+        self.assertEqual(store.claim(b'a'), AMBIGUOUS)
+        store.delete(b'a')
+        self.assertEqual(len(store), 0)
+
+
+class SQLiteStoreTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'sends.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persists(self):
+        store = SQLiteStore(self.path)
+        self.assertEqual(store.claim(b'a'), None)
+        store.put(b'a', 'id-a')
+        store.close()
+        store = SQLiteStore(self.path)
+        self.assertEqual(store.claim(b'a'), 'id-a')
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def test_window(self):
+        clock = FakeClock()
+        store = SQLiteStore(self.path, window=60, clock=clock)
+        store.put(b'a', 'id-a')
+        clock.now += 61
+        self.assertEqual(store.get(b'a'), None)
+        self.assertEqual(store.claim(b'a'), None)
+        store.purge()
+        self.assertEqual(len(store), 1)
+        store.close()
+
+
+class IdempotentConnectionTest(TestCase):
+
+    def test_duplicate_suppressed(self):
+        connection = FakeConnection()
+        idempotent = IdempotentConnection(connection)
+        first = idempotent.send(TextCommand(to='27123', text='hi'))
+        second = idempotent.send(TextCommand(to='27123', text='hi'))
+        self.assertEqual(first, second)
+        self.assertEqual(len(connection.sent), 1)
+        self.assertEqual(idempotent.suppressed, 1)
+        idempotent.send(TextCommand(to='27124', text='hi'))
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_explicit_key(self):
+        connection = FakeConnection()
+        idempotent = IdempotentConnection(connection)
+        idempotent.send(TextCommand(to='27123', text='hi'), 'order-1')
+        idempotent.send(TextCommand(to='27123', text='hi'), 'order-2')
+        response = idempotent.send(
+            TextCommand(to='27123', text='hello'), 'order-1')
+        self.assertEqual(response, {'messages': [{'id': 'gBEG1'}]})
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_other_commands_pass_through(self):
+        connection = FakeConnection()
+        idempotent = IdempotentConnection(connection)
+        idempotent.send(LeaveGroupCommand('group'))
+        idempotent.send(LeaveGroupCommand('group'))
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_concurrent_duplicates(self):
+        connection = FakeConnection()
+        connection.release.clear()
+        idempotent = IdempotentConnection(connection)
+        responses = []
+
+        def send():
+            responses.append(
+                idempotent.send(TextCommand(to='27123', text='hi')))
+
+        threads = [threading.Thread(target=send) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        connection.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(connection.sent), 1)
+        self.assertEqual(
+            responses, [{'messages': [{'id': 'gBEG1'}]}] * 5)
+
+    def test_definite_failure_retried(self):
+        response = requests.Response()
+        response.status_code = 400
+        connection = FakeConnection(
+            fail=requests.HTTPError(response=response))
+        idempotent = IdempotentConnection(connection)
+        command = TextCommand(to='27123', text='hi')
+        self.assertRaises(requests.HTTPError, idempotent.send, command)
+        connection.fail = None
+        idempotent.send(command)
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_ambiguous_failure(self):
+        connection = FakeConnection(fail=requests.ReadTimeout())
+        idempotent = IdempotentConnection(connection)
+        command = TextCommand(to='27123', text='hi')
+        self.assertRaises(requests.ReadTimeout, idempotent.send, command)
+        connection.fail = None
+        self.assertRaises(
+            DuplicateSendException, idempotent.send, command)
+        self.assertEqual(len(connection.sent), 1)
+
+        idempotent.resend_ambiguous = True
+        idempotent.send(command)
+        self.assertEqual(len(connection.sent), 2)
+
+    def test_client_idempotency_key(self):
+        from wabclient.client import Client
+
+        client = Client('http://example.org')
+        self.assertRaises(
+            ValueError, client.send_message, '27123', 'hi',
+            idempotency_key='order-1')
+
+        connection = FakeConnection()
+        client.connection = IdempotentConnection(connection)
+        client.send_message('27123', 'hi', idempotency_key='order-1')
+        client.send_message('27123', 'hi again', idempotency_key='order-1')
+        client.send_hsm(
+            '27123', 'ns', 'name', 'en', [], idempotency_key='order-2')
+        client.send_hsm(
+            '27123', 'ns', 'name', 'en', [], idempotency_key='order-2')
+        self.assertEqual(len(connection.sent), 2)
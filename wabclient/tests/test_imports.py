@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+HEAVY_MODULES = [
+    'requests', 'phonenumbers', 'iso8601', 'limit', 'httpx']
+
+
+class LazyImportTest(TestCase):
+
+    def loaded_modules(self, module):
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, %s; print(",".join(sorted(sys.modules)))' % (
+                module,)])
+        return output.decode('utf-8').strip().split(',')
+
+    def assertNotLoaded(self, module):
+        loaded = self.loaded_modules(module)
+        self.assertEqual(
+            [name for name in HEAVY_MODULES if name in loaded], [])
+
+    def test_import_wabclient(self):
+        self.assertNotLoaded('wabclient')
+
+    def test_import_cli(self):
+        self.assertNotLoaded('wabclient.scripts.cli')
+
+    def test_import_http2(self):
+        self.assertNotLoaded('wabclient.http2')
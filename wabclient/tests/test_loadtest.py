@@ -0,0 +1,70 @@
+import json
+from unittest import TestCase
+
+import requests
+from click.testing import CliRunner
+
+from wabclient.client import Client
+from wabclient.loadtest import LoadTest, classify_error, percentile
+from wabclient.scripts.cli import main
+from wabclient.tests.server import StubServer
+
+
+def respond_with_errors(method, path, headers, body):
+    if json.loads(body.decode('utf-8'))['to'] == 'throttled':
+        return (429, {}, {'error': {'errorcode': 429}})
+    return (201, {}, {'messages': [{'id': 'the-message-id'}]})
+
+
+class LoadTestTest(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), None)
+
+    def test_run(self):
+        with StubServer() as server:
+            session = requests.Session()
+            client = Client(server.url, session=session)
+            report = LoadTest(
+                lambda: client.send_message('27000000001', 'hi'),
+                concurrency=2, rate=50, duration=0.2,
+                session=session).run()
+
+        # paced to 50/s for 0.2s means at most 10 requests
+        self.assertTrue(0 < report.requests <= 10)
+        self.assertEqual(report.successes, report.requests)
+        self.assertEqual(report.errors, {})
+        self.assertTrue(report.latencies['p99'] <= report.latencies['max'])
+        self.assertTrue(1 <= report.connections <= 2)
+        self.assertEqual(report.connection_requests, report.requests)
+
+    def test_errors(self):
+        with StubServer(respond_with_errors) as server:
+            client = Client(server.url)
+            report = LoadTest(
+                lambda: client.send_message('throttled', 'hi'),
+                concurrency=1, rate=20, duration=0.1).run()
+
+        self.assertEqual(report.successes, 0)
+        self.assertEqual(
+            list(report.errors), ['RequestRateLimitingException'])
+
+    def test_classify_connection_error(self):
+        self.assertEqual(
+            classify_error(requests.exceptions.ConnectionError()),
+            'ConnectionError')
+
+    def test_cli(self):
+        with StubServer() as server:
+            result = CliRunner().invoke(main, [
+                'loadtest', '--base-url', server.url, '--to', '27000000001',
+                '--duration', '0.2', '--rate', '25', '--concurrency', '1',
+                '--output-format', 'json'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        report = json.loads(result.output)
+        self.assertTrue(0 < report['requests'] <= 5)
+        self.assertEqual(report['connections']['opened'], 1)
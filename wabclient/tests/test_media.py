@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import mock
+import requests
+from click.testing import CliRunner
+
+from wabclient.client import Client, Connection
+from wabclient.media import (
+    extension_for, file_name_for, split_parts, download_file,
+    download_to_dir)
+from wabclient.scripts.cli import main
+from wabclient.tests.server import StubServer, serve_bytes
+
+MEDIA = {
+    'image-1': ('image/jpeg', b'jpeg data'),
+    'voice-1': ('audio/ogg; codecs=opus', b'ogg data'),
+    'doc/1': ('application/x-unknown-type', b'doc data'),
+}
+
+
+def respond_with_media(method, path, headers, body):
+    media_id = path[len('/v1/media/'):]
+    if media_id not in MEDIA:
+        return (404, {}, {'errors': [{'code': 1009}]})
+    (content_type, data) = MEDIA[media_id]
+    return (200, {'Content-Type': content_type}, data)
+
+
+class ExtensionTest(TestCase):
+
+    def test_extension_for(self):
+        self.assertEqual(extension_for('image/jpeg'), '.jpg')
+        self.assertEqual(extension_for('audio/ogg; codecs=opus'), '.ogg')
+        self.assertEqual(extension_for('image/gif'), '.gif')
+        self.assertEqual(extension_for('application/x-unknown-type'), '')
+        self.assertEqual(extension_for(None), '.bin')
+
+    def test_file_name_for(self):
+        self.assertEqual(
+            file_name_for('../media id', 'video/mp4'), '.._media_id.mp4')
+
+
+class DownloadManyTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.server = StubServer(respond_with_media)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def test_download_many(self):
+        client = Client(self.server.url, session=requests.Session())
+        bulk_result = client.download_many(
+            ['image-1', 'voice-1', 'doc/1', 'missing'], self.tempdir,
+            concurrency=2)
+
+        self.assertEqual(list(bulk_result.errors), ['missing'])
+        image = bulk_result.results['image-1']
+        self.assertEqual(
+            image.path, os.path.join(self.tempdir, 'image-1.jpg'))
+        self.assertEqual(image.content_type, 'image/jpeg')
+        self.assertEqual(image.size, 9)
+        self.assertEqual(
+            image.sha256, hashlib.sha256(b'jpeg data').hexdigest())
+        self.assertEqual(
+            bulk_result.results['voice-1'].content_type, 'audio/ogg')
+        self.assertEqual(
+            sorted(os.listdir(self.tempdir)),
+            ['doc_1', 'image-1.jpg', 'voice-1.ogg'])
+        with open(os.path.join(self.tempdir, 'voice-1.ogg'), 'rb') as fp:
+            self.assertEqual(fp.read(), b'ogg data')
+
+    def test_cli(self):
+        ids_file = os.path.join(self.tempdir, 'ids.txt')
+        with open(ids_file, 'w') as fp:
+            fp.write('image-1\n\nmissing\n')
+        dest_dir = os.path.join(self.tempdir, 'media')
+
+        result = CliRunner().invoke(main, [
+            'download', '--token', 'token', '--base-url', self.server.url,
+            '--ids-file', ids_file, '--dest-dir', dest_dir])
+
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('1 downloaded, 1 failed', result.output)
+        with open(os.path.join(dest_dir, 'manifest.jsonl')) as fp:
+            manifest = dict(
+                (entry['media_id'], entry)
+                for entry in map(json.loads, fp))
+        self.assertEqual(manifest['image-1']['size'], 9)
+        self.assertEqual(manifest['image-1']['error'], None)
+        self.assertIn('404', manifest['missing']['error'])
+
+    def test_failed_download(self):
+        connection = mock.Mock()
+        response = connection.stream_media.return_value
+        response.headers = {'Content-Type': 'image/jpeg'}
+        response.raw.read.side_effect = [
+            b'jpeg', requests.exceptions.ChunkedEncodingError()]
+        self.assertRaises(
+            requests.exceptions.ChunkedEncodingError,
+            download_to_dir, connection, 'image-1', self.tempdir)
+        self.assertEqual(os.listdir(self.tempdir), [])
+        response.close.assert_called_once_with()
+
+
+class RangedDownloadTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.data = bytes(bytearray(range(256))) * 40
+        self.dest_path = os.path.join(self.tempdir, 'video.mp4')
+
+    def serve(self, ranges=True):
+        server = StubServer(serve_bytes(self.data, 'video/mp4', ranges))
+        server.__enter__()
+        self.addCleanup(server.__exit__)
+        return server
+
+    def read(self):
+        with open(self.dest_path, 'rb') as fp:
+            return fp.read()
+
+    def test_split_parts(self):
+        self.assertEqual(
+            split_parts(10, 3, min_part_size=2), [[0, 2], [3, 5], [6, 9]])
+        self.assertEqual(split_parts(10, 8, min_part_size=4), [[0, 4], [5, 9]])
+        self.assertEqual(split_parts(3, 4, min_part_size=4), [[0, 2]])
+
+    def test_single_stream(self):
+        server = self.serve()
+        connection = Connection(server.url)
+        self.assertEqual(
+            connection.download_to_file('/v1/media/id', self.dest_path),
+            len(self.data))
+        self.assertEqual(self.read(), self.data)
+        self.assertFalse(os.path.exists(self.dest_path + '.part'))
+
+    def test_resume(self):
+        server = self.serve()
+        with open(self.dest_path + '.part', 'wb') as fp:
+            fp.write(self.data[:1000])
+
+        client = Client(server.url)
+        client.download_media_to_file('id', self.dest_path)
+
+        self.assertEqual(self.read(), self.data)
+        [headers] = server.headers
+        self.assertEqual(headers['Range'], 'bytes=1000-')
+
+    def test_resume_without_range_support(self):
+        server = self.serve(ranges=False)
+        with open(self.dest_path + '.part', 'wb') as fp:
+            fp.write(b'stale partial')
+
+        Connection(server.url).download_to_file('/v1/media/id', self.dest_path)
+        self.assertEqual(self.read(), self.data)
+
+    def test_resume_stale_partial(self):
+        server = self.serve()
+        with open(self.dest_path + '.part', 'wb') as fp:
+            fp.write(b'x' * (len(self.data) + 10))
+
+        Connection(server.url).download_to_file('/v1/media/id', self.dest_path)
+        self.assertEqual(self.read(), self.data)
+
+    def test_parts(self):
+        server = self.serve()
+        size = download_file(
+            Connection(server.url), '/v1/media/id', self.dest_path,
+            parts=4, min_part_size=1024)
+
+        self.assertEqual(size, len(self.data))
+        self.assertEqual(self.read(), self.data)
+        ranges = sorted(
+            headers['Range'] for headers in server.headers
+            if 'Range' in headers)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(os.listdir(self.tempdir), ['video.mp4'])
+
+    def test_parts_resume(self):
+        server = self.serve()
+        ranges = split_parts(len(self.data), 4, min_part_size=1024)
+        with open(self.dest_path + '.part', 'wb') as fp:
+            fp.write(self.data[:ranges[1][1] + 1])
+        with open(self.dest_path + '.part.json', 'w') as fp:
+            json.dump({
+                'size': len(self.data), 'ranges': ranges,
+                'done': [ranges[0][0], ranges[1][0]]}, fp)
+
+        download_file(
+            Connection(server.url), '/v1/media/id', self.dest_path,
+            parts=4, min_part_size=1024)
+
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(
+            sorted(headers['Range'] for headers in server.headers
+                   if 'Range' in headers),
+            ['bytes=%s-%s' % tuple(part) for part in ranges[2:]])
+
+    def test_parts_without_range_support(self):
+        server = self.serve(ranges=False)
+        download_file(
+            Connection(server.url), '/v1/media/id', self.dest_path,
+            parts=4, min_part_size=1024)
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(
+            [method for (method, _, _) in server.requests], ['HEAD', 'GET'])
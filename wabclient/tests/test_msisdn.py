@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import mock
+
+from wabclient.exceptions import AddressException
+from wabclient.msisdn import (
+    MSISDNNormalizer, NormalizedNumber, InvalidNumber)
+
+
+class MSISDNNormalizerTest(TestCase):
+
+    def setUp(self):
+        self.normalizer = MSISDNNormalizer(default_region='ZA')
+
+    def test_fast_path(self):
+        with mock.patch('phonenumbers.parse') as parse:
+            self.assertEqual(
+                self.normalizer.normalize('+27821234567'),
+                ('+27821234567', '27821234567'))
+            self.assertEqual(
+                MSISDNNormalizer().normalize('27 82 123 4567'),
+                ('+27821234567', '27821234567'))
+        parse.assert_not_called()
+
+    def test_national_format_with_region(self):
+        normalizer = MSISDNNormalizer(default_region='US')
+        self.assertEqual(
+            normalizer.normalize('212 555 1234'),
+            ('+12125551234', '12125551234'))
+
+    def test_fast_path_checks_country(self):
+        normalizer = MSISDNNormalizer()
+        self.assertRaises(AddressException, normalizer.normalize, '12345678')
+        self.assertRaises(
+            AddressException, normalizer.normalize, '+999123456789')
+        self.assertEqual(
+            normalizer.normalize('+12125551234'),
+            ('+12125551234', '12125551234'))
+
+    def test_national_format(self):
+        self.assertEqual(
+            self.normalizer.normalize('082 123 4567'),
+            ('+27821234567', '27821234567'))
+
+    def test_invalid(self):
+        self.assertRaises(
+            AddressException, self.normalizer.normalize, 'not a number')
+        self.assertRaises(
+            AddressException, self.normalizer.normalize, '0821')
+
+    def test_cache(self):
+        self.normalizer.normalize('0821234567')
+        with mock.patch('phonenumbers.parse') as parse:
+            self.normalizer.normalize('0821234567')
+        parse.assert_not_called()
+
+    def test_normalize_many(self):
+        result = self.normalizer.normalize_many(
+            ['0821234567', 'foo', '+27821234568'])
+        self.assertEqual(result.valid, [
+            NormalizedNumber(
+                row=0, input='0821234567',
+                e164='+27821234567', wa_id='27821234567'),
+            NormalizedNumber(
+                row=2, input='+27821234568',
+                e164='+27821234568', wa_id='27821234568'),
+        ])
+        [invalid] = result.invalid
+        self.assertIsInstance(invalid, InvalidNumber)
+        self.assertEqual((invalid.row, invalid.input), (1, 'foo'))
+
+    def test_normalize_many_processes(self):
+        numbers = ['0821234567', 'foo', '+27821234568'] * 5
+        self.assertEqual(
+            self.normalizer.normalize_many(
+                numbers, processes=2, chunk_size=4),
+            self.normalizer.normalize_many(numbers))
@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+import mock
+import requests
+
+from wabclient.breaker import CircuitBreakers, CLOSED, OPEN
+from wabclient.pool import ClientPool
+from wabclient.tests.server import StubServer
+
+
+class ClientPoolTest(TestCase):
+
+    def setUp(self):
+        self.clock = mock.Mock(return_value=1000.0)
+        self.pool = ClientPool(
+            max_clients=2, idle_timeout=60, clock=self.clock)
+        self.addCleanup(self.pool.close)
+        for key in ('a', 'b', 'c'):
+            self.pool.register(
+                key, 'http://%s.example.org' % (key,),
+                token='token-%s' % (key,))
+
+    def test_lazy(self):
+        self.assertEqual(len(self.pool), 0)
+        client = self.pool.get('a')
+        self.assertIs(self.pool['a'], client)
+        self.assertEqual(
+            client.connection.session.headers['Authorization'],
+            'Bearer token-a')
+        self.assertIs(
+            client.connection.session.get_adapter('http://a.example.org'),
+            self.pool.adapter)
+        self.assertRaises(KeyError, self.pool.get, 'unknown')
+
+    def test_lru_eviction(self):
+        self.pool.get('a')
+        self.pool.get('b')
+        self.pool.get('a')
+        self.pool.get('c')
+        self.assertEqual(sorted(self.pool.clients), ['a', 'c'])
+
+    def test_idle_eviction(self):
+        self.pool.get('a')
+        self.clock.return_value += 30
+        self.pool.get('b')
+        self.clock.return_value += 30
+        self.pool.get('b')
+        self.assertEqual(list(self.pool.clients), ['b'])
+
+    def test_set_token(self):
+        client = self.pool.get('a')
+        self.pool.set_token('a', 'new-token')
+        self.assertEqual(
+            client.connection.session.headers['Authorization'],
+            'Bearer new-token')
+
+    def test_register_new_url_evicts(self):
+        client = self.pool.get('a')
+        self.pool.register('a', 'http://elsewhere.example.org', 'token')
+        self.assertIsNot(self.pool.get('a'), client)
+        self.assertEqual(
+            self.pool.get('a').url, 'http://elsewhere.example.org')
+
+
+class SharedConnectionsTest(TestCase):
+
+    def test_shared_sockets(self):
+        with StubServer() as server:
+            pool = ClientPool()
+            self.addCleanup(pool.close)
+            pool.register('a', server.url, token='token-a')
+            pool.register('b', server.url, token='token-b')
+
+            pool.get('a').send_message('27000000001', 'hi')
+            pool.get('b').send_message('27000000002', 'hi')
+
+            pools = pool.adapter.poolmanager.pools
+            [pool_key] = pools.keys()
+            connection_pool = pools[pool_key]
+            self.assertEqual(connection_pool.num_connections, 1)
+            self.assertEqual(connection_pool.num_requests, 2)
+
+            pool.evict('a')
+            self.assertEqual(len(pool.adapter.poolmanager.pools), 1)
+            pool.evict('b')
+            self.assertEqual(len(pool.adapter.poolmanager.pools), 0)
+
+
+class PoolBreakersTest(TestCase):
+
+    def test_breakers_per_client(self):
+        breakers = CircuitBreakers(min_calls=2, reset_timeout=60)
+        failing = StubServer(lambda method, path, headers, body: (
+            503, {}, {'errors': [{'code': 503}]}))
+        with failing, StubServer() as healthy:
+            pool = ClientPool(circuit_breakers=breakers)
+            self.addCleanup(pool.close)
+            pool.register('a', failing.url, token='token-a')
+            pool.register('b', healthy.url, token='token-b')
+            for _ in range(2):
+                self.assertRaises(
+                    requests.HTTPError,
+                    pool.get('a').send_message, '27000000001', 'hi')
+
+            self.assertEqual(
+                pool.get('b').send_message('27000000002', 'hi'),
+                {'messages': [{'id': 'the-message-id'}]})
+            self.assertEqual(len(healthy.requests), 1)
+        self.assertEqual(
+            pool.get('a').circuit_breakers.snapshot()['messages']['state'],
+            OPEN)
+        self.assertEqual(
+            pool.get('b').circuit_breakers.snapshot()['messages']['state'],
+            CLOSED)
+        self.assertEqual(breakers.snapshot(), {})
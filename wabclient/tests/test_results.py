@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import mock
+
+from wabclient.results import (
+    ResultsWriter, Progress, SendResult, error_code, count_rows)
+
+
+class ResultsWriterTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def test_jsonl(self):
+        path = os.path.join(self.tempdir, 'out.jsonl')
+        with ResultsWriter.open(path) as writer:
+            writer.write(
+                SendResult('27000000001', 'sent', 'the-id', None, 0.5))
+
+        with open(path) as fp:
+            self.assertEqual([json.loads(line) for line in fp], [{
+                'msisdn': '27000000001',
+                'status': 'sent',
+                'message_id': 'the-id',
+                'error_code': None,
+                'latency': 0.5,
+            }])
+
+    def test_csv(self):
+        path = os.path.join(self.tempdir, 'out.csv')
+        with ResultsWriter.open(path) as writer:
+            writer.write(SendResult('27000000001', 'failed', error_code=1013))
+
+        with open(path) as fp:
+            self.assertEqual(list(csv.reader(fp)), [
+                ['msisdn', 'status', 'message_id', 'error_code', 'latency'],
+                ['27000000001', 'failed', '', '1013', ''],
+            ])
+
+    def test_count_rows(self):
+        path = os.path.join(self.tempdir, 'in.csv')
+        with open(path, 'w') as fp:
+            fp.write('1\n2\n3\n')
+        with open(path) as fp:
+            self.assertEqual(count_rows(fp), 3)
+        self.assertEqual(count_rows(object()), None)
+
+
+class ProgressTest(TestCase):
+
+    def test_summary(self):
+        clock = mock.Mock(return_value=100.0)
+        progress = Progress(total=10, interval=5, clock=clock)
+        progress.record(SendResult('1', 'sent'))
+        progress.record(SendResult('2', 'failed', error_code=1013))
+        clock.return_value = 102.0
+
+        self.assertFalse(progress.due())
+        self.assertEqual(
+            progress.summary(),
+            '2/10 rows, 1.0/s, ETA 00:00:08, failed=1, sent=1, '
+            'errors: 1013=1')
+        clock.return_value = 105.0
+        self.assertTrue(progress.due())
+        self.assertFalse(progress.due())
+
+    def test_error_code(self):
+        response = mock.Mock(status_code=400)
+        response.json.return_value = {'errors': [{'code': 1013}]}
+        self.assertEqual(error_code(response), 1013)
+        response.json.return_value = {'error': {'errorcode': 429}}
+        self.assertEqual(error_code(response), 429)
+        response.json.side_effect = ValueError()
+        self.assertEqual(error_code(response), 400)
@@ -0,0 +1,84 @@
+import threading
+from unittest import TestCase
+
+from wabclient.scheduler import (
+    SendScheduler, FairQueue, PRIORITY_URGENT, PRIORITY_BULK)
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.sent = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def send(self, command):
+        self.started.set()
+        self.release.wait()
+        if command == 'fail':
+            raise ValueError('failed')
+        self.sent.append(command)
+        return {'sent': command}
+
+
+class FairQueueTest(TestCase):
+
+    def test_weights(self):
+        queue = FairQueue()
+        for index in range(4):
+            queue.push('a', 3, 'a%s' % (index,))
+            queue.push('b', 1, 'b%s' % (index,))
+        self.assertEqual(
+            [queue.pop() for _ in range(8)],
+            ['a0', 'a1', 'b0', 'a2', 'a3', 'b1', 'b2', 'b3'])
+
+
+class SendSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.scheduler = SendScheduler(
+            self.connection, workers=1, weights={'campaign-a': 2})
+        self.addCleanup(self.scheduler.close)
+        self.addCleanup(self.connection.release.set)
+
+    def test_priorities_and_fairness(self):
+        blocker = self.scheduler.submit('blocker', priority=PRIORITY_BULK)
+        self.connection.started.wait()
+        futures = []
+        for index in range(3):
+            futures.append(self.scheduler.submit(
+                'a%s' % (index,), priority=PRIORITY_BULK, flow='campaign-a'))
+        for index in range(3):
+            futures.append(self.scheduler.submit(
+                'b%s' % (index,), priority=PRIORITY_BULK, flow='campaign-b'))
+        futures.append(
+            self.scheduler.submit('reply', priority=PRIORITY_URGENT))
+        self.connection.release.set()
+
+        self.assertEqual(blocker.result(), {'sent': 'blocker'})
+        for future in futures:
+            future.result()
+        self.assertEqual(
+            self.connection.sent,
+            ['blocker', 'reply', 'a0', 'a1', 'b0', 'a2', 'b1', 'b2'])
+        stats = self.scheduler.stats()
+        self.assertEqual(stats[PRIORITY_BULK]['sent'], 7)
+        self.assertEqual(stats[PRIORITY_URGENT]['queued'], 0)
+
+    def test_errors(self):
+        self.connection.release.set()
+        future = self.scheduler.submit('fail')
+        self.assertRaises(ValueError, future.result)
+        self.assertEqual(self.scheduler.send('ok'), {'sent': 'ok'})
+
+    def test_bind(self):
+        self.connection.release.set()
+        connection = self.scheduler.bind(PRIORITY_URGENT, flow='replies')
+        self.assertEqual(connection.send('reply'), {'sent': 'reply'})
+        self.assertIs(connection.release, self.connection.release)
+        self.assertEqual(self.scheduler.stats()[PRIORITY_URGENT]['sent'], 1)
+
+    def test_closed(self):
+        self.scheduler.close()
+        self.assertRaises(RuntimeError, self.scheduler.submit, 'late')
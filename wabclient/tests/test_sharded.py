@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from wabclient import results as r
+from wabclient.sharded import (
+    ShardedSender, RateBudget, split_ranges, iter_range)
+from wabclient.tests.server import StubServer
+
+
+def respond_to_send(method, path, headers, body):
+    to = json.loads(body.decode('utf-8'))['to']
+    if to.endswith('9'):
+        return (400, {}, {'errors': [{'code': 1013}]})
+    return (201, {}, {'messages': [{'id': 'id-%s' % (to,)}]})
+
+
+class RangeTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def mk_file(self, content):
+        path = os.path.join(self.tempdir, 'input.csv')
+        with open(path, 'wb') as fp:
+            fp.write(content)
+        return path
+
+    def test_split_ranges(self):
+        numbers = ['2700000%04d' % (index,) for index in range(100)]
+        path = self.mk_file(''.join(
+            '%s\n' % (number,) for number in numbers).encode('utf-8'))
+        ranges = split_ranges(path, 3)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(path))
+        read = []
+        for (start, end) in ranges:
+            read.extend(iter_range(path, start, end))
+        self.assertEqual(read, numbers)
+
+    def test_split_small_file(self):
+        path = self.mk_file(b'27000000001\n\n27000000002')
+        ranges = split_ranges(path, 8)
+        read = []
+        for (start, end) in ranges:
+            read.extend(iter_range(path, start, end))
+        self.assertEqual(read, ['27000000001', '27000000002'])
+        self.assertEqual(split_ranges(self.mk_file(b''), 4), [])
+
+
+class RateBudgetTest(TestCase):
+
+    def test_spacing(self):
+        budget = RateBudget(20, 1)
+        started = time.time()
+        for _ in range(5):
+            budget.acquire()
+        self.assertGreaterEqual(time.time() - started, 0.19)
+
+
+class ShardedSenderTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.server = StubServer(respond_to_send)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.numbers = ['2700000%04d' % (index,) for index in range(50)]
+
+    def send(self, source, **kwargs):
+        sender = ShardedSender(
+            '%s/whatsapp/v1/messages' % (self.server.url,), 'token',
+            processes=3, batch_size=7, **kwargs)
+        return list(sender.send_hsm(source, 'ns', 'name', 'en', []))
+
+    def assert_results(self, results):
+        self.assertEqual(
+            sorted(result.msisdn for result in results), self.numbers)
+        for result in results:
+            if result.msisdn.endswith('9'):
+                self.assertEqual(result.status, r.STATUS_FAILED)
+                self.assertEqual(result.error_code, 1013)
+            else:
+                self.assertEqual(result.status, r.STATUS_SENT)
+                self.assertEqual(
+                    result.message_id, 'id-%s' % (result.msisdn,))
+        self.assertEqual(
+            set(path for (_, path, _) in self.server.requests),
+            {'/whatsapp/v1/messages'})
+        self.assertEqual(len(self.server.requests), len(self.numbers))
+
+    def test_csv_file(self):
+        path = os.path.join(self.tempdir, 'input.csv')
+        with open(path, 'w') as fp:
+            fp.write(''.join('%s\n' % (number,) for number in self.numbers))
+        self.assert_results(self.send(path))
+
+    def test_iterable(self):
+        self.assert_results(self.send(iter(self.numbers)))
+
+    def test_dry_run(self):
+        results = self.send(self.numbers, dry_run=True)
+        self.assertEqual(
+            set(result.status for result in results), {r.STATUS_DRY_RUN})
+        self.assertEqual(self.server.requests, [])
+
+    def test_timeout(self):
+        def respond_slowly(method, path, headers, body):
+            time.sleep(0.5)
+            return respond_to_send(method, path, headers, body)
+
+        with StubServer(respond_slowly) as server:
+            sender = ShardedSender(
+                server.url, 'token', processes=1, timeout=0.2)
+            [result] = sender.send_hsm(['27000000001'], 'ns', 'name', 'en', [])
+        self.assertEqual(result.status, r.STATUS_FAILED)
+        self.assertEqual(result.error_code, 'ReadTimeout')
@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import responses
+from click.testing import CliRunner
+
+from wabclient.scripts.cli import main
+from wabclient.templates import Template, TemplateManager, load_templates
+
+TEMPLATES_URL = 'https://graph.example.org/v3.3/the-number/message_templates'
+
+
+class TemplatesTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def mk_file(self, name, content):
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'w') as fp:
+            fp.write(content)
+        return path
+
+    def expect_list(self, templates):
+        responses.add(
+            responses.GET, TEMPLATES_URL,
+            json={'data': templates, 'paging': {}})
+
+    def expect_create(self, status=200):
+        created = []
+
+        def callback(request):
+            payload = json.loads(request.body)
+            created.append(payload)
+            return (status, {}, json.dumps({'id': 'id-%s' % (
+                payload['language'],)}))
+
+        responses.add_callback(
+            responses.POST, TEMPLATES_URL, callback=callback,
+            content_type='application/json')
+        return created
+
+    def test_load_templates(self):
+        expected = [
+            Template(
+                name='welcome', language='fr',
+                components=[{'type': 'BODY', 'text': 'Bonjour'}]),
+            Template(
+                name='welcome', language='en', category='TRANSACTIONAL',
+                components=[{'type': 'BODY', 'text': 'Hi'}]),
+        ]
+        self.assertEqual(load_templates(self.mk_file('t.csv', (
+            'name,language,category,text,components\n'
+            'Welcome,fr,,Bonjour,\n'
+            'welcome,en,TRANSACTIONAL,,"[{""type"": ""BODY"", '
+            '""text"": ""Hi""}]"\n'))), expected)
+        self.assertEqual(load_templates(self.mk_file('t.yaml', (
+            '- {name: welcome, language: fr, text: Bonjour}\n'
+            '- name: welcome\n'
+            '  language: en\n'
+            '  category: TRANSACTIONAL\n'
+            '  components: [{type: BODY, text: Hi}]\n'))), expected)
+        self.assertEqual(load_templates(self.mk_file('t.json', json.dumps([
+            {'name': 'welcome', 'language': 'fr', 'text': 'Bonjour'},
+            {'name': 'welcome', 'language': 'en',
+             'category': 'TRANSACTIONAL',
+             'components': [{'type': 'BODY', 'text': 'Hi'}]},
+        ]))), expected)
+
+    @responses.activate
+    def test_create_many(self):
+        self.expect_list([{'name': 'welcome', 'language': 'en'}])
+        created = self.expect_create()
+
+        manager = TemplateManager(
+            'https://graph.example.org/v3.3', 'the-number', token='token')
+        result = manager.create_many([
+            Template(name='welcome', language='en'),
+            Template(name='welcome', language='fr'),
+        ])
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.results, {
+            ('welcome', 'en'): {'status': 'skipped', 'id': None},
+            ('welcome', 'fr'): {'status': 'created', 'id': 'id-fr'},
+        })
+        self.assertEqual(created, [{
+            'name': 'welcome',
+            'language': 'fr',
+            'category': 'ALERT_UPDATE',
+            'components': [],
+        }])
+        self.assertEqual(
+            responses.calls[0].request.headers['Authorization'],
+            'Bearer token')
+
+    @responses.activate
+    def test_cli_spec_file(self):
+        self.expect_list([])
+        self.expect_create(status=400)
+        path = self.mk_file('t.json', json.dumps([
+            {'name': 'welcome', 'language': 'fr', 'text': 'Bonjour'}]))
+
+        result = CliRunner().invoke(main, [
+            'create', '--number', 'the-number', '--token', 'token',
+            '--base-url', 'https://graph.example.org/v3.3',
+            '--spec-file', path])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Template failed: welcome (fr)', result.output)